@@ -0,0 +1,353 @@
+"""
+Agregados sobre el historial de interacciones en memoria acotada.
+El log se recorre registro a registro (JSON Lines o el array JSON legado, leído
+de a bloques), los registros del flujo de créditos se descartan, los de la primera
+versión del flujo de carbono (gastos en $) se normalizan y se acumulan conteos,
+sumas, mínimos y máximos por grupo. Con --workers el log JSONL se divide en
+tramos de bytes que se procesan en paralelo y se combinan al final. Con el backend
+SQLite (el predeterminado) las filas se leen de la base por lotes de id creciente.
+
+Uso: python -m app.analytics --group-by fuel_type
+     python -m app.analytics interactions_log.jsonl --source jsonl --group-by fuel_type --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+import logging
+
+from .benchmarking import employee_band
+from .carbon_calculator import BREAKDOWN_CATEGORIES
+from .interaction_repository import SQLiteInteractionRepository
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1 << 16
+REPOSITORY_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "5000"))
+
+# Campos que sólo aparecen en los registros del flujo de créditos
+LOAN_FIELDS = {"requested_amount", "presented_option", "monthly_income", "monthly_expenses",
+               "credit_type_purpose", "cashflow_description", "is_unaffordable", "preference"}
+# Primera versión del flujo de carbono: gastos en moneda en lugar de consumos
+LEGACY_CARBON_FIELDS = {"expense_light", "expense_fuel", "expense_gas", "employee_transport_method"}
+
+# Campos conservados en el registro normalizado
+NORMALIZED_FIELDS = ("interaction_id", "timestamp", "company_name", "employee_count", "fuel_type",
+                     "climate_control", "carbon_footprint", "carbon_per_employee", "sustainability_score",
+                     "footprint_breakdown", "factor_version")
+
+GROUP_KEYS = {
+    "fuel_type": lambda record: record.get("fuel_type"),
+    "climate_control": lambda record: record.get("climate_control"),
+    "employee_band": lambda record: employee_band(record.get("employee_count")),
+    "month": lambda record: (record.get("timestamp") or "")[:7] or None,
+    "factor_version": lambda record: record.get("factor_version"),
+}
+_METRICS = ("carbon_footprint", "carbon_per_employee", "sustainability_score")
+
+
+# --- Lectura incremental ---
+def _iter_json_array(f: IO[str], chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Elementos de un array JSON leyendo de a bloques (no carga el archivo completo)."""
+    decoder = json.JSONDecoder()
+    buffer, eof = "", False
+    started = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started and buffer:
+            if not buffer.startswith("["):
+                raise ValueError("El archivo no es un array JSON")
+            buffer, started = buffer[1:], True
+            continue
+        if started and buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        if started and buffer.startswith("]"):
+            return
+        if buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    logger.warning(f"Array JSON truncado; se ignora el resto: {buffer[:80]}")
+                    return
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def _decode_line(line: bytes) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        logger.warning(f"Línea inválida ignorada: {line[:80]!r}")
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _is_json_array(path: str) -> bool:
+    with open(path, "rb") as f:
+        head = f.read(READ_CHUNK_SIZE).lstrip()
+    return head.startswith(b"[")
+
+
+def iter_log_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Registros del log, sea JSON Lines o el array JSON legado."""
+    if _is_json_array(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for item in _iter_json_array(f):
+                if isinstance(item, dict):
+                    yield item
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            record = _decode_line(line)
+            if record is not None:
+                yield record
+
+
+def iter_repository_records(repository: SQLiteInteractionRepository,
+                            batch_size: int = REPOSITORY_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Registros de la base SQLite en orden de inserción, leídos de a batch_size filas."""
+    last_id = 0
+    while True:
+        rows = repository.records_after(last_id, batch_size)
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        for _, record in rows:
+            yield record
+
+
+def _iter_jsonl_range(path: str, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    """Registros cuyas líneas comienzan en [start, end) del archivo JSONL."""
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()  # La línea partida pertenece al tramo anterior
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            record = _decode_line(line)
+            if record is not None:
+                yield record
+
+
+# --- Esquemas ---
+def classify_record(record: Dict[str, Any]) -> str:
+    """'prestamo', 'carbono_legado' o 'carbono' según los campos del registro."""
+    if LOAN_FIELDS & record.keys():
+        return "prestamo"
+    if LEGACY_CARBON_FIELDS & record.keys():
+        return "carbono_legado"
+    return "carbono"
+
+
+def normalize_record(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Registro con los campos canónicos del flujo de carbono; None para los del flujo de créditos."""
+    if classify_record(record) == "prestamo":
+        return None
+    normalized = {field: record.get(field) for field in NORMALIZED_FIELDS}
+    if not isinstance(normalized["footprint_breakdown"], dict):
+        normalized["footprint_breakdown"] = None
+    return normalized
+
+
+# --- Agregación ---
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _GroupStats:
+    """Conteos, sumas y extremos de un grupo (combinables entre procesos)."""
+
+    def __init__(self):
+        self.count = 0
+        self.metrics: Dict[str, List[float]] = {}  # métrica -> [n, suma, mínimo, máximo]
+        self.categories: Dict[str, float] = {}
+        self.categories_count = 0
+        self.fuel_types: Dict[str, int] = {}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self.count += 1
+        for metric in _METRICS:
+            value = _number(record.get(metric))
+            if value is None:
+                continue
+            stats = self.metrics.get(metric)
+            if stats is None:
+                self.metrics[metric] = [1, value, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = min(stats[2], value)
+                stats[3] = max(stats[3], value)
+        breakdown = record.get("footprint_breakdown")
+        if breakdown:
+            self.categories_count += 1
+            for name, value in breakdown.items():
+                value = _number(value)
+                if value is not None:
+                    self.categories[name] = self.categories.get(name, 0.0) + value
+        fuel_type = record.get("fuel_type")
+        if fuel_type:
+            self.fuel_types[fuel_type] = self.fuel_types.get(fuel_type, 0) + 1
+
+    def merge(self, other: "_GroupStats") -> None:
+        self.count += other.count
+        for metric, (n, total, low, high) in other.metrics.items():
+            stats = self.metrics.get(metric)
+            if stats is None:
+                self.metrics[metric] = [n, total, low, high]
+            else:
+                stats[0] += n
+                stats[1] += total
+                stats[2] = min(stats[2], low)
+                stats[3] = max(stats[3], high)
+        for name, value in other.categories.items():
+            self.categories[name] = self.categories.get(name, 0.0) + value
+        self.categories_count += other.categories_count
+        for fuel_type, count in other.fuel_types.items():
+            self.fuel_types[fuel_type] = self.fuel_types.get(fuel_type, 0) + count
+
+    def summary(self) -> Dict[str, Any]:
+        metrics = {metric: {"n": n, "promedio": total / n, "min": low, "max": high}
+                   for metric, (n, total, low, high) in self.metrics.items()}
+        categories_total = sum(self.categories.values())
+        order = [name for name in BREAKDOWN_CATEGORIES if name in self.categories]
+        order += sorted(name for name in self.categories if name not in BREAKDOWN_CATEGORIES)
+        fuel_total = sum(self.fuel_types.values())
+        return {
+            "interacciones": self.count,
+            "metricas": metrics,
+            "categorias": {
+                name: {"promedio": self.categories[name] / self.categories_count,
+                       "participacion": self.categories[name] / categories_total if categories_total else 0.0}
+                for name in order
+            },
+            "combustibles": {fuel_type: count / fuel_total
+                             for fuel_type, count in sorted(self.fuel_types.items())},
+        }
+
+
+class InteractionAggregator:
+    """Agregados por grupo de los registros normalizados, más conteos por esquema."""
+
+    def __init__(self, group_by: Optional[str] = None):
+        if group_by is not None and group_by not in GROUP_KEYS:
+            raise ValueError(f"Agrupación desconocida: {group_by}. Opciones: {', '.join(GROUP_KEYS)}")
+        self.group_by = group_by
+        self.schemas: Dict[str, int] = {}
+        self.groups: Dict[Optional[str], _GroupStats] = {}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        schema = classify_record(record)
+        self.schemas[schema] = self.schemas.get(schema, 0) + 1
+        normalized = normalize_record(record)
+        if normalized is None:
+            return
+        key = GROUP_KEYS[self.group_by](normalized) if self.group_by else None
+        stats = self.groups.get(key)
+        if stats is None:
+            stats = self.groups[key] = _GroupStats()
+        stats.add(normalized)
+
+    def merge(self, other: "InteractionAggregator") -> "InteractionAggregator":
+        for schema, count in other.schemas.items():
+            self.schemas[schema] = self.schemas.get(schema, 0) + count
+        for key, stats in other.groups.items():
+            if key in self.groups:
+                self.groups[key].merge(stats)
+            else:
+                self.groups[key] = stats
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        keys = sorted(self.groups, key=lambda key: (key is None, str(key)))
+        return {
+            "esquemas": dict(sorted(self.schemas.items())),
+            "agrupado_por": self.group_by,
+            "grupos": {("sin_dato" if key is None else str(key)) if self.group_by else "total":
+                       self.groups[key].summary() for key in keys},
+        }
+
+
+def _aggregate_range(path: str, start: int, end: int, group_by: Optional[str]) -> InteractionAggregator:
+    aggregator = InteractionAggregator(group_by)
+    for record in _iter_jsonl_range(path, start, end):
+        aggregator.add(record)
+    return aggregator
+
+
+def aggregate_log(path: str, group_by: Optional[str] = None, workers: int = 1) -> Dict[str, Any]:
+    """
+    Recorre el log una vez y devuelve los agregados por grupo.
+    Con workers > 1 un log JSONL se divide en tramos procesados en paralelo;
+    el array JSON legado siempre se lee en un solo proceso.
+    """
+    if workers > 1 and not _is_json_array(path):
+        size = os.path.getsize(path)
+        bounds = [size * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(_aggregate_range, [path] * workers, bounds[:-1], bounds[1:],
+                                         [group_by] * workers))
+        aggregator = partials[0]
+        for partial in partials[1:]:
+            aggregator.merge(partial)
+    else:
+        aggregator = InteractionAggregator(group_by)
+        for record in iter_log_records(path):
+            aggregator.add(record)
+    return aggregator.summary()
+
+
+def aggregate_repository(repository: SQLiteInteractionRepository, group_by: Optional[str] = None,
+                         batch_size: int = REPOSITORY_BATCH_SIZE) -> Dict[str, Any]:
+    """Agregados por grupo de las interacciones guardadas en SQLite, leídas por lotes."""
+    aggregator = InteractionAggregator(group_by)
+    for record in iter_repository_records(repository, batch_size):
+        aggregator.add(record)
+    return aggregator.summary()
+
+
+if __name__ == "__main__":
+    from .persistence import INTERACTIONS_BACKEND, LOG_FILE, get_repository
+
+    parser = argparse.ArgumentParser(description="Agregados del historial de interacciones en memoria acotada.")
+    parser.add_argument("path", nargs="?", default=LOG_FILE,
+                        help="Log JSON Lines o array JSON legado (con --source jsonl)")
+    parser.add_argument("--source", choices=("sqlite", "jsonl"), default=INTERACTIONS_BACKEND)
+    parser.add_argument("--group-by", choices=sorted(GROUP_KEYS), default=None)
+    parser.add_argument("--workers", type=int, default=1, help="Procesos para leer el log JSONL por tramos")
+    parser.add_argument("--batch-size", type=int, default=REPOSITORY_BATCH_SIZE,
+                        help="Filas leídas de SQLite por consulta")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.source == "jsonl":
+        if not os.path.exists(args.path):
+            sys.exit(f"No existe el archivo {args.path}")
+        summary = aggregate_log(args.path, args.group_by, args.workers)
+    else:
+        summary = aggregate_repository(get_repository() or SQLiteInteractionRepository(), args.group_by,
+                                       args.batch_size)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
@@ -0,0 +1,124 @@
+"""
+Comparación de la huella por empleado contra el historial de interacciones.
+Se mantiene un índice ordenado (global y por rango de empleados) que se construye
+una sola vez y se actualiza con bisect en cada guardado, de modo que ubicar a una
+empresa en el ranking cuesta O(log N) en lugar de recorrer todo el historial.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rangos de cantidad de empleados (mínimo, máximo inclusive; None = sin tope)
+EMPLOYEE_BANDS: Tuple[Tuple[int, Optional[int]], ...] = ((1, 9), (10, 49), (50, 249), (250, None))
+
+
+class PercentileRank(NamedTuple):
+    """
+    Ubicación de una huella por empleado dentro de un grupo de empresas.
+    percentile: % de empresas del grupo con mayor huella (100 = la mejor); los empates cuentan a medias.
+    position: puesto en el ranking (1 = menor huella). total: empresas comparadas.
+    """
+    percentile: float
+    position: int
+    total: int
+    band: Optional[str] = None
+
+
+def employee_band(employee_count: Optional[int]) -> Optional[str]:
+    """Etiqueta del rango de empleados ("10-49", "250+"), o None si no hay dato."""
+    if not employee_count or employee_count < 1:
+        return None
+    for low, high in EMPLOYEE_BANDS:
+        if high is None or employee_count <= high:
+            return f"{low}+" if high is None else f"{low}-{high}"
+    return None
+
+
+def _record_values(record: Dict[str, Any]) -> Optional[Tuple[float, Optional[int]]]:
+    """(huella por empleado, empleados) de un registro guardado, o None si no tiene resultado."""
+    try:
+        per_employee = float(record.get("carbon_per_employee"))
+    except (TypeError, ValueError):
+        return None
+    if per_employee <= 0:
+        return None
+    try:
+        employee_count = int(record.get("employee_count"))
+    except (TypeError, ValueError):
+        employee_count = None
+    return per_employee, employee_count
+
+
+def _rank(values: List[float], per_employee: float, band: Optional[str] = None) -> Optional[PercentileRank]:
+    total = len(values)
+    if total == 0:
+        return None
+    lower = bisect_left(values, per_employee)
+    higher = total - bisect_right(values, per_employee)
+    ties = total - lower - higher
+    return PercentileRank(100 * (higher + ties / 2) / total, lower + 1, total, band)
+
+
+class FootprintPercentileIndex:
+    """Huellas por empleado ordenadas, en total y por rango de empleados."""
+
+    def __init__(self):
+        self._values: List[float] = []
+        self._by_band: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "FootprintPercentileIndex":
+        """Construye el índice con un único ordenamiento (O(N log N))."""
+        index = cls()
+        for record in records:
+            values = _record_values(record)
+            if values is None:
+                continue
+            per_employee, employee_count = values
+            index._values.append(per_employee)
+            band = employee_band(employee_count)
+            if band:
+                index._by_band.setdefault(band, []).append(per_employee)
+        index._values.sort()
+        for values in index._by_band.values():
+            values.sort()
+        logger.info(f"Índice de percentiles construido con {len(index._values)} interacciones.")
+        return index
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, per_employee: float, employee_count: Optional[int] = None) -> None:
+        """Inserta una huella manteniendo el orden (búsqueda O(log N))."""
+        band = employee_band(employee_count)
+        with self._lock:
+            insort(self._values, per_employee)
+            if band:
+                insort(self._by_band.setdefault(band, []), per_employee)
+
+    def add_record(self, record: Dict[str, Any]) -> bool:
+        """Agrega un registro guardado si tiene resultado. Devuelve True si se indexó."""
+        values = _record_values(record)
+        if values is None:
+            return False
+        self.add(*values)
+        return True
+
+    def rank(self, per_employee: float, employee_count: Optional[int] = None) -> Optional[PercentileRank]:
+        """
+        Ubica la huella entre todas las interacciones guardadas o, si se indica
+        employee_count, sólo entre las de su mismo rango de empleados.
+        None si no hay empresas con las que comparar.
+        """
+        band = employee_band(employee_count) if employee_count is not None else None
+        with self._lock:
+            if employee_count is None:
+                return _rank(self._values, per_employee)
+            if band is None:
+                return None
+            return _rank(self._by_band.get(band, []), per_employee, band)
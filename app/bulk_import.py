@@ -0,0 +1,221 @@
+"""
+Importación masiva de empresas desde CSV/Excel, sin pasar por la conversación.
+Las columnas son los campos del GraphState (company_name, employee_count,
+electricity_kwh, ...). La validación se hace por columna sobre toda la tabla, la
+huella de las filas válidas se calcula con calculate_carbon_footprint_batch y los
+registros se guardan de una vez en el backend configurado (INTERACTIONS_BACKEND): una
+transacción en SQLite o un bloque al final del log JSONL. Las filas con errores no
+se importan y se informan con su número de fila en el archivo.
+
+Uso: python -m app.bulk_import empresas.csv [--errors errores.csv] [--country argentina] [--dry-run]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import typing
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .state import GraphState
+from .carbon_calculator import BREAKDOWN_CATEGORIES, INPUT_COLUMNS, calculate_carbon_footprint_batch
+from .emission_factors import FactorSet, get_factor_set
+from .interaction_repository import SQLiteInteractionRepository
+from . import persistence
+
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = ("company_name", "responsible_name")
+REQUIRED_FIELDS = ("employee_count",)
+TRANSPORT_PCT_FIELDS = ("transport_pct_car", "transport_pct_public", "transport_pct_green")
+
+# Fila del archivo en la que está el primer registro (la 1 es el encabezado)
+FIRST_DATA_ROW = 2
+
+
+def _field_kinds() -> Dict[str, Union[type, Tuple[str, ...]]]:
+    """Campos importables: int, float, str o la tupla de opciones válidas (Literal)."""
+    kinds: Dict[str, Union[type, Tuple[str, ...]]] = {name: str for name in TEXT_FIELDS}
+    for name in INPUT_COLUMNS:
+        annotation = GraphState.model_fields[name].annotation
+        if typing.get_origin(annotation) is typing.Literal:
+            kinds[name] = tuple(value for value in typing.get_args(annotation) if value is not None)
+        else:
+            kinds[name] = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+    return kinds
+
+
+FIELD_KINDS = _field_kinds()
+
+
+class RowError(NamedTuple):
+    """Error de validación de una fila (número de fila del archivo, con el encabezado en la 1)."""
+    row: int
+    field: str
+    value: Any
+    message: str
+
+
+class ImportResult(NamedTuple):
+    imported: int
+    rejected: int
+    errors: List[RowError]
+    results: pd.DataFrame  # Datos y huella de las filas importadas
+
+
+def read_companies(path: str, sep: str = ",") -> pd.DataFrame:
+    """Lee el archivo como texto (la conversión de tipos se hace al validar)."""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        return pd.read_excel(path, dtype=object)
+    return pd.read_csv(path, sep=sep, dtype=str, keep_default_na=False)
+
+
+def _blank(raw: pd.Series) -> np.ndarray:
+    return (raw.isna() | (raw.astype(str).str.strip() == "")).to_numpy()
+
+
+def _collect(errors: List[RowError], mask: np.ndarray, rows: np.ndarray, field: str,
+             raw: pd.Series, message: str) -> None:
+    for position in np.flatnonzero(mask):
+        errors.append(RowError(int(rows[position]), field, raw.iloc[position], message))
+
+
+def validate_companies(data: pd.DataFrame, decimal: str = ".") -> Tuple[pd.DataFrame, List[RowError]]:
+    """
+    Valida y tipa toda la tabla por columnas.
+    Devuelve (filas válidas con los campos tipados, errores por fila ordenados por fila).
+    """
+    data = data.rename(columns=lambda column: str(column).strip().lower()).reset_index(drop=True)
+    unknown = [column for column in data.columns if column not in FIELD_KINDS]
+    if unknown:
+        logger.warning(f"Columnas ignoradas en la importación: {', '.join(unknown)}")
+    rows = np.arange(len(data)) + FIRST_DATA_ROW
+    errors: List[RowError] = []
+    typed: Dict[str, pd.Series] = {}
+    empty = pd.Series([None] * len(data), dtype=object)
+
+    for field, kind in FIELD_KINDS.items():
+        raw = data[field] if field in data else empty
+        blank = _blank(raw)
+        if field in REQUIRED_FIELDS:
+            _collect(errors, blank, rows, field, raw, "Dato obligatorio")
+        if kind is str:
+            typed[field] = raw.astype(object).where(~blank, None).map(lambda v: v if v is None else str(v).strip())
+        elif isinstance(kind, tuple):
+            values = raw.astype(str).str.strip().str.lower()
+            invalid = ~blank & ~values.isin(kind).to_numpy()
+            _collect(errors, invalid, rows, field, raw, f"Valor no válido (opciones: {', '.join(kind)})")
+            typed[field] = values.astype(object).where(~blank & ~invalid, None)
+        else:
+            text = raw.astype(str).str.strip()
+            if decimal != ".":
+                text = text.str.replace(decimal, ".", regex=False)
+            numbers = pd.to_numeric(text.where(~blank), errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            invalid = ~blank & np.isnan(numbers)
+            _collect(errors, invalid, rows, field, raw, "No es un número")
+            valid = ~blank & ~invalid
+            checks = [(numbers < 0, "No puede ser negativo")]
+            if kind is int:
+                checks.append((numbers != np.floor(numbers), "Debe ser un número entero"))
+            if field in REQUIRED_FIELDS:
+                checks.append((numbers == 0, "Debe ser mayor a 0"))
+            if field in TRANSPORT_PCT_FIELDS or field == "recycle_pct":
+                checks.append((numbers > 100, "El porcentaje debe estar entre 0 y 100"))
+            for failed, message in checks:
+                failed = valid & failed
+                _collect(errors, failed, rows, field, raw, message)
+                valid &= ~failed
+            numbers[~valid] = np.nan
+            typed[field] = pd.Series(numbers).astype("Int64" if kind is int else "float64")
+
+    pct_total = sum(typed[field].fillna(0).to_numpy(dtype=np.float64) for field in TRANSPORT_PCT_FIELDS)
+    _collect(errors, pct_total > 100, rows, "transport_pct_*", pd.Series(pct_total),
+             "Los porcentajes de transporte suman más de 100")
+
+    errors.sort(key=lambda error: error.row)
+    rejected = np.zeros(len(data), dtype=bool)
+    rejected[[error.row - FIRST_DATA_ROW for error in errors]] = True
+    table = pd.DataFrame(typed)
+    table.insert(0, "row", rows)
+    return table[~rejected].reset_index(drop=True), errors
+
+
+def _python_values(column: pd.Series) -> List[Any]:
+    """Valores nativos de Python con None para los faltantes (para SQLite/JSON)."""
+    if column.dtype == "Int64":
+        return [None if value is pd.NA else int(value) for value in column]
+    if column.dtype == "float64":
+        return [None if np.isnan(value) else float(value) for value in column.to_numpy()]
+    return column.tolist()
+
+
+def build_records(table: pd.DataFrame, results: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Registros con el mismo formato que build_interaction_record más los resultados del cálculo."""
+    timestamp = datetime.datetime.now().isoformat()
+    columns = {field: _python_values(table[field]) for field in FIELD_KINDS}
+    columns["carbon_footprint"] = _python_values(results["total_footprint"])
+    columns["carbon_per_employee"] = _python_values(results["per_employee"])
+    columns["sustainability_score"] = results["sustainability_score"].astype(int).tolist()
+    columns["factor_version"] = results["factor_version"].tolist()
+    columns["factor_country"] = results["factor_country"].tolist()
+    breakdown = results[list(BREAKDOWN_CATEGORIES)].to_numpy(dtype=np.float64).tolist()
+    columns["footprint_breakdown"] = [dict(zip(BREAKDOWN_CATEGORIES, values)) for values in breakdown]
+    names = list(columns)
+    return [
+        {"interaction_id": str(uuid.uuid4()), "timestamp": timestamp, **dict(zip(names, values))}
+        for values in zip(*columns.values())
+    ]
+
+
+def import_companies(data: Union[str, pd.DataFrame], repository: Optional[SQLiteInteractionRepository] = None,
+                     country: str = "default", factors: Optional[FactorSet] = None, dry_run: bool = False,
+                     sep: str = ",", decimal: str = ".") -> ImportResult:
+    """
+    Valida, calcula y guarda todas las empresas del archivo (o DataFrame).
+    Las filas válidas se guardan de una vez en repository o, si no se indica, en el backend
+    configurado; con dry_run no se guarda nada.
+    """
+    table = read_companies(data, sep) if isinstance(data, str) else data
+    valid, errors = validate_companies(table, decimal)
+    factors = factors or get_factor_set(country)
+    results = calculate_carbon_footprint_batch(valid, factors=factors)
+    imported = len(valid)
+    if imported and not dry_run:
+        records = build_records(valid, results)
+        if repository is not None:
+            repository.bulk_insert(records)
+        else:
+            persistence.save_interaction_records(records)
+        persistence.reset_percentile_index()  # Se reconstruye con las empresas importadas
+    logger.info(f"Importación: {imported} empresas válidas, {len(table) - imported} rechazadas.")
+    return ImportResult(imported, len(table) - imported, errors, pd.concat([valid, results], axis=1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa empresas desde CSV/Excel y calcula su huella.")
+    parser.add_argument("path", help="Archivo .csv, .xlsx o .xls con columnas con los nombres de campo del GraphState")
+    parser.add_argument("--errors", help="CSV donde escribir los errores por fila")
+    parser.add_argument("--country", default=os.getenv("CARBON_COUNTRY", "default"))
+    parser.add_argument("--sep", default=",", help="Separador del CSV")
+    parser.add_argument("--decimal", default=".", help="Separador decimal de los números")
+    parser.add_argument("--dry-run", action="store_true", help="Sólo valida y calcula, sin guardar")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if not os.path.exists(args.path):
+        sys.exit(f"No existe el archivo {args.path}")
+    result = import_companies(args.path, country=args.country, dry_run=args.dry_run,
+                              sep=args.sep, decimal=args.decimal)
+    if args.errors:
+        pd.DataFrame(result.errors, columns=RowError._fields).to_csv(args.errors, index=False)
+    for error in result.errors[:20]:
+        print(f"Fila {error.row}, {error.field} = {error.value!r}: {error.message}")
+    if len(result.errors) > 20:
+        print(f"... y {len(result.errors) - 20} errores más")
+    action = "validadas" if args.dry_run else "importadas"
+    print(f"{result.imported} empresas {action}, {result.rejected} rechazadas.")
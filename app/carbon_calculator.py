@@ -3,240 +3,422 @@ Módulo para calcular la huella de carbono empresarial.
 Incluye factores de emisión y funciones de cálculo para diferentes categorías.
 """
 
-from typing import Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple, Union
 from .state import GraphState, FuelType, ClimateControlType
+from .emission_factors import FactorSet, get_factor_registry, get_factor_set
 import logging
 
+import numpy as np
+import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 # --- Factores de Emisión (kg CO₂e) ---
+# Los factores viven en el registro versionado (emission_factors.json). Estos diccionarios
+# son una vista de sólo consulta de la versión vigente al importar el módulo.
+
+_CURRENT_FACTORS = get_factor_set()
 
 # Electricidad (kg CO₂e por kWh) - Varía según país y matriz energética
-ELECTRICITY_FACTORS = {
-    "default": 0.385,     # Promedio global aproximado
-    "argentina": 0.310,   # Factor para Argentina
-    "mexico": 0.494,      # Factor para México
-    "colombia": 0.199,    # Factor para Colombia (más renovable)
-    "españa": 0.250,      # Factor para España
-}
+ELECTRICITY_FACTORS = {country: get_factor_set(country).get("electricidad")
+                       for country in get_factor_registry().countries()}
 
 # Combustibles (kg CO₂e por litro o m³)
-FUEL_FACTORS = {
-    "gasolina": 2.31,     # kg CO₂e por litro
-    "diesel": 2.68,       # kg CO₂e por litro
-    "gas_natural": 2.07,  # kg CO₂e por m³
-    "electricidad": 0.0,  # Contabilizado en electricidad
-    "ninguno": 0.0
-}
+FUEL_FACTORS = _CURRENT_FACTORS.group("combustible")
 
 # Transporte (kg CO₂e por km por persona)
-TRANSPORT_FACTORS = {
-    "auto": 0.17,         # Emisión por km en auto privado
-    "publico": 0.09,      # Emisión por km en transporte público
-    "verde": 0.0          # Sin emisiones (bicicleta, caminar)
-}
+TRANSPORT_FACTORS = _CURRENT_FACTORS.group("transporte")
 
 # Viajes (kg CO₂e por km)
-TRAVEL_FACTORS = {
-    "avion_corto": 0.158,  # Vuelos < 1500 km
-    "avion_largo": 0.115,  # Vuelos > 1500 km (más eficientes por km)
-    "tren": 0.035,         # Tren
-    "bus": 0.068           # Autobús/Ómnibus
-}
+TRAVEL_FACTORS = _CURRENT_FACTORS.group("viajes")
 
 # Residuos (kg CO₂e por kg)
-WASTE_FACTORS = {
-    "vertedero": 0.586,    # Residuos a vertedero
-    "reciclado": 0.058     # Residuos reciclados (menor, pero no cero)
-}
+WASTE_FACTORS = _CURRENT_FACTORS.group("residuos")
 
-# Agua (kg CO₂e por m³)
-WATER_FACTOR = 0.344
+# Agua (kg CO₂e por m³) y papel (kg CO₂e por kg)
+WATER_FACTOR = _CURRENT_FACTORS.get("agua")
+PAPER_FACTOR = _CURRENT_FACTORS.get("papel")
 
-# Papel (kg CO₂e por kg)
-PAPER_FACTOR = 1.50
+# Infraestructura (kg CO₂e por m² al mes)
+BUILDING_FACTOR = _CURRENT_FACTORS.get("infraestructura")
 
-# Infraestructura (kg CO₂e por m² por año, convertido a mensual)
-BUILDING_FACTOR = 7.5 / 12  # Emisiones por m² de oficina al mes
+# Ajuste de la huella de infraestructura según el tipo de climatización
+CLIMATE_ADJUSTMENTS = _CURRENT_FACTORS.group("climatizacion")
 
 # --- Funciones de Cálculo ---
+# Cada categoría del desglose es una función (estado, factores, supuestos) -> kg CO₂e y
+# CATEGORY_DEPENDENCIES indica qué campos del GraphState la alimentan, de modo que
+# al corregir un dato sólo se recalculan las categorías afectadas. Las funciones sólo
+# usan aritmética, así que factores y supuestos pueden ser arrays de muestras (uncertainty).
 
-def calculate_carbon_footprint(state: GraphState, country: str = "default") -> Dict[str, Any]:
-    """
-    Calcula la huella de carbono total y por categoría.
-    Devuelve un diccionario con los resultados.
-    """
-    # Diccionario para almacenar resultados
-    results = {}
-    
-    # Seleccionar factor de electricidad según país
-    electricity_factor = ELECTRICITY_FACTORS.get(country.lower(), ELECTRICITY_FACTORS["default"])
-    
-    # 1. Cálculo de emisiones por electricidad
-    electricity_footprint = 0
+# Reparto del transporte asumido cuando falta la respuesta (defaults conservadores)
+DEFAULT_PCT_CAR = 60
+DEFAULT_PCT_PUBLIC = 30
+
+
+class Assumptions(NamedTuple):
+    """Supuestos del cálculo que no son factores de emisión."""
+    work_days: float = 22            # Días laborables promedio al mes
+    air_short_share: float = 0.5     # Fracción de km aéreos en vuelos cortos
+    train_share: float = 0.5         # Fracción de km terrestres en tren
+    pct_car: float = DEFAULT_PCT_CAR        # Transporte en auto cuando falta la respuesta
+    pct_public: float = DEFAULT_PCT_PUBLIC  # Transporte público cuando falta la respuesta
+
+
+DEFAULT_ASSUMPTIONS = Assumptions()
+
+# Umbrales anuales por empleado (toneladas CO₂e) para el puntaje de sostenibilidad
+MIN_ANNUAL_PER_EMPLOYEE = 0.5   # muy bueno
+MAX_ANNUAL_PER_EMPLOYEE = 10.0  # muy malo
+
+
+def _electricity_footprint(state: GraphState, factors: FactorSet,
+                           assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
     if state.electricity_kwh:
-        electricity_footprint = state.electricity_kwh * electricity_factor
-        logger.info(f"Huella eléctrica: {electricity_footprint:.2f} kg CO₂e")
-    
-    # 2. Cálculo de emisiones por combustible
-    fuel_footprint = 0
+        return state.electricity_kwh * factors.get("electricidad")
+    return 0
+
+
+def _fuel_footprint(state: GraphState, factors: FactorSet,
+                    assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
     if state.fuel_type and state.fuel_consumption:
-        fuel_factor = FUEL_FACTORS.get(state.fuel_type, 0)
-        fuel_footprint = state.fuel_consumption * fuel_factor
-        logger.info(f"Huella combustible ({state.fuel_type}): {fuel_footprint:.2f} kg CO₂e")
-    
-    # 3. Cálculo de emisiones por gas
-    gas_footprint = 0
+        return state.fuel_consumption * factors.get(f"combustible.{state.fuel_type}", 0)
+    return 0
+
+
+def _gas_footprint(state: GraphState, factors: FactorSet,
+                   assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
     if state.gas_consumption:
-        gas_footprint = state.gas_consumption * FUEL_FACTORS["gas_natural"]
-        logger.info(f"Huella gas: {gas_footprint:.2f} kg CO₂e")
-    
-    # 4. Cálculo de emisiones por transporte de empleados
-    transport_footprint = 0
-    if state.employee_count and state.employee_commute_distance:
-        # Días laborables promedio al mes
-        work_days = 22
-        
-        # Asegurar que tenemos porcentajes para las categorías (defaults conservadores)
-        pct_car = state.transport_pct_car or 60
-        pct_public = state.transport_pct_public or 30
-        pct_green = state.transport_pct_green or 10
-        
-        # Emisiones diarias por categoría
-        car_emissions = (state.employee_commute_distance * TRANSPORT_FACTORS["auto"] * 
-                         state.employee_count * (pct_car / 100))
-        public_emissions = (state.employee_commute_distance * TRANSPORT_FACTORS["publico"] * 
-                            state.employee_count * (pct_public / 100))
-        # Las emisiones "verdes" son cero
-        
-        # Emisiones mensuales (ida y vuelta)
-        transport_footprint = (car_emissions + public_emissions) * work_days * 2
-        logger.info(f"Huella transporte empleados: {transport_footprint:.2f} kg CO₂e")
-    
-    # 5. Cálculo de emisiones por residuos
-    waste_footprint = 0
-    if state.waste_kg:
-        # Porcentaje enviado a vertedero vs reciclado
-        pct_recycle = state.recycle_pct or 0
-        pct_landfill = 100 - pct_recycle
-        
-        # Calcular emisiones
-        waste_footprint = (state.waste_kg * (pct_landfill / 100) * WASTE_FACTORS["vertedero"] + 
-                           state.waste_kg * (pct_recycle / 100) * WASTE_FACTORS["reciclado"])
-        logger.info(f"Huella residuos: {waste_footprint:.2f} kg CO₂e")
-    
-    # 6. Cálculo de emisiones por agua
-    water_footprint = 0
+        return state.gas_consumption * factors.get("combustible.gas_natural")
+    return 0
+
+
+def _transport_footprint(state: GraphState, factors: FactorSet,
+                         assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
+    if not (state.employee_count and state.employee_commute_distance):
+        return 0
+    # Asegurar que tenemos porcentajes para las categorías (defaults conservadores).
+    # Las emisiones "verdes" son cero, así que su porcentaje no interviene.
+    pct_car = state.transport_pct_car or assumptions.pct_car
+    pct_public = state.transport_pct_public or assumptions.pct_public
+
+    # Emisiones diarias por categoría
+    car_emissions = (state.employee_commute_distance * factors.get("transporte.auto") *
+                     state.employee_count * (pct_car / 100))
+    public_emissions = (state.employee_commute_distance * factors.get("transporte.publico") *
+                        state.employee_count * (pct_public / 100))
+
+    # Emisiones mensuales (ida y vuelta)
+    return (car_emissions + public_emissions) * assumptions.work_days * 2
+
+
+def _waste_footprint(state: GraphState, factors: FactorSet,
+                     assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
+    if not state.waste_kg:
+        return 0
+    # Porcentaje enviado a vertedero vs reciclado
+    pct_recycle = state.recycle_pct or 0
+    pct_landfill = 100 - pct_recycle
+    return (state.waste_kg * (pct_landfill / 100) * factors.get("residuos.vertedero") +
+            state.waste_kg * (pct_recycle / 100) * factors.get("residuos.reciclado"))
+
+
+def _water_footprint(state: GraphState, factors: FactorSet,
+                     assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
     if state.water_consumption:
-        water_footprint = state.water_consumption * WATER_FACTOR
-        logger.info(f"Huella agua: {water_footprint:.2f} kg CO₂e")
-    
-    # 7. Cálculo de emisiones por papel
-    paper_footprint = 0
+        return state.water_consumption * factors.get("agua")
+    return 0
+
+
+def _paper_footprint(state: GraphState, factors: FactorSet,
+                     assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
     if state.paper_consumption:
-        paper_footprint = state.paper_consumption * PAPER_FACTOR
-        logger.info(f"Huella papel: {paper_footprint:.2f} kg CO₂e")
-    
-    # 8. Cálculo de emisiones por infraestructura
-    building_footprint = 0
-    if state.office_sqm:
-        building_footprint = state.office_sqm * BUILDING_FACTOR
-        # Ajustar según el tipo de climatización
-        if state.climate_control:
-            adjustment = {
-                "aire_acondicionado": 1.5,
-                "calefaccion_gas": 1.3,
-                "calefaccion_electrica": 1.2,
-                "bomba_calor": 1.1,
-                "natural": 0.8
-            }.get(state.climate_control, 1.0)
-            building_footprint *= adjustment
-        logger.info(f"Huella infraestructura: {building_footprint:.2f} kg CO₂e")
-    
-    # 9. Cálculo de emisiones por viajes
+        return state.paper_consumption * factors.get("papel")
+    return 0
+
+
+def _building_footprint(state: GraphState, factors: FactorSet,
+                        assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
+    if not state.office_sqm:
+        return 0
+    building_footprint = state.office_sqm * factors.get("infraestructura")
+    # Ajustar según el tipo de climatización
+    if state.climate_control:
+        building_footprint *= factors.get(f"climatizacion.{state.climate_control}", 1.0)
+    return building_footprint
+
+
+def _travel_footprint(state: GraphState, factors: FactorSet,
+                      assumptions: Assumptions = DEFAULT_ASSUMPTIONS) -> float:
     travel_footprint = 0
-    # Simplificación: dividir viajes aéreos 50/50 entre cortos y largos
+    # Simplificación: dividir viajes aéreos entre cortos y largos (50/50)
     if state.air_travel_km:
-        air_short = state.air_travel_km * 0.5
-        air_long = state.air_travel_km * 0.5
-        air_footprint = (air_short * TRAVEL_FACTORS["avion_corto"] + 
-                         air_long * TRAVEL_FACTORS["avion_largo"])
-        travel_footprint += air_footprint
-    
-    # Simplificación: dividir viajes terrestres 50/50 entre tren y bus
+        air_short = state.air_travel_km * assumptions.air_short_share
+        air_long = state.air_travel_km * (1 - assumptions.air_short_share)
+        travel_footprint += (air_short * factors.get("viajes.avion_corto") +
+                             air_long * factors.get("viajes.avion_largo"))
+    # Simplificación: dividir viajes terrestres entre tren y bus (50/50)
     if state.ground_travel_km:
-        train = state.ground_travel_km * 0.5
-        bus = state.ground_travel_km * 0.5
-        ground_footprint = (train * TRAVEL_FACTORS["tren"] + 
-                            bus * TRAVEL_FACTORS["bus"])
-        travel_footprint += ground_footprint
-    
-    logger.info(f"Huella viajes: {travel_footprint:.2f} kg CO₂e")
-    
-    # 10. Suma total de emisiones (kg CO₂e)
-    total_footprint = (electricity_footprint + fuel_footprint + gas_footprint + 
-                       transport_footprint + waste_footprint + water_footprint + 
-                       paper_footprint + building_footprint + travel_footprint)
-    
-    # Convertir a toneladas
-    total_footprint_tons = total_footprint / 1000
-    
-    # Huella por empleado
+        train = state.ground_travel_km * assumptions.train_share
+        bus = state.ground_travel_km * (1 - assumptions.train_share)
+        travel_footprint += (train * factors.get("viajes.tren") +
+                             bus * factors.get("viajes.bus"))
+    return travel_footprint
+
+
+# Categorías del desglose, en el orden del cálculo, con su función y los campos de los que dependen
+CATEGORY_FUNCTIONS: Dict[str, Callable[..., float]] = {
+    "electricidad": _electricity_footprint,
+    "combustible": _fuel_footprint,
+    "gas": _gas_footprint,
+    "transporte_empleados": _transport_footprint,
+    "residuos": _waste_footprint,
+    "agua": _water_footprint,
+    "papel": _paper_footprint,
+    "infraestructura": _building_footprint,
+    "viajes": _travel_footprint,
+}
+CATEGORY_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "electricidad": ("electricity_kwh",),
+    "combustible": ("fuel_type", "fuel_consumption"),
+    "gas": ("gas_consumption",),
+    "transporte_empleados": ("employee_count", "employee_commute_distance",
+                             "transport_pct_car", "transport_pct_public"),
+    "residuos": ("waste_kg", "recycle_pct"),
+    "agua": ("water_consumption",),
+    "papel": ("paper_consumption",),
+    "infraestructura": ("office_sqm", "climate_control"),
+    "viajes": ("air_travel_km", "ground_travel_km"),
+}
+BREAKDOWN_CATEGORIES = tuple(CATEGORY_FUNCTIONS)
+
+# Índice inverso: campo -> categorías que lo usan
+FIELD_CATEGORIES: Dict[str, Tuple[str, ...]] = {}
+for _category, _fields in CATEGORY_DEPENDENCIES.items():
+    for _field in _fields:
+        FIELD_CATEGORIES[_field] = FIELD_CATEGORIES.get(_field, ()) + (_category,)
+
+
+def affected_categories(fields: Iterable[str]) -> Tuple[str, ...]:
+    """Categorías que dependen de alguno de los campos, en el orden del desglose."""
+    affected = {category for field in fields for category in FIELD_CATEGORIES.get(field, ())}
+    return tuple(category for category in BREAKDOWN_CATEGORIES if category in affected)
+
+
+def sustainability_score(per_employee: float) -> int:
+    """
+    Puntaje 0-100 (más alto = mejor) a partir de la huella mensual por empleado,
+    comparada en términos anuales con los valores de referencia para pequeñas empresas.
+    """
+    if per_employee <= 0:
+        return 50  # Valor por defecto si no hay datos suficientes
+    annual_per_employee = per_employee * 12
+    if annual_per_employee <= MIN_ANNUAL_PER_EMPLOYEE:
+        return 100
+    if annual_per_employee >= MAX_ANNUAL_PER_EMPLOYEE:
+        return 0
+    # Escala inversa: mayor huella = menor puntaje
+    return int(100 * (MAX_ANNUAL_PER_EMPLOYEE - annual_per_employee) /
+               (MAX_ANNUAL_PER_EMPLOYEE - MIN_ANNUAL_PER_EMPLOYEE))
+
+
+def _footprint_totals(category_kg: Mapping[str, float], employee_count: Optional[int]) -> Tuple[float, float, int]:
+    """(total en toneladas, toneladas por empleado, puntaje) a partir del desglose en kg."""
+    total_footprint_tons = sum(category_kg.get(name, 0) for name in BREAKDOWN_CATEGORIES) / 1000
     per_employee = 0
-    if state.employee_count and state.employee_count > 0:
-        per_employee = total_footprint_tons / state.employee_count
-    
-    # Desglose por categoría
-    footprint_breakdown = {
-        "electricidad": electricity_footprint / 1000,
-        "combustible": fuel_footprint / 1000,
-        "gas": gas_footprint / 1000,
-        "transporte_empleados": transport_footprint / 1000,
-        "residuos": waste_footprint / 1000,
-        "agua": water_footprint / 1000,
-        "papel": paper_footprint / 1000,
-        "infraestructura": building_footprint / 1000,
-        "viajes": travel_footprint / 1000
-    }
-    
-    # Cálculo de puntaje de sostenibilidad (0-100)
-    # Valores de referencia para pequeñas empresas
-    reference_per_employee = 3.5  # toneladas CO₂e por empleado al año (promedio)
-    min_per_employee = 0.5       # muy bueno
-    max_per_employee = 10.0      # muy malo
-    
-    # Normalizar la huella por empleado a un puntaje (más alto = mejor)
-    # Inversamente proporcional: menor huella = mayor puntaje
-    if per_employee > 0:
-        # Convertir la huella mensual a anual para comparar con referencias
-        annual_per_employee = per_employee * 12
-        
-        # Calcular puntaje normalizado
-        if annual_per_employee <= min_per_employee:
-            sustainability_score = 100
-        elif annual_per_employee >= max_per_employee:
-            sustainability_score = 0
-        else:
-            # Escala inversa: mayor huella = menor puntaje
-            sustainability_score = int(100 * (max_per_employee - annual_per_employee) / 
-                                       (max_per_employee - min_per_employee))
-    else:
-        sustainability_score = 50  # Valor por defecto si no hay datos suficientes
-    
-    # Empaquetar resultados
-    results = {
+    if employee_count and employee_count > 0:
+        per_employee = total_footprint_tons / employee_count
+    return total_footprint_tons, per_employee, sustainability_score(per_employee)
+
+
+def _footprint_results(category_kg: Dict[str, float], employee_count: Optional[int],
+                       factors: FactorSet) -> Dict[str, Any]:
+    total_footprint_tons, per_employee, score = _footprint_totals(category_kg, employee_count)
+    return {
         "total_footprint": total_footprint_tons,
         "per_employee": per_employee,
-        "breakdown": footprint_breakdown,
-        "sustainability_score": sustainability_score
+        "breakdown": {name: category_kg[name] / 1000 for name in BREAKDOWN_CATEGORIES},
+        "sustainability_score": score,
+        "factor_version": factors.version,
+        "factor_country": factors.country,
     }
-    
-    logger.info(f"Huella total: {total_footprint_tons:.2f} toneladas CO₂e")
-    logger.info(f"Huella por empleado: {per_employee:.2f} toneladas CO₂e")
-    logger.info(f"Puntaje sostenibilidad: {sustainability_score}/100")
-    
+
+
+def calculate_carbon_footprint(state: GraphState, country: str = "default",
+                               factors: Optional[FactorSet] = None) -> Dict[str, Any]:
+    """
+    Calcula la huella de carbono total y por categoría.
+    Usa los factores vigentes del país salvo que se indique otro FactorSet.
+    Devuelve un diccionario con los resultados y la versión de factores usada.
+    """
+    factors = factors or get_factor_set(country)
+    category_kg = {}
+    for name, function in CATEGORY_FUNCTIONS.items():
+        category_kg[name] = function(state, factors)
+        logger.info(f"Huella {name}: {category_kg[name]:.2f} kg CO₂e")
+
+    results = _footprint_results(category_kg, state.employee_count, factors)
+    logger.info(f"Huella total: {results['total_footprint']:.2f} toneladas CO₂e")
+    logger.info(f"Huella por empleado: {results['per_employee']:.2f} toneladas CO₂e")
+    logger.info(f"Puntaje sostenibilidad: {results['sustainability_score']}/100")
     return results
 
+
+class _UpdatedState:
+    """Vista del estado con algunos campos reemplazados, sin copiar el modelo completo."""
+    __slots__ = ("_state", "_updates")
+
+    def __init__(self, state: GraphState, updates: Mapping[str, Any]):
+        self._state = state
+        self._updates = updates
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self._updates:
+            return self._updates[name]
+        return getattr(self._state, name)
+
+
+def update_partial_footprint(state: GraphState, updates: Mapping[str, Any], country: str = "default",
+                             factors: Optional[FactorSet] = None) -> Optional[Dict[str, float]]:
+    """
+    Desglose parcial (kg CO₂e por categoría) tras aplicar 'updates' al estado, ya sea una
+    respuesta nueva o la corrección de un dato. Sólo se evalúan las categorías que dependen
+    de los campos cambiados; el resto se toma de state.partial_footprint. Devuelve None si
+    ningún campo afecta a la huella.
+    """
+    affected = affected_categories(updates)
+    if not affected:
+        return None
+    factors = factors or get_factor_set(country)
+    view = _UpdatedState(state, updates)
+    partial = dict(state.partial_footprint)
+    for name in affected:
+        partial[name] = CATEGORY_FUNCTIONS[name](view, factors)
+    return partial
+
+
+def summarize_partial_footprint(partial_kg: Mapping[str, float], employee_count: Optional[int]) -> Dict[str, Any]:
+    """Total, por empleado, puntaje y desglose (toneladas CO₂e) de una huella parcial."""
+    total_footprint, per_employee, score = _footprint_totals(partial_kg, employee_count)
+    return {
+        "total_footprint": total_footprint,
+        "per_employee": per_employee,
+        "sustainability_score": score,
+        "breakdown": {name: partial_kg[name] / 1000 for name in BREAKDOWN_CATEGORIES if name in partial_kg},
+    }
+
+
+# --- Cálculo vectorizado (muchas empresas a la vez) ---
+
+# Columnas de entrada (campos del GraphState)
+INPUT_COLUMNS = (
+    "employee_count", "electricity_kwh", "fuel_type", "fuel_consumption", "gas_consumption",
+    "employee_commute_distance", "transport_pct_car", "transport_pct_public", "transport_pct_green",
+    "waste_kg", "recycle_pct", "water_consumption", "paper_consumption", "office_sqm",
+    "climate_control", "air_travel_km", "ground_travel_km",
+)
+
+
+def _numeric_column(table: pd.DataFrame, name: str) -> np.ndarray:
+    """Columna como float64 con los faltantes (None/NaN) en 0, igual que 'if state.campo' en el cálculo escalar."""
+    if name not in table:
+        return np.zeros(len(table))
+    return pd.to_numeric(table[name], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+
+def _mapped_column(table: pd.DataFrame, name: str, factors: FactorSet, group: str, default: float) -> np.ndarray:
+    """Factor por fila para una columna categórica; se consulta el registro una vez por valor distinto."""
+    if name not in table:
+        return np.full(len(table), default)
+    codes, uniques = pd.factorize(table[name])
+    values = np.array([factors.get(f"{group}.{value}", default) for value in uniques] + [default], dtype=np.float64)
+    return values[codes]  # El código -1 (faltante) toma el último elemento: default
+
+
+def _or_default(values: np.ndarray, default: float) -> np.ndarray:
+    """Equivalente vectorizado de 'valor or default' (0 y faltantes toman el default)."""
+    return np.where(values != 0, values, default)
+
+
+def sustainability_scores(per_employee: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de sustainability_score (mismos umbrales y truncamiento)."""
+    annual = per_employee * 12
+    scaled = np.trunc(100 * (MAX_ANNUAL_PER_EMPLOYEE - annual) / (MAX_ANNUAL_PER_EMPLOYEE - MIN_ANNUAL_PER_EMPLOYEE))
+    return np.select([per_employee <= 0, annual <= MIN_ANNUAL_PER_EMPLOYEE, annual >= MAX_ANNUAL_PER_EMPLOYEE],
+                     [50, 100, 0], scaled).astype(np.int64)
+
+
+def calculate_carbon_footprint_batch(data: Union[pd.DataFrame, Mapping[str, Any]], country: str = "default",
+                                     factors: Optional[FactorSet] = None) -> pd.DataFrame:
+    """
+    Calcula la huella de muchas empresas en una sola pasada vectorizada.
+    'data' es una tabla columnar (DataFrame o dict de arrays) con los campos del GraphState;
+    las columnas ausentes cuentan como sin dato. Devuelve un DataFrame con el mismo índice y
+    las columnas total_footprint, per_employee, sustainability_score, factor_version, factor_country y una
+    por categoría del desglose (toneladas CO₂e). Los valores coinciden exactamente con calculate_carbon_footprint.
+    Para tablas muy grandes conviene pasar fuel_type/climate_control como dtype 'category'.
+    """
+    table = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    n = len(table)
+    col = lambda name: _numeric_column(table, name)
+
+    employees = col("employee_count")
+    factors = factors or get_factor_set(country)
+    electricity_factor = factors.get("electricidad")
+
+    # 1-3. Electricidad, combustible y gas
+    electricity = col("electricity_kwh") * electricity_factor
+    fuel = col("fuel_consumption") * _mapped_column(table, "fuel_type", factors, "combustible", 0.0)
+    gas = col("gas_consumption") * factors.get("combustible.gas_natural")
+
+    # 4. Transporte de empleados (22 días laborables, ida y vuelta)
+    distance = col("employee_commute_distance")
+    pct_car = _or_default(col("transport_pct_car"), DEFAULT_ASSUMPTIONS.pct_car)
+    pct_public = _or_default(col("transport_pct_public"), DEFAULT_ASSUMPTIONS.pct_public)
+    car_emissions = distance * factors.get("transporte.auto") * employees * (pct_car / 100)
+    public_emissions = distance * factors.get("transporte.publico") * employees * (pct_public / 100)
+    transport = np.where((employees != 0) & (distance != 0), (car_emissions + public_emissions) * DEFAULT_ASSUMPTIONS.work_days * 2, 0.0)
+
+    # 5-7. Residuos, agua y papel
+    waste_kg = col("waste_kg")
+    pct_recycle = col("recycle_pct")
+    pct_landfill = 100 - pct_recycle
+    waste = (waste_kg * (pct_landfill / 100) * factors.get("residuos.vertedero") +
+             waste_kg * (pct_recycle / 100) * factors.get("residuos.reciclado"))
+    water = col("water_consumption") * factors.get("agua")
+    paper = col("paper_consumption") * factors.get("papel")
+
+    # 8. Infraestructura ajustada por climatización
+    adjustment = _mapped_column(table, "climate_control", factors, "climatizacion", 1.0)
+    building = col("office_sqm") * factors.get("infraestructura") * adjustment
+
+    # 9. Viajes (50/50 avión corto/largo y tren/bus)
+    air_km = col("air_travel_km")
+    ground_km = col("ground_travel_km")
+    short, train = DEFAULT_ASSUMPTIONS.air_short_share, DEFAULT_ASSUMPTIONS.train_share
+    air = (air_km * short) * factors.get("viajes.avion_corto") + (air_km * (1 - short)) * factors.get("viajes.avion_largo")
+    ground = (ground_km * train) * factors.get("viajes.tren") + (ground_km * (1 - train)) * factors.get("viajes.bus")
+    travel = np.where(air_km != 0, air, 0.0) + np.where(ground_km != 0, ground, 0.0)
+
+    categories = (electricity, fuel, gas, transport, waste, water, paper, building, travel)
+    total = electricity + fuel + gas + transport + waste + water + paper + building + travel
+    total_tons = total / 1000
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_employee = np.where(employees > 0, total_tons / employees, 0.0)
+
+    score = sustainability_scores(per_employee)
+
+    result = pd.DataFrame({"total_footprint": total_tons, "per_employee": per_employee,
+                           "sustainability_score": score, "factor_version": factors.version,
+                           "factor_country": factors.country},
+                          index=table.index)
+    for name, values in zip(BREAKDOWN_CATEGORIES, categories):
+        result[name] = values / 1000
+    logger.info(f"Huella calculada en lote para {n} empresas.")
+    return result
+
+
 def get_score_category(score: int) -> str:
     """Devuelve la categoría de sostenibilidad según el puntaje."""
     if score >= 81:
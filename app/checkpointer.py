@@ -0,0 +1,399 @@
+"""
+Checkpointer de LangGraph persistido en SQLite (modo WAL).
+Reemplaza a MemorySaver: las conversaciones sobreviven a un reinicio y se retoman
+por thread_id, y la memoria del proceso no crece con la cantidad de sesiones.
+Como en MemorySaver, cada canal del estado se guarda aparte por versión (msgpack,
+comprimido con zlib si es grande), así que un checkpoint sólo agrega los canales
+que cambiaron. Los hilos sin actividad durante más de ttl_seconds se eliminan.
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "checkpoints.db")
+# Hilos abandonados: se eliminan tras este tiempo sin actividad (0 = nunca)
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+# Cada cuánto se buscan hilos vencidos (se hace al guardar, sin hilos de fondo)
+EVICTION_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_EVICTION_INTERVAL", "60"))
+# Valores serializados a partir de este tamaño se guardan comprimidos
+COMPRESS_MIN_BYTES = 512
+_ZLIB_SUFFIX = "+zlib"
+# Ancestros leídos por consulta al reconstruir el historial de un canal delta
+HISTORY_BATCH = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threads_updated_at ON threads(updated_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+_THREAD_TABLES = ("checkpoints", "blobs", "writes", "threads")
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """Checkpointer en disco con retome por thread_id y expiración de hilos abandonados."""
+
+    def __init__(self, path: str = CHECKPOINT_DB, ttl_seconds: float = CHECKPOINT_TTL_SECONDS,
+                 eviction_interval: float = EVICTION_INTERVAL_SECONDS, *, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.eviction_interval = eviction_interval
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._last_eviction = 0.0
+
+    # --- Conexión ---
+    def _connection(self) -> sqlite3.Connection:
+        """Una conexión por hilo, como en SQLiteInteractionRepository."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Serialización compacta ---
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return type_ + _ZLIB_SUFFIX, zlib.compress(data)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.endswith(_ZLIB_SUFFIX):
+            type_, data = type_[:-len(_ZLIB_SUFFIX)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # --- Expiración ---
+    def _touch(self, conn: sqlite3.Connection, thread_id: str) -> None:
+        conn.execute("INSERT INTO threads (thread_id, updated_at) VALUES (?, ?) "
+                     "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                     (thread_id, time.time()))
+
+    def _maybe_evict(self) -> None:
+        now = time.monotonic()
+        if self.ttl_seconds > 0 and now - self._last_eviction >= self.eviction_interval:
+            self._last_eviction = now
+            self.evict_expired()
+
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Elimina los hilos sin actividad durante más de ttl_seconds. Devuelve cuántos se eliminaron."""
+        if self.ttl_seconds <= 0:
+            return 0
+        cutoff = (now if now is not None else time.time()) - self.ttl_seconds
+        conn = self._connection()
+        with conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT thread_id FROM threads WHERE updated_at < ?", (cutoff,))]
+            for thread_id in expired:
+                self._delete(conn, thread_id)
+        if expired:
+            logger.info(f"Eliminados {len(expired)} hilos de conversación inactivos de {self.path}.")
+        return len(expired)
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, thread_id: str) -> None:
+        for table in _THREAD_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def delete_thread(self, thread_id: str) -> None:
+        conn = self._connection()
+        with conn:
+            self._delete(conn, thread_id)
+
+    def thread_count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    # --- Lectura ---
+    def _tuple(self, conn: sqlite3.Connection, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint = self._load(type_, data)
+        versions = checkpoint["channel_versions"]
+        channel_values = {}
+        if versions:
+            # Sólo el valor de cada canal en la versión vigente de este checkpoint
+            clauses = " OR ".join("(channel = ? AND version = ?)" for _ in versions)
+            params = [item for channel, version in versions.items() for item in (channel, str(version))]
+            for channel, blob_type, value in conn.execute(
+                    f"SELECT channel, type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                    f"AND ({clauses})", (thread_id, checkpoint_ns, *params)):
+                if blob_type != "empty":
+                    channel_values[channel] = self._load(blob_type, value)
+        writes = conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? ORDER BY task_path, task_id, idx", (thread_id, checkpoint_ns, checkpoint_id))
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self._load(metadata_type, metadata),
+            parent_config=({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                             "checkpoint_id": parent_id}} if parent_id else None),
+            pending_writes=[(task_id, channel, self._load(type_, value)) for task_id, channel, type_, value in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self._maybe_evict()
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        columns = ("thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                   "metadata_type, metadata")
+        conn = self._connection()
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute(f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                               f"AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+        else:
+            row = conn.execute(f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                               f"ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+        return self._tuple(conn, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?"); params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                clauses.append("checkpoint_ns = ?"); params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?"); params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?"); params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._connection()
+        rows = conn.execute(
+            f"SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC", params).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._load(row[6], row[7])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._tuple(conn, row)
+
+    def get_delta_channel_history(self, *, config: RunnableConfig,
+                                  channels: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Igual que la implementación base (recorre los ancestros hasta la última copia
+        completa de cada canal), pero consultando sólo las escrituras y blobs de los
+        canales pedidos en lugar de reconstruir cada checkpoint ancestro completo.
+        """
+        if not channels:
+            return {}
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        conn = self._connection()
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute("SELECT parent_checkpoint_id FROM checkpoints WHERE thread_id = ? "
+                               "AND checkpoint_ns = ? AND checkpoint_id = ?",
+                               (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+        else:
+            row = conn.execute("SELECT parent_checkpoint_id FROM checkpoints WHERE thread_id = ? "
+                               "AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                               (thread_id, checkpoint_ns)).fetchone()
+        cursor = row[0] if row else None
+        collected: Dict[str, List[Tuple[str, str, Any]]] = {channel: [] for channel in channels}
+        seeds: Dict[str, Any] = {}
+        remaining = set(channels)
+        checked: Dict[Tuple[str, str], bool] = {}  # (canal, versión) -> tiene copia completa
+        while cursor is not None and remaining:
+            # Ancestros de a tramos: la cadena, y luego sus escrituras, en una consulta cada una
+            chain = conn.execute(
+                "WITH RECURSIVE chain(checkpoint_id, depth) AS (SELECT ?, 0 UNION ALL "
+                "SELECT c.parent_checkpoint_id, chain.depth + 1 FROM checkpoints c JOIN chain "
+                "ON c.thread_id = ? AND c.checkpoint_ns = ? AND c.checkpoint_id = chain.checkpoint_id "
+                "WHERE c.parent_checkpoint_id IS NOT NULL AND chain.depth + 1 < ?) "
+                "SELECT c.checkpoint_id, c.parent_checkpoint_id, c.type, c.checkpoint FROM chain "
+                "JOIN checkpoints c ON c.thread_id = ? AND c.checkpoint_ns = ? "
+                "AND c.checkpoint_id = chain.checkpoint_id ORDER BY chain.depth",
+                (cursor, thread_id, checkpoint_ns, HISTORY_BATCH, thread_id, checkpoint_ns)).fetchall()
+            if not chain:
+                break
+            ids = [row[0] for row in chain]
+            writes_by_checkpoint: Dict[str, list] = {}
+            for checkpoint_id, *write in conn.execute(
+                    f"SELECT checkpoint_id, task_id, channel, type, value FROM writes WHERE thread_id = ? "
+                    f"AND checkpoint_ns = ? AND checkpoint_id IN ({', '.join('?' for _ in ids)}) "
+                    f"AND channel IN ({', '.join('?' for _ in channels)}) ORDER BY task_path, task_id, idx",
+                    (thread_id, checkpoint_ns, *ids, *channels)):
+                writes_by_checkpoint.setdefault(checkpoint_id, []).append(write)
+            for checkpoint_id, parent_id, type_, data in chain:
+                cursor = parent_id
+                for task_id, channel, write_type, value in reversed(writes_by_checkpoint.get(checkpoint_id, [])):
+                    if channel in remaining:
+                        collected[channel].append((task_id, channel, self._load(write_type, value)))
+                versions = self._load(type_, data)["channel_versions"]
+                for channel in list(remaining):
+                    if channel not in versions:
+                        continue
+                    key = (channel, str(versions[channel]))
+                    if key in checked:
+                        continue
+                    blob = conn.execute("SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                                        "AND channel = ? AND version = ?",
+                                        (thread_id, checkpoint_ns, *key)).fetchone()
+                    checked[key] = blob is not None and blob[0] != "empty"
+                    if checked[key]:
+                        seeds[channel] = self._load(*blob)
+                        remaining.discard(channel)
+                if not remaining:
+                    break
+        history = {}
+        for channel in channels:
+            history[channel] = {"writes": list(reversed(collected[channel]))}
+            if channel in seeds:
+                history[channel]["seed"] = seeds[channel]
+        return history
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig,
+                                         channels: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        return await asyncio.to_thread(lambda: self.get_delta_channel_history(config=config, channels=channels))
+
+    # --- Escritura ---
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, value = self._dump(values[channel]) if channel in values else ("empty", b"")
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, value))
+        type_, data = self._dump(stored)
+        metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            conn.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (thread_id, checkpoint_ns, checkpoint["id"], configurable.get("checkpoint_id"),
+                          type_, data, metadata_type, metadata_data))
+            self._touch(conn, thread_id)
+        self._maybe_evict()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, data, task_path))
+        # Las escrituras especiales (errores, interrupciones) reemplazan; las normales no se duplican
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        conn = self._connection()
+        with conn:
+            conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._touch(conn, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        """Versiones de texto ordenables, igual que MemorySaver."""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Variantes asíncronas (SQLite se usa en un hilo del executor) ---
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items: List[CheckpointTuple] = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,134 @@
+"""
+Registro versionado de factores de emisión.
+Los factores se leen una sola vez de emission_factors.json y cada combinación
+(país, versión) se compila a un FactorSet inmutable: una tupla de floats indexada
+por FACTOR_KEYS, de modo que cada consulta es O(1) y no reconstruye diccionarios.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+FACTORS_FILE = os.getenv("EMISSION_FACTORS_FILE", os.path.join(os.path.dirname(__file__), "emission_factors.json"))
+FACTORS_VERSION = os.getenv("EMISSION_FACTORS_VERSION")  # None: la versión 'current' del archivo
+
+DEFAULT_COUNTRY = "default"
+
+# Esquema fijo del vector de factores (kg CO₂e); toda versión debe definirlos todos
+FACTOR_KEYS: Tuple[str, ...] = (
+    "electricidad",
+    "combustible.gasolina", "combustible.diesel", "combustible.gas_natural",
+    "combustible.electricidad", "combustible.ninguno",
+    "transporte.auto", "transporte.publico", "transporte.verde",
+    "viajes.avion_corto", "viajes.avion_largo", "viajes.tren", "viajes.bus",
+    "residuos.vertedero", "residuos.reciclado",
+    "agua", "papel", "infraestructura",
+    "climatizacion.aire_acondicionado", "climatizacion.calefaccion_gas",
+    "climatizacion.calefaccion_electrica", "climatizacion.bomba_calor", "climatizacion.natural",
+)
+FACTOR_INDEX: Dict[str, int] = {key: index for index, key in enumerate(FACTOR_KEYS)}
+
+
+class FactorSet(NamedTuple):
+    """Factores compilados para un país y una versión."""
+    version: str
+    country: str
+    values: Tuple[float, ...]  # Alineados con FACTOR_KEYS
+
+    def get(self, key: str, default: float = 0.0) -> float:
+        index = FACTOR_INDEX.get(key)
+        return default if index is None else self.values[index]
+
+    def group(self, prefix: str) -> Dict[str, float]:
+        """Factores de un grupo sin el prefijo, p.ej. group("combustible") -> {"diesel": 2.68, ...}."""
+        start = prefix + "."
+        return {key[len(start):]: self.values[index] for key, index in FACTOR_INDEX.items() if key.startswith(start)}
+
+
+def _flatten(factors: Dict[str, Any], source: str) -> Dict[str, float]:
+    """Aplana {"combustible": {"diesel": 2.68}} a {"combustible.diesel": 2.68} y valida las claves."""
+    flat: Dict[str, float] = {}
+    for name, value in factors.items():
+        if name == "infraestructura_anual":
+            flat["infraestructura"] = float(value) / 12  # El cálculo es mensual
+        elif isinstance(value, dict):
+            flat.update({f"{name}.{key}": float(item) for key, item in value.items()})
+        else:
+            flat[name] = float(value)
+    unknown = set(flat) - set(FACTOR_INDEX)
+    if unknown:
+        raise ValueError(f"Factores desconocidos en {source}: {', '.join(sorted(unknown))}")
+    return flat
+
+
+class FactorRegistry:
+    """Todas las versiones del archivo, compiladas por (país, versión)."""
+
+    def __init__(self, data: Dict[str, Any], current_version: Optional[str] = None):
+        versions = data.get("versions") or {}
+        self.current_version = current_version or data.get("current")
+        if self.current_version not in versions:
+            raise ValueError(f"Versión de factores '{self.current_version}' no definida en el registro")
+        self._sets: Dict[Tuple[str, str], FactorSet] = {}
+        for version, spec in versions.items():
+            base = _flatten(spec.get("factors", {}), f"versión {version}")
+            missing = [key for key in FACTOR_KEYS if key not in base]
+            if missing:
+                raise ValueError(f"Faltan factores en la versión {version}: {', '.join(missing)}")
+            self._add(version, DEFAULT_COUNTRY, base)
+            for country, overrides in (spec.get("countries") or {}).items():
+                self._add(version, country.lower(), {**base, **_flatten(overrides, f"{country} ({version})")})
+
+    def _add(self, version: str, country: str, factors: Dict[str, float]) -> None:
+        self._sets[(country, version)] = FactorSet(version, country, tuple(factors[key] for key in FACTOR_KEYS))
+
+    @classmethod
+    def from_file(cls, path: str = FACTORS_FILE, current_version: Optional[str] = None) -> "FactorRegistry":
+        with open(path, 'r', encoding='utf-8') as f:
+            registry = cls(json.load(f), current_version)
+        logger.info(f"Factores de emisión cargados de {path} (versión vigente {registry.current_version}).")
+        return registry
+
+    def versions(self) -> List[str]:
+        return sorted({version for _, version in self._sets})
+
+    def countries(self, version: Optional[str] = None) -> List[str]:
+        version = version or self.current_version
+        return [country for country, v in self._sets if v == version]
+
+    def get(self, country: str = DEFAULT_COUNTRY, version: Optional[str] = None) -> FactorSet:
+        """Factores de un país (o los de 'default' si el país no tiene propios) en una versión."""
+        version = version or self.current_version
+        factors = self._sets.get((country.lower(), version)) or self._sets.get((DEFAULT_COUNTRY, version))
+        if factors is None:
+            raise KeyError(f"Versión de factores desconocida: {version}")
+        return factors
+
+
+_registry: Optional[FactorRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_factor_registry() -> FactorRegistry:
+    """Registro global, cargado del archivo la primera vez que se usa."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = FactorRegistry.from_file(FACTORS_FILE, FACTORS_VERSION)
+    return _registry
+
+
+def set_factor_registry(registry: Optional[FactorRegistry]) -> None:
+    """Reemplaza el registro global (None: se recarga del archivo en el próximo uso)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+
+
+def get_factor_set(country: str = DEFAULT_COUNTRY, version: Optional[str] = None) -> FactorSet:
+    return get_factor_registry().get(country, version)
@@ -0,0 +1,308 @@
+"""
+Repositorio de interacciones sobre SQLite (modo WAL).
+El esquema se genera a partir de los campos persistibles de GraphState,
+con índices por interaction_id, company_name y timestamp.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import typing
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from .state import GraphState
+import logging
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = os.getenv("INTERACTIONS_DB", "interactions.db")
+TABLE_NAME = "interactions"
+IMPORTS_TABLE = "imported_logs"  # Hasta qué byte se importó cada log JSONL
+# Contador que update_footprints incrementa en las filas reescritas (NULL: sin cambios desde la inserción)
+REVISION_COLUMN = "revision"
+
+# Campos de control de flujo que no forman parte del registro persistido
+NON_PERSISTED_FIELDS = {
+    "interaction_id", "messages", "user_input", "current_task",
+    "previous_task", "last_user_intent", "conversation_finished",
+    "partial_footprint",
+}
+
+
+def _sql_type(annotation: Any) -> str:
+    """Traduce una anotación de tipo de pydantic a un tipo de columna SQLite."""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        return _sql_type(args[0]) if args else "TEXT"
+    if origin is typing.Literal:
+        return "TEXT"
+    if origin in (dict, list) or annotation in (dict, list):
+        return "JSON"
+    if annotation in (int, bool):
+        return "INTEGER"
+    if annotation is float:
+        return "REAL"
+    return "TEXT"
+
+
+def _schema_columns() -> Dict[str, str]:
+    """Columnas de la tabla derivadas de GraphState, en orden de declaración."""
+    columns = {"interaction_id": "TEXT NOT NULL", "timestamp": "TEXT"}
+    for name, field in GraphState.model_fields.items():
+        if name not in NON_PERSISTED_FIELDS:
+            columns[name] = _sql_type(field.annotation)
+    # Campos no reconocidos (p.ej. registros antiguos del flujo de créditos)
+    columns["extra"] = "JSON"
+    return columns
+
+
+SCHEMA_COLUMNS = _schema_columns()
+_JSON_COLUMNS = {name for name, sql_type in SCHEMA_COLUMNS.items() if sql_type == "JSON"}
+_INSERT_SQL = (f"INSERT INTO {TABLE_NAME} ({', '.join(SCHEMA_COLUMNS)}) "
+               f"VALUES ({', '.join('?' for _ in SCHEMA_COLUMNS)})")
+
+# Interacciones calculadas con otra versión de factores (o sin versión registrada)
+_STALE_WHERE = "carbon_footprint IS NOT NULL AND (factor_version IS NULL OR factor_version != ?)"
+
+# Columnas con el resultado del cálculo (se reescriben al recalcular con otros factores)
+RESULT_COLUMNS = ("carbon_footprint", "carbon_per_employee", "sustainability_score",
+                  "footprint_breakdown", "factor_version", "factor_country")
+
+
+class SQLiteInteractionRepository:
+    """Acceso indexado a las interacciones guardadas."""
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self.created = False  # True si el esquema se creó en esta instancia
+
+    def _connection(self) -> sqlite3.Connection:
+        """Una conexión por hilo (Streamlit atiende cada sesión en su propio hilo)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        with self._init_lock:
+            if not self._initialized:
+                self._create_schema(conn)
+                self._initialized = True
+        return conn
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        columns_sql = ", ".join(f"{name} {sql_type}" for name, sql_type in SCHEMA_COLUMNS.items())
+        # BEGIN IMMEDIATE: sólo un proceso decide si la tabla es nueva
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE_NAME,)
+            ).fetchone()
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} "
+                         f"(id INTEGER PRIMARY KEY, {columns_sql}, {REVISION_COLUMN} INTEGER)")
+            if exists:
+                # Añadir columnas nuevas si GraphState creció desde la creación de la tabla
+                current = {row["name"] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+                for name, sql_type in {**SCHEMA_COLUMNS, REVISION_COLUMN: "INTEGER"}.items():
+                    if name not in current:
+                        conn.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {name} {sql_type.replace(' NOT NULL', '')}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_interaction_id ON {TABLE_NAME}(interaction_id)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_company_name ON {TABLE_NAME}(company_name)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_timestamp ON {TABLE_NAME}(timestamp)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_{REVISION_COLUMN} "
+                         f"ON {TABLE_NAME}({REVISION_COLUMN})")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {IMPORTS_TABLE} (path TEXT PRIMARY KEY, byte_offset INTEGER NOT NULL)")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.created = not exists
+
+    # --- Conversión registro <-> fila ---
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> tuple:
+        extra = {k: v for k, v in record.items() if k not in SCHEMA_COLUMNS}
+        values = []
+        for name in SCHEMA_COLUMNS:
+            value = extra if name == "extra" else record.get(name)
+            if name in _JSON_COLUMNS:
+                value = json.dumps(value, ensure_ascii=False, default=str) if value else None
+            elif value is not None and not isinstance(value, (int, float, str)):
+                value = str(value)
+            values.append(value)
+        if values[0] is None:
+            values[0] = "N/A"
+        return tuple(values)
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        record = {}
+        for name in SCHEMA_COLUMNS:
+            value = row[name]
+            if name in _JSON_COLUMNS:
+                value = json.loads(value) if value else ({} if name != "extra" else None)
+            if name == "extra":
+                if value:
+                    record.update(value)
+                continue
+            record[name] = value
+        return record
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(sql, params).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    # --- Escritura ---
+    def insert(self, record: Dict[str, Any]) -> None:
+        self.bulk_insert([record])
+
+    def bulk_insert(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Inserta todos los registros en una única transacción. Devuelve la cantidad insertada."""
+        conn = self._connection()
+        with conn:
+            cursor = conn.executemany(_INSERT_SQL, (self._to_row(r) for r in records if isinstance(r, dict)))
+        return cursor.rowcount
+
+    # --- Importación del log JSONL ---
+    def imported_offset(self, log_path: str) -> int:
+        """Byte del log hasta el que ya se importaron registros (0 si nunca se importó)."""
+        row = self._connection().execute(
+            f"SELECT byte_offset FROM {IMPORTS_TABLE} WHERE path = ?", (log_path,)).fetchone()
+        return row[0] if row else 0
+
+    def import_log_batch(self, records: Iterable[Dict[str, Any]], log_path: str, offset: int) -> int:
+        """
+        Inserta los registros de un tramo del log que aún no estén (mismo interaction_id y
+        timestamp) y avanza el offset importado, todo en una transacción. Devuelve los insertados.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = []
+            for record in records:
+                if not isinstance(record, dict):
+                    continue
+                row = self._to_row(record)
+                exists = conn.execute(
+                    f"SELECT 1 FROM {TABLE_NAME} WHERE interaction_id = ? AND timestamp IS ?", row[:2]).fetchone()
+                if not exists:
+                    rows.append(row)
+            conn.executemany(_INSERT_SQL, rows)
+            conn.execute(
+                f"INSERT INTO {IMPORTS_TABLE} (path, byte_offset) VALUES (?, ?) "
+                f"ON CONFLICT(path) DO UPDATE SET byte_offset = MAX(byte_offset, excluded.byte_offset)",
+                (log_path, offset))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+    # --- Consultas indexadas ---
+    def latest(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """Últimas interacciones (recorrido inverso del índice de timestamp)."""
+        rows = self._query(f"SELECT * FROM {TABLE_NAME} ORDER BY timestamp DESC LIMIT ?", (limit,))
+        return list(reversed(rows))
+
+    def by_company(self, company_name: str) -> List[Dict[str, Any]]:
+        return self._query(f"SELECT * FROM {TABLE_NAME} WHERE company_name = ? ORDER BY timestamp", (company_name,))
+
+    def by_interaction_id(self, interaction_id: str) -> List[Dict[str, Any]]:
+        return self._query(f"SELECT * FROM {TABLE_NAME} WHERE interaction_id = ? ORDER BY timestamp", (interaction_id,))
+
+    def by_date_range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Interacciones con start <= timestamp < end (fechas ISO, extremos opcionales)."""
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?"); params.append(start)
+        if end:
+            clauses.append("timestamp < ?"); params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else "WHERE timestamp IS NOT NULL"
+        return self._query(f"SELECT * FROM {TABLE_NAME} {where} ORDER BY timestamp", tuple(params))
+
+    def records_after(self, after_id: int = 0, limit: int = 1000) -> List[Tuple[int, Dict[str, Any]]]:
+        """(id, registro) de las interacciones con id mayor a after_id, en orden de inserción."""
+        rows = self._connection().execute(
+            f"SELECT * FROM {TABLE_NAME} WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+        return [(row["id"], self._from_row(row)) for row in rows]
+
+    def per_employee_footprints(self) -> List[Dict[str, Any]]:
+        """Huella por empleado y cantidad de empleados de las interacciones con resultado."""
+        rows = self._connection().execute(
+            f"SELECT carbon_per_employee, employee_count FROM {TABLE_NAME} WHERE carbon_per_employee IS NOT NULL"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # --- Recálculo por versión de factores ---
+    def stale_countries(self, version: str) -> List[Optional[str]]:
+        """Países de factores (None: sin registrar) con interacciones calculadas con otra versión."""
+        rows = self._connection().execute(
+            f"SELECT DISTINCT factor_country FROM {TABLE_NAME} WHERE {_STALE_WHERE}", (version,)).fetchall()
+        return [row[0] for row in rows]
+
+    def stale_footprints(self, version: str, country: Optional[str], after_id: int = 0,
+                         limit: int = 1000) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        (id, registro) de las interacciones calculadas con factores del país indicado (None: sin
+        país registrado) y de otra versión, en orden de id.
+        """
+        rows = self._connection().execute(
+            f"SELECT * FROM {TABLE_NAME} WHERE id > ? AND {_STALE_WHERE} "
+            f"AND factor_country IS ? ORDER BY id LIMIT ?",
+            (after_id, version, country, limit)).fetchall()
+        return [(row["id"], self._from_row(row)) for row in rows]
+
+    def update_footprints(self, results: Iterable[Tuple[int, Dict[str, Any]]]) -> int:
+        """
+        Reescribe las columnas de resultado de varias filas en una única transacción y les
+        asigna una nueva revisión (ver revised_after).
+        """
+        assignments = ", ".join(f"{name} = ?" for name in RESULT_COLUMNS)
+        sql = f"UPDATE {TABLE_NAME} SET {assignments}, {REVISION_COLUMN} = ? WHERE id = ?"
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self.current_revision() + 1
+            params = (
+                tuple(json.dumps(result.get(name), ensure_ascii=False) if name in _JSON_COLUMNS else result.get(name)
+                      for name in RESULT_COLUMNS) + (revision, row_id)
+                for row_id, result in results
+            )
+            cursor = conn.executemany(sql, params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return cursor.rowcount
+
+    def current_revision(self) -> int:
+        """Última revisión asignada por update_footprints (0 si nunca se reescribió una fila)."""
+        return self._connection().execute(
+            f"SELECT COALESCE(MAX({REVISION_COLUMN}), 0) FROM {TABLE_NAME}").fetchone()[0]
+
+    def revised_after(self, revision: int, up_to: int, max_id: int) -> List[int]:
+        """Ids (hasta max_id) de las filas reescritas con revisión en (revision, up_to], en orden."""
+        rows = self._connection().execute(
+            f"SELECT id FROM {TABLE_NAME} WHERE {REVISION_COLUMN} > ? AND {REVISION_COLUMN} <= ? AND id <= ? "
+            f"ORDER BY id", (revision, up_to, max_id)).fetchall()
+        return [row[0] for row in rows]
+
+    def records_between(self, first_id: int, last_id: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """(id, registro) de las interacciones con first_id <= id <= last_id, en orden de inserción."""
+        rows = self._connection().execute(
+            f"SELECT * FROM {TABLE_NAME} WHERE id BETWEEN ? AND ? ORDER BY id", (first_id, last_id)).fetchall()
+        return [(row["id"], self._from_row(row)) for row in rows]
+
+    def count(self) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,147 @@
+"""
+Caché de respuestas del LLM.
+Nivel 1: LRU en memoria acotado por tamaño. Nivel 2 (opcional): SQLite en disco,
+compartido entre procesos. Ambos niveles expiran entradas por TTL.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB")  # Sin definir: sólo caché en memoria
+# Sólo se cachean llamadas casi deterministas (las de extracción/clasificación)
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normaliza espacios y forma Unicode para que prompts equivalentes compartan clave."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", prompt)).strip()
+
+
+def make_cache_key(prompt: str, temperature: float, max_output_tokens: int, model: str = "") -> str:
+    """Hash del prompt normalizado y de los parámetros de generación."""
+    payload = f"{model}\x1f{temperature:.3f}\x1f{max_output_tokens}\x1f{normalize_prompt(prompt)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """LRU con TTL y contadores de aciertos/fallos, con nivel opcional en SQLite."""
+
+    def __init__(self, max_size: int = LLM_CACHE_SIZE, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 db_path: Optional[str] = LLM_CACHE_DB):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- Nivel en disco ---
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        try:
+            conn = self._db()
+            if conn is None:
+                return None
+            row = conn.execute("SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and row[0] > now:
+                return row[0], row[1]
+            if row:
+                with conn:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"Caché LLM en disco no disponible: {e}")
+        return None
+
+    def _disk_set(self, key: str, value: str, expires_at: float) -> None:
+        try:
+            conn = self._db()
+            if conn is None:
+                return
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                             (key, value, expires_at))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo escribir en la caché LLM en disco: {e}")
+
+    # --- API pública ---
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        disk_entry = self._disk_get(key, now)
+        with self._lock:
+            if disk_entry is not None:
+                self._store(key, disk_entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return disk_entry[1]
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, (expires_at, value))
+        self._disk_set(key, value, expires_at)
+
+    def _store(self, key: str, entry: Tuple[float, str]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+        conn = self._db()
+        if conn is not None:
+            with conn:
+                conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,54 +1,133 @@
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import asyncio
 import logging
 import os
-from typing import Optional, Dict, Any
+import threading
+import time
+import weakref
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from .llm_cache import LLMCache, make_cache_key, LLM_CACHE_MAX_TEMPERATURE
+from .llm_resilience import CircuitBreaker, CircuitOpenError, call_with_retry, call_with_retry_async
+from .llm_providers import LLMProvider, FakeLLMProvider, HttpLLMProvider
 
 logger = logging.getLogger(__name__)
 
 # Configuración
 # API_KEY = os.environ.get('GOOGLE_API_KEY')  # Comentado - Ahora se obtiene dentro de configure_gemini_client
 MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-001")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))    # Llamadas async simultáneas
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))  # Timeout por llamada async
+
+# Arranque en frío: la configuración no hace llamadas de red. El modelo se crea en el
+# primer uso y la validación de la clave (opcional) corre en segundo plano.
+GEMINI_HEALTH_CHECK = os.getenv("GEMINI_HEALTH_CHECK", "0").lower() in ("1", "true", "si", "yes")
+# Proveedor de LLM: "gemini" (por defecto), "fake" (local, ver llm_providers) o "http"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+LLM_PROVIDER_URL = os.getenv("LLM_PROVIDER_URL", "http://127.0.0.1:8765")
 
 _gemini_model = None
+_api_key: Optional[str] = None
+_init_lock = threading.Lock()
+_health_status = "sin_verificar"  # "pendiente", "ok", "error"
+_startup_metrics: Dict[str, float] = {}
+_response_cache = LLMCache()
+_circuit_breaker = CircuitBreaker()
+_provider: Optional[LLMProvider] = None
+
+def configure_gemini_client(api_key: Optional[str] = None, health_check: Optional[bool] = None):
+    """
+    Registra la API Key sin llamadas de red. El modelo se inicializa en el primer uso.
+    Con health_check=True (o GEMINI_HEALTH_CHECK=1) valida la clave en un hilo aparte.
+    """
+    global _gemini_model, _api_key
+    start = time.perf_counter()
 
-def configure_gemini_client():
-    """Configura el cliente de google-generativeai con la API Key."""
-    global _gemini_model
-    
     # Obtener la API key en el momento de la configuración, no cuando se importa
-    API_KEY = os.environ.get('GOOGLE_API_KEY')
-    
+    API_KEY = api_key or os.environ.get('GOOGLE_API_KEY')
+
     if not API_KEY:
         logger.error("La variable de entorno GOOGLE_API_KEY no está configurada.")
-        _gemini_model = None
+        with _init_lock:
+            _gemini_model = None
+            _api_key = None
         return
 
-    try:
-        logger.info(f"Configurando cliente Gemini con API Key...")
-        genai.configure(api_key=API_KEY)
-        _gemini_model = genai.GenerativeModel(MODEL_NAME)
-        logger.info(f"Modelo Gemini '{MODEL_NAME}' listo para usar (API Key).")
+    with _init_lock:
+        _api_key = API_KEY
+        _gemini_model = None  # Se recrea con la nueva clave en el primer uso
+    _startup_metrics["configure_ms"] = (time.perf_counter() - start) * 1000
+    logger.info(f"Cliente Gemini configurado en {_startup_metrics['configure_ms']:.2f} ms (inicialización diferida).")
+
+    if health_check if health_check is not None else GEMINI_HEALTH_CHECK:
+        start_health_check()
+
+def _get_model():
+    """Devuelve el modelo Gemini, creándolo en el primer uso. None si no hay API Key."""
+    global _gemini_model, _api_key
+    if _gemini_model is not None:
+        return _gemini_model
+    with _init_lock:
+        if _gemini_model is None:
+            key = _api_key or os.environ.get('GOOGLE_API_KEY')
+            if not key:
+                return None
+            start = time.perf_counter()
+            try:
+                genai.configure(api_key=key)
+                _gemini_model = genai.GenerativeModel(MODEL_NAME)
+                _api_key = key
+            except Exception as e:
+                logger.error(f"Error al configurar el cliente Gemini: {e}", exc_info=True)
+                return None
+            _startup_metrics["model_init_ms"] = (time.perf_counter() - start) * 1000
+            logger.info(f"Modelo Gemini '{MODEL_NAME}' inicializado en {_startup_metrics['model_init_ms']:.2f} ms.")
+    return _gemini_model
+
+def start_health_check() -> threading.Thread:
+    """Valida la API Key con una llamada mínima en segundo plano, sin bloquear el arranque."""
+    def _run():
+        global _health_status
+        _health_status = "pendiente"
+        start = time.perf_counter()
+        model = _get_model()
         try:
-            # Prueba rápida (en un try/except para más seguridad)
-            _gemini_model.generate_content("test") 
-            logger.info("Llamada de prueba a Gemini (API Key) exitosa.")
-        except Exception as test_e:
-            logger.error(f"La prueba de Gemini falló: {test_e}. La clave podría ser inválida.")
-            _gemini_model = None
-    except Exception as e:
-        logger.error(f"Error al configurar el cliente Gemini: {e}", exc_info=True)
-        _gemini_model = None
-
-def call_gemini(prompt: str, temperature: float = 0.2, max_output_tokens: int = 100) -> Optional[str]:
-    """Llama al modelo Gemini configurado."""
-    global _gemini_model
-    if not _gemini_model:
-        logger.error("El modelo Gemini (API Key) no está configurado.")
-        return None
+            if model is None:
+                raise RuntimeError("modelo no configurado")
+            model.generate_content("ping", generation_config={"max_output_tokens": 1})
+            _health_status = "ok"
+            logger.info("Verificación de Gemini (API Key) exitosa.")
+        except Exception as e:
+            _health_status = "error"
+            logger.error(f"La verificación de Gemini falló: {e}. La clave podría ser inválida.")
+        _startup_metrics["health_check_ms"] = (time.perf_counter() - start) * 1000
+
+    thread = threading.Thread(target=_run, name="gemini-health-check", daemon=True)
+    thread.start()
+    return thread
+
+def get_client_status() -> Dict[str, Any]:
+    """Estado del cliente y tiempos de arranque (ms) para monitoreo."""
+    return {
+        "configured": bool(_api_key or os.environ.get('GOOGLE_API_KEY')),
+        "initialized": _gemini_model is not None,
+        "health": _health_status,
+        **_startup_metrics,
+    }
+
+def is_llm_available() -> bool:
+    """False mientras el circuit breaker está abierto: el flujo debe usar sólo parsers locales."""
+    return _circuit_breaker.state != CircuitBreaker.OPEN
+
+def get_circuit_state() -> str:
+    return _circuit_breaker.state
 
-    logger.info(f"Llamando a Gemini (API Key) con prompt: {prompt[:150]}...") # Log más largo
+def get_cache_stats() -> Dict[str, float]:
+    """Contadores de la caché de respuestas (aciertos, fallos, expulsiones)."""
+    return _response_cache.stats()
 
+def _generation_args(temperature: float, max_output_tokens: int) -> Dict[str, Any]:
+    """Parámetros de generación comunes a las llamadas síncronas y asíncronas."""
     safety_settings = {
         HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
         # ... (otras categorías)
@@ -59,35 +138,240 @@ def call_gemini(prompt: str, temperature: float = 0.2, max_output_tokens: int =
         "top_k": 40,
         "max_output_tokens": max_output_tokens,
     }
+    return {"generation_config": generation_config, "safety_settings": safety_settings}
 
+def _cache_lookup(prompt: str, temperature: float, max_output_tokens: int, use_cache: bool,
+                  provider: LLMProvider) -> Tuple[Optional[str], Optional[str]]:
+    """Devuelve (clave, respuesta cacheada). La clave es None si la llamada no se cachea."""
+    if not use_cache or temperature > LLM_CACHE_MAX_TEMPERATURE:
+        return None, None
+    cache_key = make_cache_key(prompt, temperature, max_output_tokens, provider.model)
+    cached = _response_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Respuesta de Gemini obtenida de caché: '{cached}'")
+    return cache_key, cached
+
+def _gemini_text(response: Any) -> Optional[str]:
+    """Extrae el texto de la respuesta de Gemini o None si está vacía/bloqueada."""
+    if response.text:
+        return response.text.strip()
+    block_reason = None
     try:
-        response = _gemini_model.generate_content(
-            prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings,
-        )
-        if response.text:
-            result_text = response.text.strip()
-            logger.info(f"Respuesta de Gemini (API Key) recibida: '{result_text}'")
-            return result_text
-        else:
-            block_reason = None
+        if response.prompt_feedback and response.prompt_feedback.block_reason:
+             block_reason = response.prompt_feedback.block_reason
+    except Exception: pass
+    logger.warning(f"Respuesta de Gemini (API Key) vacía o bloqueada. Block reason: {block_reason}")
+    return None
+
+class GeminiProvider(LLMProvider):
+    """Proveedor de producción: el modelo Gemini con inicialización diferida."""
+
+    name = "gemini"
+
+    @property
+    def model(self) -> str:
+        return MODEL_NAME
+
+    def is_ready(self) -> bool:
+        return _get_model() is not None
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        response = _get_model().generate_content(prompt, **_generation_args(temperature, max_output_tokens))
+        return _gemini_text(response)
+
+    async def generate_async(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        response = await _get_model().generate_content_async(prompt, **_generation_args(temperature, max_output_tokens))
+        return _gemini_text(response)
+
+    def generate_stream(self, prompt: str, temperature: float, max_output_tokens: int) -> Iterator[str]:
+        response = _get_model().generate_content(prompt, stream=True, **_generation_args(temperature, max_output_tokens))
+        for chunk in response:
             try:
-                if response.prompt_feedback and response.prompt_feedback.block_reason:
-                     block_reason = response.prompt_feedback.block_reason
-            except Exception: pass
-            logger.warning(f"Respuesta de Gemini (API Key) vacía o bloqueada. Block reason: {block_reason}")
-            return None
+                text = chunk.text
+            except ValueError:  # Fragmento sin partes de texto (p. ej. bloqueado por seguridad)
+                text = None
+            if text:
+                yield text
+
+def _provider_from_env() -> LLMProvider:
+    if LLM_PROVIDER == "fake":
+        return FakeLLMProvider.from_env()
+    if LLM_PROVIDER == "http":
+        return HttpLLMProvider(LLM_PROVIDER_URL, timeout=LLM_TIMEOUT_SECONDS)
+    if LLM_PROVIDER != "gemini":
+        logger.warning(f"LLM_PROVIDER desconocido '{LLM_PROVIDER}'; se usa Gemini.")
+    return GeminiProvider()
+
+def get_llm_provider() -> LLMProvider:
+    """Proveedor activo (se crea según LLM_PROVIDER en el primer uso)."""
+    global _provider
+    if _provider is None:
+        with _init_lock:
+            if _provider is None:
+                _provider = _provider_from_env()
+                logger.info(f"Proveedor LLM activo: {_provider.name}")
+    return _provider
+
+def set_llm_provider(provider: Optional[LLMProvider]) -> None:
+    """Reemplaza el proveedor (p. ej. uno falso para pruebas). None vuelve al de LLM_PROVIDER."""
+    global _provider
+    with _init_lock:
+        _provider = provider
+    _circuit_breaker.reset()
+
+def _store_response(text: Optional[str], cache_key: Optional[str], provider: LLMProvider) -> Optional[str]:
+    if text:
+        logger.info(f"Respuesta de {provider.name} recibida: '{text}'")
+        if cache_key is not None:
+            _response_cache.set(cache_key, text)
+    return text or None
+
+def call_gemini(prompt: str, temperature: float = 0.2, max_output_tokens: int = 100,
+                use_cache: bool = True) -> Optional[str]:
+    """Llama al proveedor LLM activo (Gemini por defecto). Las llamadas de baja temperatura se cachean."""
+    provider = get_llm_provider()
+    cache_key, cached = _cache_lookup(prompt, temperature, max_output_tokens, use_cache, provider)
+    if cached is not None:
+        return cached
+
+    if not provider.is_ready():
+        logger.error(f"El proveedor LLM '{provider.name}' no está configurado.")
+        return None
+
+    logger.info(f"Llamando a {provider.name} con prompt: {prompt[:150]}...") # Log más largo
+
+    try:
+        text = call_with_retry(
+            lambda: provider.generate(prompt, temperature, max_output_tokens),
+            breaker=_circuit_breaker,
+        )
+        return _store_response(text, cache_key, provider)
+    except CircuitOpenError:
+        logger.warning("Circuito LLM abierto: se omite la llamada a Gemini (modo degradado).")
+        return None
     except Exception as e:
         logger.error(f"Error durante la llamada a la API de Gemini (API Key): {e}", exc_info=True)
         return None
 
+def stream_gemini(prompt: str, temperature: float = 0.2, max_output_tokens: int = 100,
+                  use_cache: bool = True) -> Iterator[str]:
+    """
+    Versión en streaming de call_gemini: genera los fragmentos de texto a medida que
+    llegan, así la interfaz puede mostrarlos desde el primer token. Los reintentos y el
+    circuit breaker aplican hasta el primer fragmento; si el stream se corta después,
+    queda lo recibido hasta ese momento. La respuesta completa se cachea igual que en call_gemini.
+    """
+    provider = get_llm_provider()
+    cache_key, cached = _cache_lookup(prompt, temperature, max_output_tokens, use_cache, provider)
+    if cached is not None:
+        yield cached
+        return
+
+    if not provider.is_ready():
+        logger.error(f"El proveedor LLM '{provider.name}' no está configurado.")
+        return
+
+    def _first_chunk() -> Tuple[Iterator[str], Optional[str]]:
+        chunks = iter(provider.generate_stream(prompt, temperature, max_output_tokens))
+        return chunks, next(chunks, None)
+
+    logger.info(f"Llamando a {provider.name} en streaming con prompt: {prompt[:150]}...")
+    try:
+        chunks, first = call_with_retry(_first_chunk, breaker=_circuit_breaker)
+    except CircuitOpenError:
+        logger.warning("Circuito LLM abierto: se omite la llamada a Gemini (modo degradado).")
+        return
+    except Exception as e:
+        logger.error(f"Error durante la llamada en streaming a Gemini: {e}", exc_info=True)
+        return
+
+    if first is None:
+        return
+    parts = [first]
+    yield first
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        logger.error(f"Stream de {provider.name} interrumpido tras {len(parts)} fragmentos: {e}")
+        return
+    _store_response("".join(parts).strip(), cache_key, provider)
+
+# --- Versión asíncrona ---
+# Un semáforo por event loop: Streamlit y asyncio.run() pueden crear loops distintos
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+async def call_gemini_async(prompt: str, temperature: float = 0.2, max_output_tokens: int = 100,
+                            use_cache: bool = True, timeout: Optional[float] = LLM_TIMEOUT_SECONDS) -> Optional[str]:
+    """
+    Versión asíncrona de call_gemini (generate_async del proveedor).
+    Limita las llamadas concurrentes con un semáforo y aplica un timeout por intento.
+    La cancelación de la tarea se propaga a la petición en curso.
+    """
+    provider = get_llm_provider()
+    cache_key, cached = _cache_lookup(prompt, temperature, max_output_tokens, use_cache, provider)
+    if cached is not None:
+        return cached
+
+    if not provider.is_ready():
+        logger.error(f"El proveedor LLM '{provider.name}' no está configurado.")
+        return None
+
+    async def _attempt():
+        # El semáforo se toma por intento: las esperas del backoff no ocupan cupo
+        async with _get_semaphore():
+            return await asyncio.wait_for(
+                provider.generate_async(prompt, temperature, max_output_tokens),
+                timeout=timeout,
+            )
+
+    logger.info(f"Llamando a {provider.name} async con prompt: {prompt[:150]}...")
+    try:
+        text = await call_with_retry_async(_attempt, breaker=_circuit_breaker)
+        return _store_response(text, cache_key, provider)
+    except CircuitOpenError:
+        logger.warning("Circuito LLM abierto: se omite la llamada a Gemini (modo degradado).")
+        return None
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout ({timeout}s) en la llamada asíncrona a Gemini.")
+        return None
+    except Exception as e:
+        logger.error(f"Error durante la llamada asíncrona a Gemini: {e}", exc_info=True)
+        return None
+
+async def call_gemini_many(prompts: List[str], **kwargs: Any) -> List[Optional[str]]:
+    """Lanza varias llamadas en paralelo (respetando el límite de concurrencia)."""
+    return await asyncio.gather(*(call_gemini_async(prompt, **kwargs) for prompt in prompts))
+
+_GREETING_PREFIXES = ("hola", "buenas", "buen dia", "buen día", "gracias", "adios", "adiós", "chau", "hasta luego")
+
+def _classify_intent_locally(user_input: str) -> str:
+    """Clasificación determinista para el modo degradado (circuito LLM abierto)."""
+    text = user_input.strip().lower()
+    if text.startswith(_GREETING_PREFIXES):
+        return "saludo_despedida"
+    if text.endswith("?") or text.startswith("¿"):
+        return "pregunta_general"
+    return "respuesta_esperada"
+
 # --- Nueva Función Sprint 6 ---
 def classify_intent(user_input: str, expected_task: Optional[str]) -> Optional[str]:
     """
     Clasifica la intención del usuario usando Gemini.
+    Con el circuito abierto usa una clasificación local determinista.
     """
     if not user_input: return "incomprensible"
+    if not is_llm_available():
+        return _classify_intent_locally(user_input)
 
     possible_intents = ["respuesta_esperada", "consulta_limite", "pregunta_general", "saludo_despedida", "cambiar_monto", "incomprensible"]
 
@@ -129,7 +413,7 @@ def classify_intent(user_input: str, expected_task: Optional[str]) -> Optional[s
 if __name__ == "__main__":
     print("Probando configuración de cliente Gemini (API Key)...")
     configure_gemini_client()
-    if _gemini_model:
+    if _get_model():
         print("\nProbando clasificación de intención...")
         test_inputs = [
             ("5000", "esperando_monto"),
@@ -0,0 +1,251 @@
+"""
+Proveedores de LLM intercambiables.
+call_gemini/classify_intent hablan con un LLMProvider; en producción es Gemini
+(ver llm_integration.GeminiProvider) y para pruebas de carga se puede usar un
+proveedor falso local, en el mismo proceso o detrás de un pequeño servidor HTTP,
+con latencias, tasa de errores y respuestas guionadas configurables.
+
+Servidor de prueba: python -m app.llm_providers --port 8765 --latency-ms 300 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+Responder = Union[str, Callable[[str], Optional[str]]]
+
+
+class LLMProviderError(ConnectionError):
+    """Error transitorio del proveedor (equivale a un 503/429: se reintenta)."""
+
+
+class LLMProvider:
+    """Interfaz mínima de un proveedor: texto de entrada, texto (o None) de salida."""
+
+    name = "base"
+    model = ""  # Identifica al modelo en las claves de la caché
+
+    def is_ready(self) -> bool:
+        return True
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        """Por defecto ejecuta la versión síncrona en un hilo."""
+        return await asyncio.to_thread(self.generate, prompt, temperature, max_output_tokens)
+
+    def generate_stream(self, prompt: str, temperature: float, max_output_tokens: int) -> Iterator[str]:
+        """Fragmentos del texto a medida que se generan. Por defecto, la respuesta completa en uno solo."""
+        text = self.generate(prompt, temperature, max_output_tokens)
+        if text:
+            yield text
+
+
+class FakeLLMProvider(LLMProvider):
+    """
+    Proveedor falso y reproducible para pruebas de carga sin API Key.
+    - latency_ms / latency_jitter_ms / latency_distribution: "constant", "uniform",
+      "normal", "lognormal" o "exponential" (media latency_ms).
+    - error_rate: probabilidad de lanzar LLMProviderError en cada llamada.
+    - rules: lista de (regex, respuesta) evaluadas en orden sobre el prompt; la respuesta
+      puede ser un texto (admite grupos: "\\1") o una función prompt -> texto.
+    - stream_chunk_ms: en streaming, la latencia es la del primer fragmento (palabra)
+      y cada fragmento siguiente tarda stream_chunk_ms. Si ninguna regla coincide el
+      stream no emite fragmentos (default_response sólo aplica a generate).
+    """
+
+    name = "fake"
+    model = "fake"
+
+    def __init__(self, rules: Optional[List[Tuple[str, Responder]]] = None,
+                 default_response: Optional[str] = "None", latency_ms: float = 0.0,
+                 latency_jitter_ms: float = 0.0, latency_distribution: str = "constant",
+                 error_rate: float = 0.0, seed: Optional[int] = None, stream_chunk_ms: float = 0.0):
+        self.rules = [(re.compile(pattern, re.DOTALL), response) for pattern, response in (rules or [])]
+        self.default_response = default_response
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.stream_chunk_ms = stream_chunk_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMProvider":
+        """Configura el proveedor con FAKE_LLM_* (FAKE_LLM_SCRIPT: JSON [[regex, respuesta], ...])."""
+        rules = []
+        script_path = os.getenv("FAKE_LLM_SCRIPT")
+        if script_path:
+            with open(script_path, 'r', encoding='utf-8') as f:
+                rules = [tuple(rule) for rule in json.load(f)]
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            rules=rules,
+            default_response=os.getenv("FAKE_LLM_DEFAULT_RESPONSE", "None"),
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+            latency_jitter_ms=float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0")),
+            latency_distribution=os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "constant"),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+            stream_chunk_ms=float(os.getenv("FAKE_LLM_STREAM_CHUNK_MS", "0")),
+        )
+
+    def sample_latency(self) -> float:
+        """Latencia simulada en segundos según la distribución configurada."""
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        with self._lock:
+            rnd = self._random
+            if self.latency_distribution == "uniform":
+                value = rnd.uniform(mean - jitter, mean + jitter)
+            elif self.latency_distribution == "normal":
+                value = rnd.gauss(mean, jitter)
+            elif self.latency_distribution == "lognormal" and mean > 0:
+                # Parámetros tales que la media y el desvío coincidan con los pedidos
+                sigma2 = math.log(1 + (jitter / mean) ** 2)
+                value = rnd.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+            elif self.latency_distribution == "exponential" and mean > 0:
+                value = rnd.expovariate(1 / mean)
+            else:
+                value = mean
+        return max(0.0, value) / 1000
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def _rule_response(self, prompt: str) -> Tuple[bool, Optional[str]]:
+        """(hubo regla, respuesta) para el prompt."""
+        for pattern, response in self.rules:
+            match = pattern.search(prompt)
+            if match:
+                return True, response(prompt) if callable(response) else match.expand(response)
+        return False, None
+
+    def respond(self, prompt: str) -> Optional[str]:
+        """Respuesta guionada para el prompt (sin latencia ni errores)."""
+        matched, response = self._rule_response(prompt)
+        return response if matched else self.default_response
+
+    def _simulate_call(self) -> None:
+        time.sleep(self.sample_latency())
+        if self._should_fail():
+            raise LLMProviderError("Error simulado del proveedor falso")
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        self._simulate_call()
+        return self.respond(prompt)
+
+    async def generate_async(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        await asyncio.sleep(self.sample_latency())
+        if self._should_fail():
+            raise LLMProviderError("Error simulado del proveedor falso")
+        return self.respond(prompt)
+
+    def generate_stream(self, prompt: str, temperature: float, max_output_tokens: int) -> Iterator[str]:
+        # Sin regla no hay texto libre que generar: el stream queda vacío (default_response
+        # es el valor "sin resultado" de las respuestas cortas, no un texto para mostrar)
+        self._simulate_call()
+        text = self._rule_response(prompt)[1]
+        for index, piece in enumerate(re.findall(r"\S+\s*", text or "")):
+            if index and self.stream_chunk_ms:
+                time.sleep(self.stream_chunk_ms / 1000)
+            yield piece
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors}
+
+
+class HttpLLMProvider(LLMProvider):
+    """Cliente del servidor LLM de prueba (POST /v1/generate)."""
+
+    name = "http"
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = f"http:{self.base_url}"
+        self.timeout = timeout
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        import requests
+        try:
+            response = requests.post(
+                f"{self.base_url}/v1/generate",
+                json={"prompt": prompt, "temperature": temperature, "max_output_tokens": max_output_tokens},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise LLMProviderError(str(e)) from e
+        if response.status_code in (429, 500, 502, 503, 504):
+            raise LLMProviderError(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        return response.json().get("text")
+
+
+def create_fake_llm_server(provider: FakeLLMProvider, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Crea (sin arrancar) un servidor HTTP que responde con el proveedor falso."""
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/generate":
+                self.send_error(404)
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            try:
+                text = provider.generate(payload.get("prompt", ""), payload.get("temperature", 0.2),
+                                         payload.get("max_output_tokens", 100))
+                status, body = 200, {"text": text}
+            except LLMProviderError as e:
+                status, body = 503, {"error": str(e)}
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug("fake-llm: " + format % args)
+
+    return ThreadingHTTPServer((host, port), _Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor LLM de prueba para tests de carga offline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")))
+    parser.add_argument("--jitter-ms", type=float, default=float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0")))
+    parser.add_argument("--distribution", default=os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "constant"))
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")))
+    args = parser.parse_args()
+
+    fake = FakeLLMProvider.from_env()
+    fake.latency_ms, fake.latency_jitter_ms = args.latency_ms, args.jitter_ms
+    fake.latency_distribution, fake.error_rate = args.distribution, args.error_rate
+    server = create_fake_llm_server(fake, args.host, args.port)
+    print(f"Servidor LLM de prueba en http://{args.host}:{args.port}/v1/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
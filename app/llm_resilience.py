@@ -0,0 +1,173 @@
+"""
+Capa de resiliencia para las llamadas al LLM.
+Reintentos con backoff exponencial y jitter para errores transitorios, y un
+circuit breaker que deja de llamar a la API tras fallos repetidos para que el
+flujo use los parsers locales sin esperar timeouts.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+import logging
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:  # pragma: no cover - el SDK siempre trae api_core
+    google_exceptions = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))          # Intentos totales por llamada
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))   # Segundos
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))       # Tope del backoff
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))       # Fallos seguidos para abrir
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+_RETRYABLE_TYPES: tuple = (TimeoutError, asyncio.TimeoutError, ConnectionError)
+if google_exceptions is not None:
+    _RETRYABLE_TYPES += (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Errores transitorios (rate limit, 5xx, timeouts, red) que vale la pena reintentar."""
+    return isinstance(error, _RETRYABLE_TYPES)
+
+
+def backoff_delay(attempt: int, base: float = LLM_RETRY_BASE_DELAY, cap: float = LLM_RETRY_MAX_DELAY) -> float:
+    """Backoff exponencial con 'full jitter': uniforme entre 0 y min(cap, base * 2^intento)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitOpenError(RuntimeError):
+    """La llamada se descartó porque el circuito está abierto."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: 'cerrado' deja pasar todo; tras N fallos seguidos pasa a
+    'abierto' y rechaza llamadas durante reset_timeout; luego 'semiabierto' deja pasar
+    una llamada de prueba que decide si se vuelve a cerrar o a abrir.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "cerrado", "abierto", "semiabierto"
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_timeout: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Semiabierto: una sola llamada de prueba a la vez
+            if self._trial_in_flight:
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker LLM cerrado: la API volvió a responder.")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker LLM abierto tras {self._failures} fallos; "
+                                   f"se usarán parsers locales durante {self.reset_timeout:.0f}s.")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        with self._lock:
+            self._trial_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+
+def call_with_retry(fn: Callable[[], T], breaker: Optional[CircuitBreaker] = None,
+                    attempts: int = LLM_RETRY_ATTEMPTS) -> T:
+    """Ejecuta fn reintentando errores transitorios. Registra el resultado en el breaker."""
+    if breaker is not None and not breaker.allow_request():
+        raise CircuitOpenError("Circuito LLM abierto")
+    for attempt in range(max(1, attempts)):
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt == attempts - 1:
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Error transitorio del LLM ({type(e).__name__}); reintento {attempt + 1} en {delay:.2f}s.")
+            time.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+    raise AssertionError("inalcanzable")
+
+
+async def call_with_retry_async(fn: Callable[[], Awaitable[T]], breaker: Optional[CircuitBreaker] = None,
+                                attempts: int = LLM_RETRY_ATTEMPTS) -> T:
+    """Versión asíncrona de call_with_retry (fn crea una corrutina nueva en cada intento)."""
+    if breaker is not None and not breaker.allow_request():
+        raise CircuitOpenError("Circuito LLM abierto")
+    for attempt in range(max(1, attempts)):
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # Cancelar no es un fallo de la API: sólo liberar la llamada de prueba
+            if breaker is not None:
+                breaker.release_trial()
+            raise
+        except Exception as e:
+            if not is_retryable(e) or attempt == attempts - 1:
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Error transitorio del LLM ({type(e).__name__}); reintento {attempt + 1} en {delay:.2f}s.")
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
+    raise AssertionError("inalcanzable")
@@ -0,0 +1,280 @@
+"""
+Extracción de varios datos en un solo mensaje.
+Si el usuario escribe, por ejemplo, "50 empleados, 1500 kWh, 200 litros de diesel",
+se completan todos los campos reconocibles del GraphState con el parser local y, sólo
+si queda algo sin interpretar, con UNA llamada al LLM que devuelve JSON. Luego el
+flujo salta a la primera pregunta que sigue sin respuesta.
+"""
+
+import json
+import re
+import unicodedata
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import logging
+
+from ..state import GraphState, TaskStateType
+from ..llm_integration import call_gemini, is_llm_available
+from ..number_parser import parse_number, ParsedNumber
+from ..carbon_calculator import update_partial_footprint
+from .conversation import (
+    CARBON_COUNTRY,
+    CLIMATE_CONTROL_NAMES,
+    FUEL_TYPE_NAMES,
+    QUESTION_SPECS,
+    SPECS_BY_FIELD,
+    SPECS_BY_TASK,
+    cap_percentage,
+)
+
+logger = logging.getLogger(__name__)
+
+# Mínimo de campos reconocidos localmente para tratar el mensaje como respuesta múltiple
+BULK_MIN_FIELDS = 2
+
+# (campo, tarea que lo pregunta, tipo) en el orden del cuestionario
+FIELD_ORDER: List[Tuple[str, TaskStateType, str]] = [(spec.field, spec.task, spec.kind) for spec in QUESTION_SPECS]
+FIELD_LABELS: Dict[str, str] = {spec.field: spec.label for spec in QUESTION_SPECS}
+
+FUEL_TYPES = tuple(FUEL_TYPE_NAMES)
+CLIMATE_TYPES = tuple(CLIMATE_CONTROL_NAMES)
+
+# Pregunta a mostrar cuando el flujo salta directamente a una tarea
+QUESTION_BY_TASK: Dict[str, str] = {task: specs[0].question for task, specs in SPECS_BY_TASK.items()}
+QUESTION_BY_TASK["calculando_huella"] = "¡Ya tengo toda la información necesaria! Escribe cualquier mensaje para calcular la huella de carbono."
+
+# --- Reglas locales ---
+# Palabras clave por campo numérico, evaluadas en orden sobre cada fragmento del mensaje.
+# Los porcentajes de transporte exigen un número con '%' o 'por ciento'.
+_NUMERIC_RULES: List[Tuple[str, "re.Pattern[str]"]] = [(field, re.compile(pattern)) for field, pattern in [
+    ("recycle_pct", r"recicl"),
+    ("transport_pct_car", r"\bauto|\bcoche|\bcarro|particular"),
+    ("transport_pct_public", r"publico|\bbus|colectivo|subte|metro|\btren"),
+    ("transport_pct_green", r"bici|caminando|a pie|sostenible"),
+    ("employee_count", r"emplead|persona|trabajador|colaborador"),
+    ("electricity_kwh", r"kwh|electric|\bluz\b"),
+    ("fuel_consumption", r"litro|\blts?\b|nafta|gasolina|diesel|gasoil"),
+    ("gas_consumption", r"\bgas\b"),
+    ("water_consumption", r"agua"),
+    ("paper_consumption", r"papel"),
+    ("waste_kg", r"residuo|basura|desecho"),
+    ("office_sqm", r"\bm2\b|metros cuadrados|oficina|superficie"),
+    ("air_travel_km", r"avion|vuelo|aereo"),
+    ("ground_travel_km", r"terrestre|\btren|\bbus|micro|larga distancia"),
+    ("employee_commute_distance", r"distancia|diari|por dia|\bida\b|al trabajo|trayecto"),
+]]
+_PERCENT_ONLY = {"transport_pct_car", "transport_pct_public", "transport_pct_green"}
+
+_FUEL_KEYWORDS = [(value, re.compile(pattern)) for value, pattern in [
+    ("gasolina", r"nafta|gasolina"),
+    ("diesel", r"diesel|gasoil"),
+]]
+_CLIMATE_KEYWORDS = [(value, re.compile(pattern)) for value, pattern in [
+    ("bomba_calor", r"bomba de calor|aerotermia"),
+    ("aire_acondicionado", r"aire acondicionado|\ba/?c\b"),
+    ("calefaccion_gas", r"calefaccion a gas|calefaccion de gas|caldera"),
+    ("calefaccion_electrica", r"calefaccion electrica|radiador"),
+    ("natural", r"ventilacion natural|sin climatizacion"),
+]]
+_NAME_TASKS = {"esperando_nombre_empresa": "company_name", "esperando_nombre_responsable": "responsible_name"}
+
+# Separa "50 empleados, 1500 kWh; 200 litros" (o "... y el 60% en bus") sin romper decimales como "2,5"
+_SEGMENT_SPLIT_RE = re.compile(r"[;\n]|,\s+|\.\s+|\s+y\s+(?:(?:el|la|los|las)\s+)?(?=\d)")
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower().replace("²", "2").replace("³", "3"))
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def coerce_field(field: str, value: Any) -> Optional[Any]:
+    """Valida y convierte un valor al tipo del campo. None si no es válido."""
+    spec = SPECS_BY_FIELD.get(field)
+    if value is None or spec is None:
+        return None
+    kind = spec.kind
+    if kind == "texto":
+        return str(value).strip() or None
+    if kind == "opcion":
+        return value if value in spec.choice_names else None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if number < 0:
+        return None
+    if kind == "porcentaje":
+        return min(100, int(number))
+    if kind == "entero":
+        return int(number)
+    return number
+
+
+def cap_percentages(fields: Dict[str, Any], current: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Aplica a los porcentajes extraídos el tope de la pregunta individual (QuestionSpec.cap_with):
+    sumados a los ya respondidos (current) y a los anteriores del mensaje no superan 100.
+    """
+    values = {**(current or {}), **fields}
+    for spec in QUESTION_SPECS:
+        if spec.cap_with and spec.field in fields:
+            fields[spec.field] = values[spec.field] = cap_percentage(spec, fields[spec.field], values)
+    return fields
+
+
+def _numeric_field(segment: str, parsed: ParsedNumber, taken: Dict[str, Any]) -> Optional[str]:
+    for field, pattern in _NUMERIC_RULES:
+        if field in taken or not pattern.search(segment):
+            continue
+        if field in _PERCENT_ONLY and parsed.kind != "porcentaje":
+            continue
+        return field
+    return None
+
+
+def extract_fields_locally(text: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Extrae campos por palabras clave fragmento a fragmento.
+    Devuelve (campos, fragmentos con números que no se pudieron asignar).
+    """
+    fields: Dict[str, Any] = {}
+    unassigned: List[str] = []
+    for raw_segment in _SEGMENT_SPLIT_RE.split(text or ""):
+        segment = _normalize(raw_segment).strip()
+        if not segment:
+            continue
+        if "fuel_type" not in fields:
+            fuel = next((value for value, pattern in _FUEL_KEYWORDS if pattern.search(segment)), None)
+            if fuel:
+                fields["fuel_type"] = fuel
+        if "climate_control" not in fields:
+            climate = next((value for value, pattern in _CLIMATE_KEYWORDS if pattern.search(segment)), None)
+            if climate:
+                fields["climate_control"] = climate
+                continue
+        parsed = parse_number(raw_segment)
+        if parsed is None:
+            continue
+        field = _numeric_field(segment, parsed, fields)
+        value = coerce_field(field, parsed.value) if field else None
+        if value is None:
+            unassigned.append(raw_segment.strip())
+            continue
+        fields[field] = value
+    return cap_percentages(fields), unassigned
+
+
+def _leading_text_segment(text: str) -> Optional[str]:
+    """Primer fragmento sin números (p. ej. el nombre en "Ruedas SA, 50 empleados, ...")."""
+    first = _SEGMENT_SPLIT_RE.split(text or "", maxsplit=1)[0].strip()
+    if not first or len(first) > 60 or any(c.isdigit() for c in first):
+        return None
+    segment = _normalize(first)
+    if any(pattern.search(segment) for _, pattern in _NUMERIC_RULES + _FUEL_KEYWORDS + _CLIMATE_KEYWORDS):
+        return None
+    return first
+
+
+def _build_llm_prompt(text: str, missing: List[str]) -> str:
+    descriptions = "\n".join(f'- "{field}": {FIELD_LABELS[field]}' for field in missing)
+    return f"""El usuario escribió: '{text}'
+
+Extrae los datos de su empresa que aparezcan explícitamente en el mensaje, entre estos campos:
+{descriptions}
+
+Valores permitidos para "fuel_type": {", ".join(FUEL_TYPES)}.
+Valores permitidos para "climate_control": {", ".join(CLIMATE_TYPES)}.
+Los porcentajes van como número entre 0 y 100. Interpreta 'mil' o 'k' como multiplicar por 1000.
+Responde ÚNICAMENTE con un objeto JSON con los campos encontrados (omite los que no aparezcan). Si no hay ninguno, responde {{}}."""
+
+
+def extract_fields_with_llm(text: str, missing: List[str]) -> Dict[str, Any]:
+    """Una única llamada estructurada (JSON) al LLM para los campos que faltan."""
+    if not missing or not is_llm_available():
+        return {}
+    response = call_gemini(_build_llm_prompt(text, missing), temperature=0.1, max_output_tokens=400)
+    match = _JSON_OBJECT_RE.search(response or "")
+    if not match:
+        logger.info(f"El LLM no devolvió JSON para la extracción múltiple: {response}")
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        logger.warning(f"JSON inválido del LLM en la extracción múltiple: {response}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    fields = {}
+    for field in missing:
+        value = coerce_field(field, data.get(field))
+        if value is not None:
+            fields[field] = value
+    return fields
+
+
+def extract_all_fields(text: str, use_llm: bool = True, current: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Parser local y, si quedó algo sin interpretar, una llamada al LLM para completar.
+    Los porcentajes de transporte se topan junto con los ya respondidos en current.
+    """
+    fields, unassigned = extract_fields_locally(text)
+    if use_llm and unassigned:
+        missing = [field for field, _, _ in FIELD_ORDER if field not in fields]
+        fields.update(extract_fields_with_llm(text, missing))
+    return cap_percentages(fields, current)
+
+
+def is_bulk_answer(text: Optional[str]) -> bool:
+    """True si el mensaje trae varios datos reconocibles (modo de extracción múltiple)."""
+    if not text:
+        return False
+    fields, _ = extract_fields_locally(text)
+    return len(fields) >= BULK_MIN_FIELDS
+
+
+def first_missing_task(values: Dict[str, Any]) -> TaskStateType:
+    """Primera tarea del cuestionario cuyo campo sigue vacío, o 'calculando_huella'."""
+    for field, task, _ in FIELD_ORDER:
+        # Sin combustible fósil no se pregunta el consumo
+        if field == "fuel_consumption" and values.get("fuel_type") in ("electricidad", "ninguno"):
+            continue
+        if values.get(field) is None:
+            return task
+    return "calculando_huella"
+
+
+def bulk_extraction_node(state: GraphState) -> Dict[str, Any]:
+    """Completa todos los campos reconocibles del mensaje y salta a la primera pregunta pendiente."""
+    logger.info("--- Extracción Múltiple de Datos ---")
+    user_input = state.user_input or ""
+    values = {field: getattr(state, field) for field, _, _ in FIELD_ORDER}
+    fields = extract_all_fields(user_input, current=values)
+
+    # Si se esperaba un nombre, suele venir primero: "Ruedas SA, 50 empleados, ..."
+    name_field = _NAME_TASKS.get(state.current_task or "esperando_nombre_empresa")
+    if name_field and name_field not in fields:
+        name = _leading_text_segment(user_input)
+        if name:
+            fields[name_field] = name
+
+    values.update(fields)
+    next_task = first_missing_task(values)
+    logger.info(f"Extracción múltiple: {len(fields)} campos ({', '.join(fields)}); siguiente tarea: {next_task}")
+
+    if fields:
+        summary = "\n".join(f"• {FIELD_LABELS[field]}: {fields[field]}" for field, _, _ in FIELD_ORDER if field in fields)
+        response_message = f"¡Genial! Registré estos datos de una vez:\n{summary}\n\n{QUESTION_BY_TASK[next_task]}"
+    else:
+        response_message = f"No pude identificar datos en tu mensaje.\n\n{QUESTION_BY_TASK[next_task]}"
+
+    update = {
+        **fields,
+        "messages": [response_message],
+        "current_task": next_task,
+        "last_user_intent": None,
+        "user_input": None
+    }
+    partial = update_partial_footprint(state, fields, CARBON_COUNTRY)
+    if partial is not None:
+        update["partial_footprint"] = partial
+    return update
@@ -1,10 +1,22 @@
-from typing import Dict, Optional, Any, List
+from typing import Callable, Dict, Optional, Any, List, Mapping, NamedTuple, Tuple
 # Importar tipos y estado actualizado
 from ..state import GraphState,TaskStateType, IntentType
-from ..llm_integration import call_gemini # Quité classify_intent si no se usa
+from ..llm_integration import call_gemini, is_llm_available # Quité classify_intent si no se usa
+from ..number_parser import parse_number, LOCAL_PARSE_MIN_CONFIDENCE
+from ..carbon_calculator import (
+    calculate_carbon_footprint,
+    get_recommendations,
+    get_score_category,
+    update_partial_footprint,
+)
+from ..uncertainty import simulate_carbon_footprint
+from ..scenarios import rank_recommendations
+from ..persistence import rank_footprint
 # from ..rules import load_mandaflow_rules # Comentado/Eliminado
 # from ..loan_calculator import calculate_loan_options # Comentado/Eliminado
+import os
 import re
+import string
 import logging
 import math 
 import numpy as np
@@ -14,6 +26,13 @@ import json # Importar json
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# País cuyos factores de emisión se usan en el cálculo ("default" si no tiene propios)
+CARBON_COUNTRY = os.getenv("CARBON_COUNTRY", "default")
+# Cantidad de medidas de reducción cuantificadas que se muestran en el resultado
+MAX_RANKED_RECOMMENDATIONS = 5
+# Modo incertidumbre: agrega al resultado el intervalo de confianza simulado (Monte Carlo)
+FOOTPRINT_UNCERTAINTY = os.getenv("FOOTPRINT_UNCERTAINTY", "0").lower() in ("1", "true", "si", "yes")
+
 # --- Mensajes Definidos (Actualizados para Huella de Carbono) ---
 WELCOME_MESSAGE = """¡Hola! Soy tu asistente virtual para calcular la huella de carbono de tu empresa.
 Para comenzar, por favor, dime el nombre de la empresa."""
@@ -33,16 +52,20 @@ Ahora comenzaremos con preguntas sobre consumo energético.
 ¿Cuál es el consumo mensual aproximado de electricidad en kWh? (Lo encontrarás en tu factura de luz, por ejemplo: 1500 kWh)"""
 
 ELECTRICITY_KWH_ERROR_MESSAGE = """No pude entender el consumo eléctrico. Por favor, ingresa un valor numérico en kWh (ej: 1500)."""
-CONFIRM_ELECTRICITY_KWH_MESSAGE = """He registrado un consumo eléctrico de {electricity_kwh} kWh mensuales.
-
-¿Cuál es el principal tipo de combustible que utiliza la empresa? Elige una opción:
+FUEL_TYPE_QUESTION = """¿Cuál es el principal tipo de combustible que utiliza la empresa? Elige una opción:
 1. Gasolina (para vehículos)
 2. Diésel (para vehículos o generadores)
 3. Gas Natural (para calefacción o procesos)
 4. Electricidad (si no usan combustibles fósiles)
 5. Ninguno (no utilizan combustibles)"""
+CONFIRM_ELECTRICITY_KWH_MESSAGE = """He registrado un consumo eléctrico de {electricity_kwh} kWh mensuales.
+
+""" + FUEL_TYPE_QUESTION
 
 FUEL_TYPE_ERROR_MESSAGE = """No pude entender el tipo de combustible. Por favor, indica el número de la opción (1-5) o el nombre del combustible."""
+FUEL_TYPE_SKIP_MESSAGE = """Registrado: {fuel_type_name} como fuente principal. No es necesario especificar consumo adicional.
+
+¿Cuál es el consumo mensual de gas natural en m³? (Si no utilizan gas natural, ingresa 0)"""
 CONFIRM_FUEL_TYPE_MESSAGE = """Registrado: {fuel_type_name} como combustible principal.
 
 ¿Cuál es el consumo mensual aproximado de este combustible? Indica la cantidad en {fuel_unit} (ej: 200)."""
@@ -93,22 +116,32 @@ Sobre el consumo de agua, ¿cuántos metros cúbicos (m³) de agua consume la em
 WATER_CONSUMPTION_ERROR_MESSAGE = """No pude entender la cantidad. Por favor, ingresa un valor numérico en m³."""
 CONFIRM_WATER_CONSUMPTION_MESSAGE = """Registrado: {water_consumption} m³ de agua mensuales.
 
+¿Cuántos kilogramos de papel consume la empresa mensualmente? (ej: 20 kg)"""
+WATER_ESTIMATE_MESSAGE = """Entiendo que no tienes el dato exacto. He estimado un consumo aproximado de {water_consumption} m³ basado en el número de empleados.
+
 ¿Cuántos kilogramos de papel consume la empresa mensualmente? (ej: 20 kg)"""
 
 PAPER_CONSUMPTION_ERROR_MESSAGE = """No pude entender la cantidad. Por favor, ingresa un valor numérico en kg."""
 CONFIRM_PAPER_CONSUMPTION_MESSAGE = """Registrado: {paper_consumption} kg de papel mensuales.
 
 Sobre la infraestructura, ¿cuántos metros cuadrados (m²) tiene la oficina o instalación principal?"""
+PAPER_ESTIMATE_MESSAGE = """Entiendo que no tienes el dato exacto. He estimado un consumo aproximado de {paper_consumption} kg basado en el número de empleados.
 
-OFFICE_SQM_ERROR_MESSAGE = """No pude entender la cantidad. Por favor, ingresa un valor numérico en m²."""
-CONFIRM_OFFICE_SQM_MESSAGE = """Registrado: {office_sqm} m² de oficina.
+¿Cuántos metros cuadrados (m²) tiene la oficina o instalación principal?"""
 
-¿Qué sistema de climatización utiliza principalmente? Elige una opción:
+OFFICE_SQM_ERROR_MESSAGE = """No pude entender la cantidad. Por favor, ingresa un valor numérico en m²."""
+CLIMATE_CONTROL_QUESTION = """¿Qué sistema de climatización utiliza principalmente? Elige una opción:
 1. Aire acondicionado
 2. Calefacción a gas
 3. Calefacción eléctrica
 4. Bomba de calor (más eficiente)
 5. Natural (sin sistemas activos)"""
+CONFIRM_OFFICE_SQM_MESSAGE = """Registrado: {office_sqm} m² de oficina.
+
+""" + CLIMATE_CONTROL_QUESTION
+OFFICE_ESTIMATE_MESSAGE = """Entiendo que no tienes el dato exacto. He estimado aproximadamente {office_sqm} m² basado en el número de empleados.
+
+""" + CLIMATE_CONTROL_QUESTION
 
 CLIMATE_CONTROL_ERROR_MESSAGE = """No pude entender la opción. Por favor, indica el número (1-5) o el tipo de sistema."""
 CONFIRM_CLIMATE_CONTROL_MESSAGE = """Registrado: {climate_control_name} como sistema principal de climatización.
@@ -131,10 +164,10 @@ CALCULATING_MESSAGE = """Procesando datos y calculando la huella de carbono...""
 RESULT_MESSAGE = """
 ¡Análisis completado! Resultados para {company_name}:
 
-📊 HUELLA DE CARBONO TOTAL: {total_footprint:.2f} toneladas CO₂e mensuales
+📊 HUELLA DE CARBONO TOTAL: {total_footprint:.2f} toneladas CO₂e mensuales{uncertainty}
 👤 HUELLA POR EMPLEADO: {per_employee:.2f} toneladas CO₂e mensuales
 
-🏆 PUNTAJE DE SOSTENIBILIDAD: {score}/100 - {category}
+🏆 PUNTAJE DE SOSTENIBILIDAD: {score}/100 - {category}{benchmark}
 
 📋 DESGLOSE POR CATEGORÍA:
 {breakdown}
@@ -151,31 +184,24 @@ Gracias por utilizar nuestra calculadora de huella de carbono. Con estos datos p
 
 # --- Helper para extraer número (Versión mejorada) ---
 def extract_numeric_value(text: str, context: str) -> Optional[float]:
-    """Intenta extraer un valor numérico usando validación directa primero y luego LLM si es necesario."""
+    """Intenta extraer un valor numérico con el parser local primero y luego LLM si la respuesta es ambigua."""
     if not text or not text.strip():
         logger.warning(f"Input vacío para contexto: {context}")
         return None
     
-    # PRIMERO: Intentar conversión directa para casos simples como "5", "10.5", etc.
-    try:
-        # Si el input es directamente un número, convertirlo y devolver
-        cleaned_text = text.strip()
-        return float(cleaned_text)
-    except ValueError:
-        # Si no es un número directo, intentar con regex para casos como "5 empleados"
-        import re
-        numeric_match = re.search(r'(\d+(?:\.\d+)?)', cleaned_text)
-        if numeric_match:
-            try:
-                number = float(numeric_match.group(1))
-                logger.info(f"Extracción directa: Número {number} encontrado en '{text}' para {context}")
-                return number
-            except ValueError:
-                # Continuar con LLM si la extracción regex falla
-                pass
+    # PRIMERO: Parser local (separadores, palabras, k/mil/millón, %, rangos).
+    # Sólo se consulta al LLM si la respuesta es ambigua.
+    parsed = parse_number(text)
+    if parsed and parsed.confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+        logger.info(f"Extracción local: Número {parsed.value} ({parsed.kind}, confianza {parsed.confidence:.2f}) en '{text}' para {context}")
+        return parsed.value
+
+    # Modo degradado: con el circuito LLM abierto no se espera a la API
+    if not is_llm_available():
+        logger.info(f"LLM no disponible (circuito abierto): se usa sólo el parser local para {context}.")
+        return parsed.value if parsed else None
     
-    # SEGUNDO: Si la validación directa falla, usar LLM para casos más complejos
-    # como "cinco", "5k", "cinco mil", etc.
+    # SEGUNDO: Si el parser local no está seguro, usar LLM para casos más complejos
     prompt = f"""El usuario ha respondido '{text}' a la pregunta sobre '{context}'.
 Extrae SOLO el valor numérico, ignorando texto y símbolos de moneda.
 Si dice 'mil' o 'k', interpreta como multiplicación por 1000.
@@ -193,16 +219,22 @@ Recuerda, tu única respuesta debe ser un número o 'None'. Nada más."""
                 # Convertir coma a punto si hay
                 cleaned_response = cleaned_response.replace(',', '.')
                 number = float(cleaned_response)
+                if response.strip().startswith('-'):
+                    number = -number
                 logger.info(f"Extracción LLM: Número {number} extraído de '{text}' para {context}")
                 return number
             except ValueError:
                 logger.warning(f"No se pudo convertir la respuesta del LLM '{response}' a número.")
-                return None
-        logger.info(f"LLM no extrajo número para '{context}'. Respuesta: {response}")
-        return None
+        else:
+            logger.info(f"LLM no extrajo número para '{context}'. Respuesta: {response}")
     except Exception as e:
         logger.error(f"Error durante la extracción numérica: {e}", exc_info=True)
-        return None
+
+    # Sin respuesta útil del LLM: usar la mejor estimación local, si la hay
+    if parsed:
+        logger.info(f"Usando estimación local de baja confianza {parsed.value} para {context}")
+        return parsed.value
+    return None
 
 # --- Nodos ---
 
@@ -212,851 +244,460 @@ def start_node(state: GraphState) -> Dict[str, Any]:
     # La tarea inicial después de saludar es esperar el nombre de la empresa
     return {"messages": [WELCOME_MESSAGE], "current_task": "esperando_nombre_empresa"}
 
-# NUEVO NODO: Procesar el nombre de la empresa
-def process_company_name_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta del usuario para obtener el nombre de la empresa."""
-    logger.info("--- Procesando Nombre Empresa ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    company_name: Optional[str] = None
-    next_task: TaskStateType = "esperando_nombre_empresa" # Por defecto, re-pregunta
-    response_message = COMPANY_NAME_ERROR_MESSAGE
-
-    if user_input and user_input.strip():
-        # Podríamos usar el LLM aquí para una extracción más robusta,
-        # pero para un nombre de empresa, a menudo basta con tomar el input directo.
-        # O podríamos usar el LLM para validar/limpiar.
-        # Ejemplo simple:
-        company_name = user_input.strip()
-        logger.info(f"Nombre Empresa extraído: {company_name}")
-        # Prepara el mensaje de confirmación y la siguiente pregunta
-        response_message = CONFIRM_COMPANY_NAME_MESSAGE.format(company_name=company_name)
-        # Avanza a la siguiente tarea
-        next_task = "esperando_nombre_responsable"
-    else:
-        logger.warning("Input nombre empresa vacío.")
-        # Mantiene la tarea y mensaje de error
-
-    return {
-        "company_name": company_name, # Actualiza el estado
-        "messages": current_messages + [response_message], # Añade el mensaje de respuesta/error
-        "current_task": next_task, # Define la siguiente tarea
-        "last_user_intent": None, # Resetea la intención (o podría clasificarse)
-        "user_input": None # Limpia el input procesado
-    }
-
-# NUEVO NODO: Procesar el nombre del responsable
-def process_responsible_name_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta del usuario para obtener el nombre del responsable."""
-    logger.info("--- Procesando Nombre Responsable ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    responsible_name: Optional[str] = None
-    next_task: TaskStateType = "esperando_nombre_responsable"
-    response_message = RESPONSIBLE_NAME_ERROR_MESSAGE
-
-    if user_input and user_input.strip():
-        responsible_name = user_input.strip()
-        logger.info(f"Nombre Responsable extraído: {responsible_name}")
-        # Incluir el nombre de la empresa en el mensaje
-        response_message = CONFIRM_RESPONSIBLE_NAME_MESSAGE.format(
-            responsible_name=responsible_name,
-            company_name=state.company_name or "tu empresa"
-        )
-        next_task = "esperando_cantidad_empleados"
-    else:
-        logger.warning("Input nombre responsable vacío.")
-
-    return {
-        "responsible_name": responsible_name,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
-
-# NUEVO NODO: Preguntar cantidad de empleados (ya la pregunta está en el mensaje anterior)
-# No necesitamos un nodo 'ask_responsible_name' separado porque la pregunta
-# se hace directamente en el mensaje de confirmación del nodo anterior (CONFIRM_COMPANY_NAME_MESSAGE).
-# Lo mismo aplica para la pregunta de cantidad de empleados.
-# Solo necesitamos los nodos 'process_...' para manejar la respuesta.
+# --- Motor de preguntas declarativo ---
+# Cada pregunta del cuestionario es una fila de QUESTION_SPECS; un único nodo genérico
+# (process_question_node) la ejecuta. Las palabras clave se compilan una sola vez al importar.
+
+FUEL_TYPE_CHOICES = {
+    "1": "gasolina", "gasolina": "gasolina", "nafta": "gasolina",
+    "2": "diesel", "diesel": "diesel", "diésel": "diesel", "gasoil": "diesel",
+    "3": "gas_natural", "gas natural": "gas_natural", "gas": "gas_natural",
+    "4": "electricidad", "eléctrico": "electricidad", "electrico": "electricidad",
+    "5": "ninguno", "no": "ninguno", "nada": "ninguno", "no aplica": "ninguno"
+}
+FUEL_TYPE_NAMES = {
+    "gasolina": "Gasolina",
+    "diesel": "Diésel",
+    "gas_natural": "Gas Natural",
+    "electricidad": "Electricidad",
+    "ninguno": "Ningún combustible"
+}
+FUEL_UNITS = {
+    "gasolina": "litros",
+    "diesel": "litros",
+    "gas_natural": "m³",
+    "electricidad": "kWh",
+    "ninguno": "unidades"
+}
+CLIMATE_CONTROL_CHOICES = {
+    "1": "aire_acondicionado", "aire": "aire_acondicionado", "aire acondicionado": "aire_acondicionado", "a/c": "aire_acondicionado",
+    "2": "calefaccion_gas", "calefaccion gas": "calefaccion_gas", "gas": "calefaccion_gas", "caldera": "calefaccion_gas",
+    "3": "calefaccion_electrica", "electrica": "calefaccion_electrica", "eléctrica": "calefaccion_electrica", "radiadores": "calefaccion_electrica",
+    "4": "bomba_calor", "bomba": "bomba_calor", "bomba de calor": "bomba_calor", "aerotermia": "bomba_calor",
+    "5": "natural", "no hay": "natural", "ninguno": "natural", "ventilacion natural": "natural", "ventanas": "natural"
+}
+CLIMATE_CONTROL_NAMES = {
+    "aire_acondicionado": "Aire acondicionado",
+    "calefaccion_gas": "Calefacción a gas",
+    "calefaccion_electrica": "Calefacción eléctrica",
+    "bomba_calor": "Bomba de calor",
+    "natural": "Ventilación natural"
+}
+
+NO_TRAVEL_KEYWORDS = ("no", "cero", "0", "ninguno", "no viajamos", "nada", "no hay", "no aplica")
+
+
+class QuestionSpec(NamedTuple):
+    """Definición declarativa de una pregunta del cuestionario."""
+    field: str                   # Campo del GraphState que se completa
+    task: TaskStateType          # Tarea en la que se hace la pregunta
+    kind: str                    # "texto", "numero", "entero", "porcentaje" u "opcion"
+    label: str                   # Nombre legible (logs y resúmenes)
+    question: str                # Pregunta aislada (cuando el flujo salta directo a esta tarea)
+    confirm_message: str         # Plantilla de confirmación (incluye la pregunta siguiente)
+    error_message: str
+    next_task: TaskStateType
+    context: str = ""            # Descripción para el extractor numérico/LLM
+    placeholder: Optional[str] = None  # Nombre del valor en las plantillas (por defecto, field)
+    positive: bool = False       # Exige valor > 0 (si no, >= 0)
+    zero_keywords: Tuple[str, ...] = ()     # Respuestas textuales que equivalen a 0
+    unknown_keywords: Tuple[str, ...] = ()  # "No sé": se estima según la cantidad de empleados
+    estimate_per_employee: float = 0.0
+    estimate_message: str = ""
+    estimate_on_empty: bool = False
+    choices: Optional[Dict[str, str]] = None       # Respuesta -> valor (kind "opcion")
+    choice_names: Optional[Dict[str, str]] = None  # Valor -> nombre a mostrar
+    skip_values: Tuple[str, ...] = ()  # Valores que saltan a skip_task con skip_message
+    skip_message: str = ""
+    skip_task: TaskStateType = None
+    cap_with: Tuple[str, ...] = ()     # Porcentajes cuya suma con éste no puede superar 100
+    # Compilados al importar
+    zero_pattern: Optional["re.Pattern[str]"] = None
+    unknown_pattern: Optional["re.Pattern[str]"] = None
+    context_uses_state: bool = False   # El contexto usa datos del estado ("consumo de {fuel_type}")
+    messages_use_state: bool = False   # Alguna plantilla usa datos del estado (empresa, combustible)
+
+
+QUESTION_SPECS_TABLE: Tuple[QuestionSpec, ...] = (
+    QuestionSpec(
+        field="company_name", task="esperando_nombre_empresa", kind="texto", label="Empresa",
+        question="¿Cuál es el nombre de la empresa?",
+        confirm_message=CONFIRM_COMPANY_NAME_MESSAGE, error_message=COMPANY_NAME_ERROR_MESSAGE,
+        next_task="esperando_nombre_responsable"),
+    QuestionSpec(
+        field="responsible_name", task="esperando_nombre_responsable", kind="texto", label="Responsable",
+        question="¿Podrías indicarme tu nombre o el del responsable que completa esta información?",
+        confirm_message=CONFIRM_RESPONSIBLE_NAME_MESSAGE, error_message=RESPONSIBLE_NAME_ERROR_MESSAGE,
+        next_task="esperando_cantidad_empleados"),
+    QuestionSpec(
+        field="employee_count", task="esperando_cantidad_empleados", kind="entero", label="Empleados",
+        question="¿Cuál es la cantidad aproximada de empleados?", context="cantidad de empleados",
+        confirm_message=CONFIRM_EMPLOYEE_COUNT_MESSAGE, error_message=EMPLOYEE_COUNT_ERROR_MESSAGE,
+        next_task="esperando_consumo_luz"),
+    QuestionSpec(
+        field="electricity_kwh", task="esperando_consumo_luz", kind="numero", label="Consumo eléctrico (kWh/mes)",
+        question="¿Cuál es el consumo mensual aproximado de electricidad en kWh? (ej: 1500 kWh)",
+        context="consumo eléctrico en kWh",
+        confirm_message=CONFIRM_ELECTRICITY_KWH_MESSAGE, error_message=ELECTRICITY_KWH_ERROR_MESSAGE,
+        next_task="esperando_tipo_combustible"),
+    QuestionSpec(
+        field="fuel_type", task="esperando_tipo_combustible", kind="opcion", label="Combustible principal",
+        question=FUEL_TYPE_QUESTION,
+        confirm_message=CONFIRM_FUEL_TYPE_MESSAGE, error_message=FUEL_TYPE_ERROR_MESSAGE,
+        next_task="esperando_consumo_combustible",
+        choices=FUEL_TYPE_CHOICES, choice_names=FUEL_TYPE_NAMES,
+        # Sin combustible fósil no hace falta preguntar la cantidad
+        skip_values=("electricidad", "ninguno"), skip_message=FUEL_TYPE_SKIP_MESSAGE,
+        skip_task="esperando_consumo_gas"),
+    QuestionSpec(
+        field="fuel_consumption", task="esperando_consumo_combustible", kind="numero",
+        label="Consumo de combustible (litros o m³/mes)",
+        question="¿Cuál es el consumo mensual aproximado de combustible? (litros, o m³ si es gas natural)",
+        context="consumo de {fuel_type}",
+        confirm_message=CONFIRM_FUEL_CONSUMPTION_MESSAGE, error_message=FUEL_CONSUMPTION_ERROR_MESSAGE,
+        next_task="esperando_consumo_gas"),
+    QuestionSpec(
+        field="gas_consumption", task="esperando_consumo_gas", kind="numero", label="Gas natural (m³/mes)",
+        question="¿Cuál es el consumo mensual de gas natural en m³? (Si no utilizan gas natural, ingresa 0)",
+        context="consumo de gas natural",
+        confirm_message=CONFIRM_GAS_CONSUMPTION_MESSAGE, error_message=GAS_CONSUMPTION_ERROR_MESSAGE,
+        next_task="esperando_distancia_empleados",
+        zero_keywords=("no", "cero", "0", "nada", "no usamos", "no tenemos", "no aplica")),
+    QuestionSpec(
+        field="employee_commute_distance", task="esperando_distancia_empleados", kind="numero",
+        label="Distancia diaria al trabajo (km)",
+        question="¿Cuál es la distancia promedio (en km) que recorre cada empleado diariamente para ir al trabajo? (ida)",
+        context="distancia de transporte", placeholder="commute_distance",
+        confirm_message=CONFIRM_COMMUTE_DISTANCE_MESSAGE, error_message=COMMUTE_DISTANCE_ERROR_MESSAGE,
+        next_task="esperando_distribucion_transporte"),
+    QuestionSpec(
+        field="transport_pct_car", task="esperando_distribucion_transporte", kind="porcentaje",
+        label="Auto particular (%)",
+        question="¿Qué porcentaje de tus empleados utiliza auto particular para ir al trabajo? (ej: 60%)",
+        context="porcentaje en auto", placeholder="car_pct",
+        confirm_message=CONFIRM_CAR_PCT_MESSAGE, error_message=CAR_PCT_ERROR_MESSAGE,
+        next_task="esperando_distribucion_transporte"),
+    QuestionSpec(
+        field="transport_pct_public", task="esperando_distribucion_transporte", kind="porcentaje",
+        label="Transporte público (%)",
+        question="¿Qué porcentaje utiliza transporte público (bus, tren, metro, etc.)?",
+        context="porcentaje en transporte público", placeholder="public_pct",
+        confirm_message=CONFIRM_PUBLIC_PCT_MESSAGE, error_message=PUBLIC_PCT_ERROR_MESSAGE,
+        next_task="esperando_distribucion_transporte", cap_with=("transport_pct_car",)),
+    QuestionSpec(
+        field="transport_pct_green", task="esperando_distribucion_transporte", kind="porcentaje",
+        label="Transporte sostenible (%)",
+        question="¿Qué porcentaje se transporta de forma sostenible (bicicleta, caminando, etc.)?",
+        context="porcentaje en transporte sostenible", placeholder="green_pct",
+        confirm_message=CONFIRM_GREEN_PCT_MESSAGE, error_message=GREEN_PCT_ERROR_MESSAGE,
+        next_task="esperando_cantidad_residuos", cap_with=("transport_pct_car", "transport_pct_public")),
+    QuestionSpec(
+        field="waste_kg", task="esperando_cantidad_residuos", kind="numero", label="Residuos (kg/mes)",
+        question="¿Cuántos kilogramos aproximados de residuos genera la empresa mensualmente? (ej: 200 kg)",
+        context="cantidad de residuos",
+        confirm_message=CONFIRM_WASTE_KG_MESSAGE, error_message=WASTE_KG_ERROR_MESSAGE,
+        next_task="esperando_porcentaje_reciclaje"),
+    QuestionSpec(
+        field="recycle_pct", task="esperando_porcentaje_reciclaje", kind="porcentaje", label="Reciclaje (%)",
+        question="Del total de residuos, ¿qué porcentaje aproximado se recicla? (ej: 30%)",
+        context="porcentaje de reciclaje",
+        confirm_message=CONFIRM_RECYCLE_PCT_MESSAGE, error_message=RECYCLE_PCT_ERROR_MESSAGE,
+        next_task="esperando_consumo_agua",
+        zero_keywords=("no", "nada", "cero", "0", "ninguno", "no reciclamos")),
+    QuestionSpec(
+        field="water_consumption", task="esperando_consumo_agua", kind="numero", label="Agua (m³/mes)",
+        question="¿Cuántos metros cúbicos (m³) de agua consume la empresa mensualmente? (ej: 30 m³)",
+        context="consumo de agua",
+        confirm_message=CONFIRM_WATER_CONSUMPTION_MESSAGE, error_message=WATER_CONSUMPTION_ERROR_MESSAGE,
+        next_task="esperando_consumo_papel",
+        # Aprox. 1 m³ por empleado al mes
+        unknown_keywords=("no sé", "no se", "desconocido", "no sabemos", "no tengo idea", "no tenemos el dato"),
+        estimate_per_employee=1.0, estimate_message=WATER_ESTIMATE_MESSAGE),
+    QuestionSpec(
+        field="paper_consumption", task="esperando_consumo_papel", kind="numero", label="Papel (kg/mes)",
+        question="¿Cuántos kilogramos de papel consume la empresa mensualmente? (ej: 20 kg)",
+        context="consumo de papel",
+        confirm_message=CONFIRM_PAPER_CONSUMPTION_MESSAGE, error_message=PAPER_CONSUMPTION_ERROR_MESSAGE,
+        next_task="esperando_metros_oficina",
+        # Aprox. 1 kg por empleado al mes
+        unknown_keywords=("no sé", "no se", "desconocido", "no sabemos", "no tengo idea", "poco", "muy poco"),
+        estimate_per_employee=1.0, estimate_message=PAPER_ESTIMATE_MESSAGE),
+    QuestionSpec(
+        field="office_sqm", task="esperando_metros_oficina", kind="numero", label="Superficie de oficina (m²)",
+        question="¿Cuántos metros cuadrados (m²) tiene la oficina o instalación principal?",
+        context="metros cuadrados", positive=True,
+        confirm_message=CONFIRM_OFFICE_SQM_MESSAGE, error_message=OFFICE_SQM_ERROR_MESSAGE,
+        next_task="esperando_tipo_climatizacion",
+        # Aprox. 10 m² por empleado
+        unknown_keywords=("no sé", "no tengo"), estimate_per_employee=10.0,
+        estimate_message=OFFICE_ESTIMATE_MESSAGE, estimate_on_empty=True),
+    QuestionSpec(
+        field="climate_control", task="esperando_tipo_climatizacion", kind="opcion", label="Climatización",
+        question=CLIMATE_CONTROL_QUESTION,
+        confirm_message=CONFIRM_CLIMATE_CONTROL_MESSAGE, error_message=CLIMATE_CONTROL_ERROR_MESSAGE,
+        next_task="esperando_km_avion",
+        choices=CLIMATE_CONTROL_CHOICES, choice_names=CLIMATE_CONTROL_NAMES),
+    QuestionSpec(
+        field="air_travel_km", task="esperando_km_avion", kind="numero", label="Viajes en avión (km/mes)",
+        question="¿Cuántos kilómetros mensuales recorren en total los empleados en viajes de avión? (0 si no aplica)",
+        context="kilómetros en avión", placeholder="air_travel",
+        confirm_message=CONFIRM_AIR_TRAVEL_MESSAGE, error_message=AIR_TRAVEL_ERROR_MESSAGE,
+        next_task="esperando_km_terrestres", zero_keywords=NO_TRAVEL_KEYWORDS),
+    QuestionSpec(
+        field="ground_travel_km", task="esperando_km_terrestres", kind="numero", label="Viajes terrestres (km/mes)",
+        question="¿Cuántos kilómetros mensuales recorren en viajes terrestres de larga distancia (tren, bus)? (0 si no aplica)",
+        context="kilómetros terrestres", placeholder="ground_travel",
+        confirm_message=CONFIRM_GROUND_TRAVEL_MESSAGE + "\n\n" + CALCULATING_MESSAGE,
+        error_message=GROUND_TRAVEL_ERROR_MESSAGE,
+        next_task="calculando_huella", zero_keywords=NO_TRAVEL_KEYWORDS),
+)
+
+
+def _keywords_pattern(keywords: Tuple[str, ...]) -> Optional["re.Pattern[str]"]:
+    """Una sola regex por pregunta. Palabras completas: "0" no debe coincidir con "300"."""
+    if not keywords:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(re.escape(k) for k in keywords) + r")(?!\w)")
 
-# >> NUEVO NODO <<
-def process_employee_count_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener la cantidad de empleados."""
-    logger.info("--- Procesando Cantidad Empleados ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    employee_count: Optional[int] = None
-    next_task: TaskStateType = "esperando_cantidad_empleados"
-    response_message = EMPLOYEE_COUNT_ERROR_MESSAGE
-
-    numeric_value = extract_numeric_value(user_input, "cantidad de empleados")
-
-    if numeric_value is not None and numeric_value >= 0:
-        employee_count = int(numeric_value)  # Convertir a entero ya que son personas
-        logger.info(f"Cantidad Empleados extraída: {employee_count}")
-        response_message = CONFIRM_EMPLOYEE_COUNT_MESSAGE.format(employee_count=employee_count)
-        next_task = "esperando_consumo_luz"  # Cambiado: ahora preguntamos por kWh, no por gasto
-    else:
-        logger.warning(f"No se pudo extraer número válido de empleados de: {user_input}")
 
-    return {
-        "employee_count": employee_count,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
+_STATE_TEMPLATE_ARGS = frozenset({"company_name", "fuel_type", "fuel_type_name", "fuel_unit"})
 
-# NUEVO NODO: Procesar consumo de electricidad en kWh
-def process_electricity_consumption_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el consumo eléctrico en kWh."""
-    logger.info("--- Procesando Consumo Eléctrico ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    electricity_kwh: Optional[float] = None
-    next_task: TaskStateType = "esperando_consumo_luz"
-    response_message = ELECTRICITY_KWH_ERROR_MESSAGE
-
-    numeric_value = extract_numeric_value(user_input, "consumo eléctrico en kWh")
-
-    if numeric_value is not None and numeric_value >= 0:
-        electricity_kwh = numeric_value
-        logger.info(f"Consumo eléctrico extraído: {electricity_kwh} kWh")
-        response_message = CONFIRM_ELECTRICITY_KWH_MESSAGE.format(electricity_kwh=electricity_kwh)
-        next_task = "esperando_tipo_combustible"
-    else:
-        logger.warning(f"No se pudo extraer consumo eléctrico válido de: {user_input}")
 
-    return {
-        "electricity_kwh": electricity_kwh,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
+def _template_args(*templates: str) -> set:
+    return {name for template in templates for _, name, _, _ in string.Formatter().parse(template) if name}
 
-# NUEVO NODO: Procesar tipo de combustible
-def process_fuel_type_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el tipo de combustible principal."""
-    logger.info("--- Procesando Tipo de Combustible ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    fuel_type = None
-    fuel_type_name = ""
-    fuel_unit = ""
-    next_task: TaskStateType = "esperando_tipo_combustible"
-    response_message = FUEL_TYPE_ERROR_MESSAGE
-
-    if user_input and user_input.strip():
-        # Mapeo de respuestas posibles a tipos de combustible
-        fuel_types_map = {
-            "1": "gasolina", "gasolina": "gasolina", "nafta": "gasolina",
-            "2": "diesel", "diesel": "diesel", "diésel": "diesel", "gasoil": "diesel",
-            "3": "gas_natural", "gas natural": "gas_natural", "gas": "gas_natural",
-            "4": "electricidad", "eléctrico": "electricidad", "electrico": "electricidad",
-            "5": "ninguno", "no": "ninguno", "nada": "ninguno", "no aplica": "ninguno"
-        }
-        
-        # Buscar en el mapa
-        cleaned_input = user_input.strip().lower()
-        fuel_type = fuel_types_map.get(cleaned_input)
-        
-        if fuel_type:
-            # Nombres descriptivos y unidades para mostrar al usuario
-            fuel_names = {
-                "gasolina": "Gasolina", 
-                "diesel": "Diésel",
-                "gas_natural": "Gas Natural",
-                "electricidad": "Electricidad",
-                "ninguno": "Ningún combustible"
-            }
-            
-            fuel_units = {
-                "gasolina": "litros",
-                "diesel": "litros",
-                "gas_natural": "m³",
-                "electricidad": "kWh",
-                "ninguno": "unidades"
-            }
-            
-            fuel_type_name = fuel_names.get(fuel_type, fuel_type)
-            fuel_unit = fuel_units.get(fuel_type, "unidades")
-            
-            logger.info(f"Tipo de combustible extraído: {fuel_type} (Nombre: {fuel_type_name}, Unidad: {fuel_unit})")
-            
-            # Para combustibles que no requieren cantidad, saltar a la siguiente pregunta
-            if fuel_type in ["electricidad", "ninguno"]:
-                response_message = f"Registrado: {fuel_type_name} como fuente principal. No es necesario especificar consumo adicional.\n\n¿Cuál es el consumo mensual de gas natural en m³? (Si no utilizan gas natural, ingresa 0)"
-                next_task = "esperando_consumo_gas"
-            else:
-                response_message = CONFIRM_FUEL_TYPE_MESSAGE.format(
-                    fuel_type_name=fuel_type_name,
-                    fuel_unit=fuel_unit
-                )
-                next_task = "esperando_consumo_combustible"
-        else:
-            logger.warning(f"No se pudo reconocer el tipo de combustible: {user_input}")
-    else:
-        logger.warning("Input tipo combustible vacío.")
 
-    return {
-        "fuel_type": fuel_type,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
+def compile_question_specs(specs: Tuple[QuestionSpec, ...]) -> Tuple[QuestionSpec, ...]:
+    """
+    Precompila cada pregunta una vez al importar: palabras clave en una regex y qué
+    plantillas necesitan datos del estado, para no armarlos en cada turno.
+    """
+    compiled = []
+    for spec in specs:
+        placeholder = spec.placeholder or spec.field
+        message_args = _template_args(spec.confirm_message, spec.skip_message, spec.estimate_message)
+        compiled.append(spec._replace(
+            placeholder=placeholder,
+            zero_pattern=_keywords_pattern(spec.zero_keywords),
+            unknown_pattern=_keywords_pattern(spec.unknown_keywords),
+            context_uses_state=bool(_template_args(spec.context)),
+            messages_use_state=bool((message_args - {placeholder, f"{placeholder}_name"}) & _STATE_TEMPLATE_ARGS),
+        ))
+    return tuple(compiled)
 
-# NUEVO NODO: Procesar consumo de combustible
-def process_fuel_consumption_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el consumo de combustible."""
-    logger.info("--- Procesando Consumo de Combustible ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    fuel_consumption: Optional[float] = None
-    next_task: TaskStateType = "esperando_consumo_combustible"
-    response_message = FUEL_CONSUMPTION_ERROR_MESSAGE
-
-    # Obtener el tipo de combustible y la unidad para el mensaje
-    fuel_type = state.fuel_type or "gasolina"  # Default por si acaso
-    fuel_units = {
-        "gasolina": "litros",
-        "diesel": "litros",
-        "gas_natural": "m³",
-        "electricidad": "kWh",
-        "ninguno": "unidades"
-    }
-    fuel_unit = fuel_units.get(fuel_type, "unidades")
-    
-    fuel_names = {
-        "gasolina": "Gasolina", 
-        "diesel": "Diésel",
-        "gas_natural": "Gas Natural",
-        "electricidad": "Electricidad",
-        "ninguno": "Ningún combustible"
-    }
-    fuel_type_name = fuel_names.get(fuel_type, fuel_type)
 
-    numeric_value = extract_numeric_value(user_input, f"consumo de {fuel_type}")
+QUESTION_SPECS = compile_question_specs(QUESTION_SPECS_TABLE)
+SPECS_BY_FIELD: Dict[str, QuestionSpec] = {spec.field: spec for spec in QUESTION_SPECS}
+SPECS_BY_TASK: Dict[str, Tuple[QuestionSpec, ...]] = {}
+for _spec in QUESTION_SPECS:
+    SPECS_BY_TASK[_spec.task] = SPECS_BY_TASK.get(_spec.task, ()) + (_spec,)
 
-    if numeric_value is not None and numeric_value >= 0:
-        fuel_consumption = numeric_value
-        logger.info(f"Consumo de {fuel_type} extraído: {fuel_consumption} {fuel_unit}")
-        response_message = CONFIRM_FUEL_CONSUMPTION_MESSAGE.format(
-            fuel_consumption=fuel_consumption,
-            fuel_unit=fuel_unit,
-            fuel_type_name=fuel_type_name
-        )
-        next_task = "esperando_consumo_gas"
-    else:
-        logger.warning(f"No se pudo extraer consumo de combustible válido de: {user_input}")
 
-    return {
-        "fuel_consumption": fuel_consumption,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
+def select_question(state: GraphState) -> Optional[QuestionSpec]:
+    """Pregunta que corresponde a la tarea actual (la de transporte se responde en tres pasos)."""
+    specs = SPECS_BY_TASK.get(state.current_task)
+    if not specs:
+        return None
+    return next((spec for spec in specs if getattr(state, spec.field) is None), specs[-1])
 
-# NUEVO NODO: Procesar consumo de gas
-def process_gas_consumption_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el consumo de gas natural."""
-    logger.info("--- Procesando Consumo de Gas ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    gas_consumption: Optional[float] = None
-    next_task: TaskStateType = "esperando_consumo_gas"
-    response_message = GAS_CONSUMPTION_ERROR_MESSAGE
-
-    # Verificar si la respuesta indica "no consumo" de forma textual
-    no_consumption_keywords = ["no", "cero", "0", "nada", "no usamos", "no tenemos", "no aplica"]
-    if user_input and any(keyword in user_input.lower() for keyword in no_consumption_keywords):
-        gas_consumption = 0
-        logger.info("Consumo de gas: 0 (indicación textual de no consumo)")
-        response_message = CONFIRM_GAS_CONSUMPTION_MESSAGE.format(gas_consumption=0)
-        next_task = "esperando_distancia_empleados"
-    else:
-        numeric_value = extract_numeric_value(user_input, "consumo de gas natural")
-        
-        if numeric_value is not None and numeric_value >= 0:
-            gas_consumption = numeric_value
-            logger.info(f"Consumo de gas extraído: {gas_consumption} m³")
-            response_message = CONFIRM_GAS_CONSUMPTION_MESSAGE.format(gas_consumption=gas_consumption)
-            next_task = "esperando_distancia_empleados"
-        else:
-            logger.warning(f"No se pudo extraer consumo de gas válido de: {user_input}")
 
+def _format_args(state: GraphState, updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos del estado (con los valores recién extraídos) disponibles en las plantillas."""
+    fuel_type = updates.get("fuel_type", state.fuel_type) or "gasolina"
     return {
-        "gas_consumption": gas_consumption,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
+        "company_name": updates.get("company_name", state.company_name) or "tu empresa",
+        "fuel_type": fuel_type,
+        "fuel_type_name": FUEL_TYPE_NAMES.get(fuel_type, fuel_type),
+        "fuel_unit": FUEL_UNITS.get(fuel_type, "unidades"),
     }
 
-# NUEVO NODO: Procesar distancia de transporte de empleados
-def process_commute_distance_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener la distancia promedio de transporte."""
-    logger.info("--- Procesando Distancia de Transporte ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    commute_distance: Optional[float] = None
-    next_task: TaskStateType = "esperando_distancia_empleados"
-    response_message = COMMUTE_DISTANCE_ERROR_MESSAGE
-
-    numeric_value = extract_numeric_value(user_input, "distancia de transporte")
-
-    if numeric_value is not None and numeric_value >= 0:
-        commute_distance = numeric_value
-        logger.info(f"Distancia de transporte extraída: {commute_distance} km")
-        response_message = CONFIRM_COMMUTE_DISTANCE_MESSAGE.format(commute_distance=commute_distance)
-        next_task = "esperando_distribucion_transporte"
-    else:
-        logger.warning(f"No se pudo extraer distancia de transporte válida de: {user_input}")
-
-    return {
-        "employee_commute_distance": commute_distance,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
 
-# NUEVO NODO: Procesar porcentaje de empleados que usan auto
-def process_car_percentage_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el porcentaje de empleados que usan auto."""
-    logger.info("--- Procesando Porcentaje Auto ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    car_pct: Optional[int] = None
-    next_task: TaskStateType = "esperando_distribucion_transporte"
-    response_message = CAR_PCT_ERROR_MESSAGE
-
-    # Extraer número o porcentaje
-    numeric_value = extract_numeric_value(user_input, "porcentaje en auto")
-
-    if numeric_value is not None:
-        # Limitar al rango 0-100
-        car_pct = min(100, max(0, int(numeric_value)))
-        logger.info(f"Porcentaje auto extraído: {car_pct}%")
-        response_message = CONFIRM_CAR_PCT_MESSAGE.format(car_pct=car_pct)
-        next_task = "esperando_distribucion_transporte"  # La siguiente pregunta es sobre transporte público
-        return {
-            "transport_pct_car": car_pct,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-    else:
-        logger.warning(f"No se pudo extraer porcentaje de auto válido de: {user_input}")
-        return {
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-# NUEVO NODO: Procesar porcentaje de empleados que usan transporte público
-def process_public_transport_percentage_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el porcentaje de empleados que usan transporte público."""
-    logger.info("--- Procesando Porcentaje Transporte Público ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    public_pct: Optional[int] = None
-    next_task: TaskStateType = "esperando_distribucion_transporte"  # Mismo task, pero ahora se pregunta por verde
-    response_message = PUBLIC_PCT_ERROR_MESSAGE
-
-    # Extraer número o porcentaje
-    numeric_value = extract_numeric_value(user_input, "porcentaje en transporte público")
-
-    if numeric_value is not None:
-        # Limitar al rango 0-100
-        public_pct = min(100, max(0, int(numeric_value)))
-        logger.info(f"Porcentaje transporte público extraído: {public_pct}%")
-        
-        # Verificar que los porcentajes no superan 100% (con auto)
-        car_pct = state.transport_pct_car or 0
-        if car_pct + public_pct > 100:
-            logger.warning(f"Los porcentajes de auto ({car_pct}%) y transporte público ({public_pct}%) superan 100%. Ajustando...")
-            public_pct = 100 - car_pct
-        
-        response_message = CONFIRM_PUBLIC_PCT_MESSAGE.format(public_pct=public_pct)
-        next_task = "esperando_distribucion_transporte"  # La siguiente pregunta es sobre transporte verde
-        return {
-            "transport_pct_public": public_pct,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-    else:
-        logger.warning(f"No se pudo extraer porcentaje de transporte público válido de: {user_input}")
-        return {
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-# NUEVO NODO: Procesar porcentaje de empleados que usan transporte sostenible
-def process_green_transport_percentage_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el porcentaje de empleados que usan transporte sostenible."""
-    logger.info("--- Procesando Porcentaje Transporte Sostenible ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    green_pct: Optional[int] = None
-    next_task: TaskStateType = "esperando_distribucion_transporte"
-    response_message = GREEN_PCT_ERROR_MESSAGE
-
-    # Extraer número o porcentaje
-    numeric_value = extract_numeric_value(user_input, "porcentaje en transporte sostenible")
-
-    if numeric_value is not None:
-        # Limitar al rango 0-100
-        green_pct = min(100, max(0, int(numeric_value)))
-        logger.info(f"Porcentaje transporte sostenible extraído: {green_pct}%")
-        
-        # Verificar que los porcentajes no superan 100% (con auto y público)
-        car_pct = state.transport_pct_car or 0
-        public_pct = state.transport_pct_public or 0
-        if car_pct + public_pct + green_pct > 100:
-            logger.warning(f"Los porcentajes de auto ({car_pct}%), público ({public_pct}%) y sostenible ({green_pct}%) superan 100%. Ajustando...")
-            green_pct = 100 - (car_pct + public_pct)
-            if green_pct < 0:
-                green_pct = 0
-        
-        response_message = CONFIRM_GREEN_PCT_MESSAGE.format(green_pct=green_pct)
-        next_task = "esperando_cantidad_residuos"  # Pasamos a la siguiente categoría: residuos
-        return {
-            "transport_pct_green": green_pct,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-    else:
-        logger.warning(f"No se pudo extraer porcentaje de transporte sostenible válido de: {user_input}")
-        return {
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-# NUEVO NODO: Procesar cantidad de residuos
-def process_waste_amount_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener la cantidad de residuos generados."""
-    logger.info("--- Procesando Cantidad Residuos ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    waste_kg: Optional[float] = None
-    next_task: TaskStateType = "esperando_cantidad_residuos"
-    response_message = WASTE_KG_ERROR_MESSAGE
-
-    numeric_value = extract_numeric_value(user_input, "cantidad de residuos")
-
-    if numeric_value is not None and numeric_value >= 0:
-        waste_kg = numeric_value
-        logger.info(f"Cantidad de residuos extraída: {waste_kg} kg")
-        response_message = CONFIRM_WASTE_KG_MESSAGE.format(waste_kg=waste_kg)
-        next_task = "esperando_porcentaje_reciclaje"
-    else:
-        logger.warning(f"No se pudo extraer cantidad de residuos válida de: {user_input}")
+def cap_percentage(spec: QuestionSpec, value: float, values: Mapping[str, Any]) -> int:
+    """Porcentaje entero de 0 a 100 que, sumado a los campos spec.cap_with de values, no supera 100."""
+    value = min(100, int(value))
+    if spec.cap_with:
+        value = max(0, min(value, 100 - sum(values.get(f) or 0 for f in spec.cap_with)))
+    return value
 
-    return {
-        "waste_kg": waste_kg,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
 
-# NUEVO NODO: Procesar porcentaje de reciclaje
-def process_recycle_percentage_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el porcentaje de residuos reciclados."""
-    logger.info("--- Procesando Porcentaje Reciclaje ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    recycle_pct: Optional[int] = None
-    next_task: TaskStateType = "esperando_porcentaje_reciclaje"
-    response_message = RECYCLE_PCT_ERROR_MESSAGE
-
-    # Manejar respuestas del tipo "nada" o "no reciclamos"
-    no_recycle_keywords = ["no", "nada", "cero", "0", "ninguno", "no reciclamos"]
-    if user_input and any(keyword in user_input.lower() for keyword in no_recycle_keywords):
-        recycle_pct = 0
-        logger.info("Porcentaje reciclaje: 0% (indicación textual de no reciclaje)")
-        response_message = CONFIRM_RECYCLE_PCT_MESSAGE.format(recycle_pct=0)
-        next_task = "esperando_consumo_agua"
-        return {
-            "recycle_pct": recycle_pct,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-    # Extraer número o porcentaje
-    numeric_value = extract_numeric_value(user_input, "porcentaje de reciclaje")
-
-    if numeric_value is not None:
-        # Limitar al rango 0-100
-        recycle_pct = min(100, max(0, int(numeric_value)))
-        logger.info(f"Porcentaje reciclaje extraído: {recycle_pct}%")
-        response_message = CONFIRM_RECYCLE_PCT_MESSAGE.format(recycle_pct=recycle_pct)
-        next_task = "esperando_consumo_agua"
-        return {
-            "recycle_pct": recycle_pct,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-    else:
-        logger.warning(f"No se pudo extraer porcentaje de reciclaje válido de: {user_input}")
-        return {
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-# NUEVO NODO: Procesar consumo de agua
-def process_water_consumption_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el consumo de agua."""
-    logger.info("--- Procesando Consumo Agua ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    water_consumption: Optional[float] = None
-    next_task: TaskStateType = "esperando_consumo_agua"
-    response_message = WATER_CONSUMPTION_ERROR_MESSAGE
-
-    # Manejar respuestas del tipo "no sabemos" o "desconocido"
-    unknown_keywords = ["no sé", "no se", "desconocido", "no sabemos", "no tengo idea", "no tenemos el dato"]
-    if user_input and any(keyword in user_input.lower() for keyword in unknown_keywords):
-        # Usar un valor promedio conservador basado en el número de empleados (aprox. 1 m³ por empleado al mes)
-        if state.employee_count:
-            water_consumption = state.employee_count * 1.0
-            logger.info(f"Consumo de agua estimado: {water_consumption} m³ (basado en {state.employee_count} empleados)")
-            response_message = f"Entiendo que no tienes el dato exacto. He estimado un consumo aproximado de {water_consumption} m³ basado en el número de empleados.\n\n¿Cuántos kilogramos de papel consume la empresa mensualmente? (ej: 20 kg)"
-            next_task = "esperando_consumo_papel"
-            return {
-                "water_consumption": water_consumption,
-                "messages": current_messages + [response_message],
-                "current_task": next_task,
-                "last_user_intent": None,
-                "user_input": None
-            }
+def _parse_answer(spec: QuestionSpec, state: GraphState, user_input: Optional[str]) -> Optional[Any]:
+    """Interpreta la respuesta según el tipo de la pregunta. None si no es válida."""
+    text = (user_input or "").strip()
+    if spec.kind == "texto":
+        return text or None
+    if spec.kind == "opcion":
+        return spec.choices.get(text.lower()) if text else None
 
-    numeric_value = extract_numeric_value(user_input, "consumo de agua")
+    context = spec.context.format(**_format_args(state, {})) if spec.context_uses_state else spec.context
+    value = extract_numeric_value(user_input, context)
+    if value is None or value < 0:
+        return None
+    if spec.kind == "porcentaje":
+        return cap_percentage(spec, value, {f: getattr(state, f) for f in spec.cap_with})
+    if spec.positive and value == 0:
+        return None
+    return int(value) if spec.kind == "entero" else value
 
-    if numeric_value is not None and numeric_value >= 0:
-        water_consumption = numeric_value
-        logger.info(f"Consumo de agua extraído: {water_consumption} m³")
-        response_message = CONFIRM_WATER_CONSUMPTION_MESSAGE.format(water_consumption=water_consumption)
-        next_task = "esperando_consumo_papel"
-    else:
-        logger.warning(f"No se pudo extraer consumo de agua válido de: {user_input}")
 
-    return {
-        "water_consumption": water_consumption,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
+def process_question_node(state: GraphState, spec: Optional[QuestionSpec] = None) -> Dict[str, Any]:
+    """Nodo genérico: ejecuta la pregunta indicada (o la de la tarea actual) sobre la respuesta del usuario."""
+    spec = spec or select_question(state)
+    if spec is None:
+        logger.warning(f"No hay pregunta definida para la tarea '{state.current_task}'.")
+        return {"user_input": None}
 
-# NUEVO NODO: Procesar consumo de papel
-def process_paper_consumption_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el consumo de papel."""
-    logger.info("--- Procesando Consumo Papel ---")
+    # Un solo log por turno (el encabezado queda en debug): con INFO activo es parte del costo
+    logger.debug(f"--- Procesando {spec.label} ---")
     user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    paper_consumption: Optional[float] = None
-    next_task: TaskStateType = "esperando_consumo_papel"
-    response_message = PAPER_CONSUMPTION_ERROR_MESSAGE
-
-    # Manejar respuestas del tipo "no sabemos" o "poco"
-    unknown_keywords = ["no sé", "no se", "desconocido", "no sabemos", "no tengo idea", "poco", "muy poco"]
-    if user_input and any(keyword in user_input.lower() for keyword in unknown_keywords):
-        # Usar un valor promedio conservador (aprox. 1 kg por empleado al mes)
-        if state.employee_count:
-            paper_consumption = state.employee_count * 1.0
-            logger.info(f"Consumo de papel estimado: {paper_consumption} kg (basado en {state.employee_count} empleados)")
-            response_message = f"Entiendo que no tienes el dato exacto. He estimado un consumo aproximado de {paper_consumption} kg basado en el número de empleados.\n\n¿Cuántos metros cuadrados (m²) tiene la oficina o instalación principal?"
-            next_task = "esperando_metros_oficina"
-            return {
-                "paper_consumption": paper_consumption,
-                "messages": current_messages + [response_message],
-                "current_task": next_task,
-                "last_user_intent": None,
-                "user_input": None
-            }
-
-    numeric_value = extract_numeric_value(user_input, "consumo de papel")
-
-    if numeric_value is not None and numeric_value >= 0:
-        paper_consumption = numeric_value
-        logger.info(f"Consumo de papel extraído: {paper_consumption} kg")
-        response_message = CONFIRM_PAPER_CONSUMPTION_MESSAGE.format(paper_consumption=paper_consumption)
-        next_task = "esperando_metros_oficina"
+    lowered = (user_input or "").lower()
+    template = spec.confirm_message
+    next_task = spec.next_task
+
+    if (spec.unknown_pattern is not None and state.employee_count
+            and ((spec.estimate_on_empty and not lowered.strip()) or spec.unknown_pattern.search(lowered))):
+        value = state.employee_count * spec.estimate_per_employee
+        template = spec.estimate_message
+        logger.info(f"{spec.label} estimado: {value} (basado en {state.employee_count} empleados)")
+    elif spec.zero_pattern is not None and spec.zero_pattern.search(lowered):
+        value = 0
+        logger.info(f"{spec.label}: 0 (indicación textual)")
     else:
-        logger.warning(f"No se pudo extraer consumo de papel válido de: {user_input}")
-
-    return {
-        "paper_consumption": paper_consumption,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
-
-# NUEVO NODO: Procesar metros cuadrados de oficina
-def process_office_area_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener los metros cuadrados de la oficina."""
-    logger.info("--- Procesando Metros Cuadrados Oficina ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    office_sqm: Optional[float] = None
-    next_task: TaskStateType = "esperando_metros_oficina"
-    response_message = OFFICE_SQM_ERROR_MESSAGE
-
-    # Manejar estimaciones basadas en número de empleados
-    if not user_input or "no sé" in user_input.lower() or "no tengo" in user_input.lower():
-        # Estimar basado en empleados (aprox. 10m² por empleado)
-        if state.employee_count:
-            office_sqm = state.employee_count * 10.0
-            logger.info(f"Metros cuadrados estimados: {office_sqm} m² (basado en {state.employee_count} empleados)")
-            response_message = f"Entiendo que no tienes el dato exacto. He estimado aproximadamente {office_sqm} m² basado en el número de empleados.\n\n¿Qué sistema de climatización utiliza principalmente? Elige una opción:\n1. Aire acondicionado\n2. Calefacción a gas\n3. Calefacción eléctrica\n4. Bomba de calor (más eficiente)\n5. Natural (sin sistemas activos)"
-            next_task = "esperando_tipo_climatizacion"
+        value = _parse_answer(spec, state, user_input)
+        if value is None:
+            logger.warning(f"No se pudo extraer {spec.label} válido de: {user_input}")
             return {
-                "office_sqm": office_sqm,
-                "messages": current_messages + [response_message],
-                "current_task": next_task,
+                "messages": [spec.error_message],
+                "current_task": spec.task,
                 "last_user_intent": None,
                 "user_input": None
             }
-
-    numeric_value = extract_numeric_value(user_input, "metros cuadrados")
-
-    if numeric_value is not None and numeric_value > 0:
-        office_sqm = numeric_value
-        logger.info(f"Metros cuadrados extraídos: {office_sqm} m²")
-        response_message = CONFIRM_OFFICE_SQM_MESSAGE.format(office_sqm=office_sqm)
-        next_task = "esperando_tipo_climatizacion"
-    else:
-        logger.warning(f"No se pudo extraer metros cuadrados válidos de: {user_input}")
-
-    return {
-        "office_sqm": office_sqm,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
-
-# NUEVO NODO: Procesar tipo de climatización
-def process_climate_control_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener el tipo de climatización."""
-    logger.info("--- Procesando Tipo Climatización ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    climate_control = None
-    next_task: TaskStateType = "esperando_tipo_climatizacion"
-    response_message = CLIMATE_CONTROL_ERROR_MESSAGE
-
-    if user_input and user_input.strip():
-        # Mapeo de respuestas posibles a tipos de climatización
-        climate_map = {
-            "1": "aire_acondicionado", "aire": "aire_acondicionado", "aire acondicionado": "aire_acondicionado", "a/c": "aire_acondicionado",
-            "2": "calefaccion_gas", "calefaccion gas": "calefaccion_gas", "gas": "calefaccion_gas", "caldera": "calefaccion_gas",
-            "3": "calefaccion_electrica", "electrica": "calefaccion_electrica", "eléctrica": "calefaccion_electrica", "radiadores": "calefaccion_electrica",
-            "4": "bomba_calor", "bomba": "bomba_calor", "bomba de calor": "bomba_calor", "aerotermia": "bomba_calor",
-            "5": "natural", "no hay": "natural", "ninguno": "natural", "ventilacion natural": "natural", "ventanas": "natural"
-        }
-        
-        # Buscar en el mapa
-        cleaned_input = user_input.strip().lower()
-        climate_control = climate_map.get(cleaned_input)
-        
-        if climate_control:
-            # Nombres descriptivos para mostrar al usuario
-            climate_names = {
-                "aire_acondicionado": "Aire acondicionado", 
-                "calefaccion_gas": "Calefacción a gas",
-                "calefaccion_electrica": "Calefacción eléctrica",
-                "bomba_calor": "Bomba de calor",
-                "natural": "Ventilación natural"
-            }
-            
-            climate_control_name = climate_names.get(climate_control, climate_control)
-            
-            logger.info(f"Tipo de climatización extraído: {climate_control} (Nombre: {climate_control_name})")
-            response_message = CONFIRM_CLIMATE_CONTROL_MESSAGE.format(climate_control_name=climate_control_name)
-            next_task = "esperando_km_avion"
-        else:
-            logger.warning(f"No se pudo reconocer el tipo de climatización: {user_input}")
-    else:
-        logger.warning("Input tipo climatización vacío.")
-
-    return {
-        "climate_control": climate_control,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
-
-# NUEVO NODO: Procesar kilómetros en avión
-def process_air_travel_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener los kilómetros de viajes en avión."""
-    logger.info("--- Procesando Viajes Avión ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    air_travel: Optional[float] = None
-    next_task: TaskStateType = "esperando_km_avion"
-    response_message = AIR_TRAVEL_ERROR_MESSAGE
-
-    # Manejar respuestas del tipo "no viajamos" o "cero"
-    no_travel_keywords = ["no", "cero", "0", "ninguno", "no viajamos", "nada", "no hay", "no aplica"]
-    if user_input and any(keyword in user_input.lower() for keyword in no_travel_keywords):
-        air_travel = 0
-        logger.info("Viajes avión: 0 km (indicación textual de no viajes)")
-        response_message = CONFIRM_AIR_TRAVEL_MESSAGE.format(air_travel=0)
-        next_task = "esperando_km_terrestres"
-        return {
-            "air_travel_km": air_travel,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-    # Intentar extraer directamente un número si es un valor numérico simple
-    if user_input and user_input.strip().replace(" ", "").isdigit():
-        air_travel = float(user_input.strip())
-        logger.info(f"Kilómetros en avión extraídos directamente: {air_travel} km")
-        response_message = CONFIRM_AIR_TRAVEL_MESSAGE.format(air_travel=air_travel)
-        next_task = "esperando_km_terrestres"
-        return {
-            "air_travel_km": air_travel,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-    # Si no es un número simple, usar el extractor numérico
-    numeric_value = extract_numeric_value(user_input, "kilómetros en avión")
-
-    if numeric_value is not None and numeric_value >= 0:
-        air_travel = numeric_value
-        logger.info(f"Kilómetros en avión extraídos: {air_travel} km")
-        response_message = CONFIRM_AIR_TRAVEL_MESSAGE.format(air_travel=air_travel)
-        next_task = "esperando_km_terrestres"
-    else:
-        logger.warning(f"No se pudo extraer kilómetros en avión válidos de: {user_input}")
-
-    return {
-        "air_travel_km": air_travel,
-        "messages": current_messages + [response_message],
-        "current_task": next_task,
-        "last_user_intent": None,
-        "user_input": None
-    }
-
-# NUEVO NODO: Procesar kilómetros en viajes terrestres
-def process_ground_travel_node(state: GraphState) -> Dict[str, Any]:
-    """Procesa la respuesta para obtener los kilómetros de viajes terrestres."""
-    logger.info("--- Procesando Viajes Terrestres ---")
-    user_input = state.user_input
-    current_messages = getattr(state, 'messages', [])
-    ground_travel: Optional[float] = None
-    next_task: TaskStateType = "esperando_km_terrestres"
-    response_message = GROUND_TRAVEL_ERROR_MESSAGE
-
-    # Manejar respuestas del tipo "no viajamos" o "cero"
-    no_travel_keywords = ["no", "cero", "0", "ninguno", "no viajamos", "nada", "no hay", "no aplica"]
-    if user_input and any(keyword in user_input.lower() for keyword in no_travel_keywords):
-        ground_travel = 0
-        logger.info("Viajes terrestres: 0 km (indicación textual de no viajes)")
-        company_name = state.company_name or "tu empresa"
-        response_message = CONFIRM_GROUND_TRAVEL_MESSAGE.format(ground_travel=0, company_name=company_name)
-        next_task = "calculando_huella"
-        return {
-            "ground_travel_km": ground_travel,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-    # Intentar extraer directamente un número si es un valor numérico simple
-    if user_input and user_input.strip().replace(" ", "").isdigit():
-        ground_travel = float(user_input.strip())
-        logger.info(f"Kilómetros terrestres extraídos directamente: {ground_travel} km")
-        
-        # Obtener el nombre de la empresa para el mensaje de confirmación
-        company_name = state.company_name or "tu empresa"
-        
-        # Mensaje final que confirma los viajes terrestres y anuncia el cálculo
-        response_message = CONFIRM_GROUND_TRAVEL_MESSAGE.format(ground_travel=ground_travel, company_name=company_name)
-        
-        # Añadir mensaje de que se está calculando
-        response_message += "\n\n" + CALCULATING_MESSAGE
-        
-        next_task = "calculando_huella"
-        return {
-            "ground_travel_km": ground_travel,
-            "messages": current_messages + [response_message],
-            "current_task": next_task,
-            "last_user_intent": None,
-            "user_input": None
-        }
-
-    # Si no es un número simple, usar el extractor numérico
-    numeric_value = extract_numeric_value(user_input, "kilómetros terrestres")
-
-    if numeric_value is not None and numeric_value >= 0:
-        ground_travel = numeric_value
-        logger.info(f"Kilómetros terrestres extraídos: {ground_travel} km")
-        
-        # Obtener el nombre de la empresa para el mensaje de confirmación
-        company_name = state.company_name or "tu empresa"
-        
-        # Mensaje final que confirma los viajes terrestres y anuncia el cálculo
-        response_message = CONFIRM_GROUND_TRAVEL_MESSAGE.format(ground_travel=ground_travel, company_name=company_name)
-        
-        # Añadir mensaje de que se está calculando
-        response_message += "\n\n" + CALCULATING_MESSAGE
-        
-        next_task = "calculando_huella"
-    else:
-        logger.warning(f"No se pudo extraer kilómetros terrestres válidos de: {user_input}")
-
-    return {
-        "ground_travel_km": ground_travel,
-        "messages": current_messages + [response_message],
+        logger.info(f"{spec.label} extraído: {value}")
+
+    if value in spec.skip_values:
+        template, next_task = spec.skip_message, spec.skip_task
+    format_args = _format_args(state, {spec.field: value}) if spec.messages_use_state else {}
+    format_args[spec.placeholder] = value
+    if spec.choice_names:
+        format_args[spec.placeholder + "_name"] = spec.choice_names.get(value, value)
+
+    update = {
+        spec.field: value,
+        "messages": [template.format(**format_args)],
         "current_task": next_task,
         "last_user_intent": None,
         "user_input": None
     }
+    # Vista previa de la huella: sólo se recalculan las categorías que usan este campo
+    partial = update_partial_footprint(state, {spec.field: value}, CARBON_COUNTRY)
+    if partial is not None:
+        update["partial_footprint"] = partial
+    return update
+
+
+def _question_node(name: str, field: str) -> Callable[[GraphState], Dict[str, Any]]:
+    """Nodo LangGraph para una pregunta concreta de QUESTION_SPECS."""
+    spec = SPECS_BY_FIELD[field]
+
+    def node(state: GraphState) -> Dict[str, Any]:
+        return process_question_node(state, spec)
+
+    node.__name__ = node.__qualname__ = name
+    node.__doc__ = f"Procesa la respuesta para '{spec.label}'."
+    return node
+
+
+# Nodos por pregunta (se mantienen los nombres que usan app_web y el grafo)
+process_company_name_node = _question_node("process_company_name_node", "company_name")
+process_responsible_name_node = _question_node("process_responsible_name_node", "responsible_name")
+process_employee_count_node = _question_node("process_employee_count_node", "employee_count")
+process_electricity_consumption_node = _question_node("process_electricity_consumption_node", "electricity_kwh")
+process_fuel_type_node = _question_node("process_fuel_type_node", "fuel_type")
+process_fuel_consumption_node = _question_node("process_fuel_consumption_node", "fuel_consumption")
+process_gas_consumption_node = _question_node("process_gas_consumption_node", "gas_consumption")
+process_commute_distance_node = _question_node("process_commute_distance_node", "employee_commute_distance")
+process_car_percentage_node = _question_node("process_car_percentage_node", "transport_pct_car")
+process_public_transport_percentage_node = _question_node("process_public_transport_percentage_node", "transport_pct_public")
+process_green_transport_percentage_node = _question_node("process_green_transport_percentage_node", "transport_pct_green")
+process_waste_amount_node = _question_node("process_waste_amount_node", "waste_kg")
+process_recycle_percentage_node = _question_node("process_recycle_percentage_node", "recycle_pct")
+process_water_consumption_node = _question_node("process_water_consumption_node", "water_consumption")
+process_paper_consumption_node = _question_node("process_paper_consumption_node", "paper_consumption")
+process_office_area_node = _question_node("process_office_area_node", "office_sqm")
+process_climate_control_node = _question_node("process_climate_control_node", "climate_control")
+process_air_travel_node = _question_node("process_air_travel_node", "air_travel_km")
+process_ground_travel_node = _question_node("process_ground_travel_node", "ground_travel_km")
+
+# Tabla de despacho del grafo: nodo de cada pregunta por campo
+QUESTION_NODES: Dict[str, Callable[[GraphState], Dict[str, Any]]] = {
+    "company_name": process_company_name_node,
+    "responsible_name": process_responsible_name_node,
+    "employee_count": process_employee_count_node,
+    "electricity_kwh": process_electricity_consumption_node,
+    "fuel_type": process_fuel_type_node,
+    "fuel_consumption": process_fuel_consumption_node,
+    "gas_consumption": process_gas_consumption_node,
+    "employee_commute_distance": process_commute_distance_node,
+    "transport_pct_car": process_car_percentage_node,
+    "transport_pct_public": process_public_transport_percentage_node,
+    "transport_pct_green": process_green_transport_percentage_node,
+    "waste_kg": process_waste_amount_node,
+    "recycle_pct": process_recycle_percentage_node,
+    "water_consumption": process_water_consumption_node,
+    "paper_consumption": process_paper_consumption_node,
+    "office_sqm": process_office_area_node,
+    "climate_control": process_climate_control_node,
+    "air_travel_km": process_air_travel_node,
+    "ground_travel_km": process_ground_travel_node,
+}
 
 # NUEVO NODO: Calcular huella de carbono
-from ..carbon_calculator import calculate_carbon_footprint, get_score_category, get_recommendations
+# Nombres de las categorías del desglose para presentación
+CATEGORY_NAMES = {
+    "electricidad": "Electricidad",
+    "combustible": "Combustible",
+    "gas": "Gas Natural",
+    "transporte_empleados": "Transporte Empleados",
+    "residuos": "Residuos",
+    "agua": "Agua",
+    "papel": "Papel",
+    "infraestructura": "Infraestructura",
+    "viajes": "Viajes Corporativos"
+}
+
+def _recommendation_lines(state: GraphState, score: int, country: str) -> List[str]:
+    """Medidas ordenadas por ahorro estimado; si ninguna aplica, las recomendaciones generales."""
+    ranked = rank_recommendations(state, country=country)[:MAX_RANKED_RECOMMENDATIONS]
+    if not ranked:
+        return get_recommendations(state, score)
+    return [f"{item['recommendation']} Ahorro estimado: {item['saved']:.2f} t CO₂e/mes ({item['saved_pct']:.0%})."
+            for item in ranked]
+
+
+def _benchmark_line(per_employee: float, employee_count: Optional[int]) -> str:
+    """Percentil de la empresa frente a las interacciones guardadas (vacío si no hay con quién comparar)."""
+    if per_employee <= 0:
+        return ""
+    try:
+        overall = rank_footprint(per_employee)
+        band = rank_footprint(per_employee, employee_count)
+    except Exception as e:
+        logger.error(f"Error calculando el percentil de la huella: {e}", exc_info=True)
+        return ""
+    if overall is None:
+        return ""
+    line = f"\n📈 COMPARACIÓN: menor huella por empleado que el {overall.percentile:.0f}% de {overall.total} empresas evaluadas"
+    if band is not None:
+        line += f" ({band.percentile:.0f}% entre las de {band.band} empleados)"
+    return line
+
 
 def calculate_carbon_footprint_node(state: GraphState) -> Dict[str, Any]:
     """Calcula la huella de carbono basada en los datos recolectados."""
     logger.info("--- Calculando Huella de Carbono ---")
-    current_messages = getattr(state, 'messages', [])
     next_task: TaskStateType = "mostrando_resultados"
     
-    # Obtener país (default por ahora)
-    country = "default"
+    # País para los factores de electricidad (configurable por entorno)
+    country = CARBON_COUNTRY
     
     try:
         # Calcular huella de carbono
@@ -1067,29 +708,19 @@ def calculate_carbon_footprint_node(state: GraphState) -> Dict[str, Any]:
         per_employee = results.get("per_employee", 0)
         breakdown = results.get("breakdown", {})
         sustainability_score = results.get("sustainability_score", 50)
+        factor_version = results.get("factor_version")
+        factor_country = results.get("factor_country")
         
         # Obtener categoría según puntaje
         category = get_score_category(sustainability_score)
         
-        # Obtener recomendaciones personalizadas
-        recommendations = get_recommendations(state, sustainability_score)
+        # Recomendaciones cuantificadas: medidas ordenadas por t CO₂e ahorradas
+        recommendations = _recommendation_lines(state, sustainability_score, country)
         
         # Formatear desglose para presentación
         breakdown_formatted = ""
-        for category, value in breakdown.items():
-            # Traducir nombres de categorías
-            category_names = {
-                "electricidad": "Electricidad",
-                "combustible": "Combustible",
-                "gas": "Gas Natural",
-                "transporte_empleados": "Transporte Empleados",
-                "residuos": "Residuos",
-                "agua": "Agua",
-                "papel": "Papel",
-                "infraestructura": "Infraestructura",
-                "viajes": "Viajes Corporativos"
-            }
-            category_name = category_names.get(category, category)
+        for breakdown_key, value in breakdown.items():
+            category_name = CATEGORY_NAMES.get(breakdown_key, breakdown_key)
             
             # Incluir solo categorías con valor > 0
             if value > 0.001:
@@ -1097,14 +728,24 @@ def calculate_carbon_footprint_node(state: GraphState) -> Dict[str, Any]:
         
         # Formatear recomendaciones
         recommendations_formatted = "\n".join([f"• {rec}" for rec in recommendations])
+
+        # Intervalo de confianza de la huella total (opcional)
+        uncertainty_formatted = ""
+        if FOOTPRINT_UNCERTAINTY:
+            simulation = simulate_carbon_footprint(state, country=country)
+            interval = simulation["total_footprint"]
+            uncertainty_formatted = (f" (IC {simulation['confidence']:.0%}: "
+                                     f"{interval['low']:.2f} – {interval['high']:.2f})")
         
         # Mensaje de resultados
         response_message = RESULT_MESSAGE.format(
             company_name=state.company_name or "su empresa",
             total_footprint=total_footprint,
+            uncertainty=uncertainty_formatted,
             per_employee=per_employee,
             score=sustainability_score,
             category=category,
+            benchmark=_benchmark_line(per_employee, state.employee_count),
             breakdown=breakdown_formatted,
             recommendations=recommendations_formatted
         )
@@ -1128,6 +769,8 @@ Error: {str(e)}"""
         carbon_per_employee = None
         footprint_breakdown = {}
         sustainability_score = None
+        factor_version = None
+        factor_country = None
         conversation_finished = True
     
     return {
@@ -1135,7 +778,9 @@ Error: {str(e)}"""
         "carbon_per_employee": carbon_per_employee,
         "footprint_breakdown": footprint_breakdown,
         "sustainability_score": sustainability_score,
-        "messages": current_messages + [response_message],
+        "factor_version": factor_version,
+        "factor_country": factor_country,
+        "messages": [response_message],
         "current_task": next_task,
         "conversation_finished": conversation_finished,
         "last_user_intent": None,
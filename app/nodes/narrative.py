@@ -0,0 +1,64 @@
+"""
+Resumen de los resultados redactado por el LLM.
+Después del cálculo (y del guardado), el LLM escribe un breve plan de acción a partir
+del mensaje de resultados. El texto se genera en streaming: cada fragmento se emite
+con el stream writer de LangGraph apenas llega, así la interfaz lo muestra mientras
+se escribe; al terminar queda en el historial como un mensaje más del asistente.
+"""
+
+import os
+from typing import Any, Callable, Dict
+import logging
+
+from langgraph.config import get_stream_writer
+
+from ..state import GraphState
+from ..llm_integration import is_llm_available, stream_gemini
+
+logger = logging.getLogger(__name__)
+
+RESULTS_NARRATIVE = os.getenv("RESULTS_NARRATIVE", "1").lower() in ("1", "true", "si", "yes")
+NARRATIVE_MAX_TOKENS = int(os.getenv("NARRATIVE_MAX_TOKENS", "400"))
+NARRATIVE_TEMPERATURE = float(os.getenv("NARRATIVE_TEMPERATURE", "0.4"))
+
+NARRATIVE_HEADER = "🧭 PLAN DE ACCIÓN:\n"
+
+NARRATIVE_PROMPT = """Eres un asesor de sostenibilidad para empresas. Estos son los resultados de la
+huella de carbono de {company_name}:
+
+{results}
+
+Escribe para {responsible_name}, en español y en un solo párrafo de 3 a 5 oraciones, un
+plan de acción concreto: por dónde empezar, qué medidas priorizar según el desglose y las
+recomendaciones, y qué impacto esperar. No repitas el desglose cifra por cifra ni uses listas."""
+
+
+def _stream_writer() -> Callable[[Any], None]:
+    """Writer del modo "custom" del grafo; fuera de una ejecución del grafo no emite nada."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+
+def results_narrative_node(state: GraphState) -> Dict[str, Any]:
+    """Redacta el plan de acción con el LLM, emitiendo cada fragmento como {"token": texto}."""
+    if not RESULTS_NARRATIVE or state.carbon_footprint is None or not state.messages or not is_llm_available():
+        return {}
+    prompt = NARRATIVE_PROMPT.format(
+        company_name=state.company_name or "la empresa",
+        responsible_name=state.responsible_name or "el responsable",
+        results=state.messages[-1].strip(),
+    )
+    write = _stream_writer()
+    parts = []
+    for chunk in stream_gemini(prompt, temperature=NARRATIVE_TEMPERATURE, max_output_tokens=NARRATIVE_MAX_TOKENS):
+        if not parts:
+            write({"token": NARRATIVE_HEADER})
+        parts.append(chunk)
+        write({"token": chunk})
+    narrative = "".join(parts).strip()
+    if not narrative:
+        return {}
+    logger.info(f"Plan de acción generado ({len(narrative)} caracteres)")
+    return {"messages": [NARRATIVE_HEADER + narrative]}
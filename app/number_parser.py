@@ -0,0 +1,186 @@
+"""
+Parser numérico local para respuestas en español.
+Entiende separadores de miles/decimales, números en palabras ("tres mil quinientos"),
+multiplicadores (k, mil, millón), notación científica ("1e3"), signo negativo,
+porcentajes, aproximaciones ("aprox 200") y rangos ("entre 10 y 20" -> 15). Devuelve además una confianza para decidir si
+hace falta recurrir al LLM.
+"""
+
+import re
+import unicodedata
+from typing import List, NamedTuple, Optional, Tuple
+
+# Por debajo de esta confianza la respuesta se considera ambigua y se consulta al LLM
+LOCAL_PARSE_MIN_CONFIDENCE = 0.75
+
+
+class ParsedNumber(NamedTuple):
+    value: float
+    confidence: float  # 0-1
+    kind: str          # "numero", "palabras", "porcentaje", "rango"
+
+
+# --- Vocabulario ---
+_UNITS = {
+    "cero": 0, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5,
+    "seis": 6, "siete": 7, "ocho": 8, "nueve": 9, "diez": 10, "once": 11, "doce": 12,
+    "trece": 13, "catorce": 14, "quince": 15, "dieciseis": 16, "diecisiete": 17,
+    "dieciocho": 18, "diecinueve": 19, "veinte": 20, "veintiuno": 21, "veintiuna": 21,
+    "veintiun": 21, "veintidos": 22, "veintitres": 23, "veinticuatro": 24,
+    "veinticinco": 25, "veintiseis": 26, "veintisiete": 27, "veintiocho": 28,
+    "veintinueve": 29,
+}
+_TENS = {
+    "treinta": 30, "cuarenta": 40, "cincuenta": 50, "sesenta": 60,
+    "setenta": 70, "ochenta": 80, "noventa": 90,
+}
+_HUNDREDS = {
+    "cien": 100, "ciento": 100, "doscientos": 200, "trescientos": 300,
+    "cuatrocientos": 400, "quinientos": 500, "seiscientos": 600,
+    "setecientos": 700, "ochocientos": 800, "novecientos": 900,
+}
+_HUNDREDS.update({k[:-2] + "as": v for k, v in _HUNDREDS.items() if k.endswith("os")})
+_NUMBER_WORDS = {**_UNITS, **_TENS, **_HUNDREDS}
+
+_MULTIPLIERS = {"k": 1_000, "mil": 1_000, "millon": 1_000_000, "millones": 1_000_000}
+# "un"/"una" sólo cuentan como número delante de un multiplicador ("un millón")
+_ARTICLES = {"un": 1, "una": 1}
+_HEDGES = {"aprox", "aproximadamente", "aproximado", "alrededor", "unos", "unas",
+           "cerca", "casi", "mas", "menos", "como", "~"}
+_PERCENT_WORDS = {"porciento", "pct"}
+
+# Las palabras pueden terminar en dígito para no partir unidades como "m2", "m3" o "co2";
+# los números admiten exponente ("1e3", "2,5e-1")
+_TOKEN_RE = re.compile(r"\d[\d.,]*(?:e[+-]?\d+)?|[a-zñ]+\d*|%|~|-")
+
+
+def _normalize(text: str) -> str:
+    """Minúsculas y sin tildes (conserva la ñ)."""
+    text = text.lower().replace("ñ", "\0")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.replace("\0", "ñ")
+
+
+def _parse_digits(token: str) -> Tuple[float, float]:
+    """Interpreta un número con separadores (y exponente opcional). Devuelve (valor, confianza)."""
+    token, _, exponent = token.partition("e")
+    if exponent:
+        value, confidence = _parse_digits(token)
+        return value * 10 ** int(exponent), min(confidence, 0.95)
+    token = token.rstrip(".,")
+    has_dot, has_comma = "." in token, "," in token
+    if has_dot and has_comma:
+        # El último separador es el decimal: "1.500,75" o "1,500.75"
+        decimal_sep = "," if token.rfind(",") > token.rfind(".") else "."
+        thousands_sep = "." if decimal_sep == "," else ","
+        return float(token.replace(thousands_sep, "").replace(decimal_sep, ".")), 0.95
+    for sep, thousands_confidence in ((".", 0.85), (",", 0.6)):
+        if sep in token:
+            parts = token.split(sep)
+            if len(parts) > 2:
+                return float("".join(parts)), 0.95  # "1.500.000"
+            integer, fraction = parts
+            if len(fraction) == 3 and integer and integer != "0":
+                # "1.500" en notación local son mil quinientos; "1,500" es ambiguo (¿1,5?)
+                return float(integer + fraction), thousands_confidence
+            return float(f"{integer or 0}.{fraction}"), 0.95
+    return float(token), 1.0
+
+
+def _group_value(tokens: List[str]) -> Tuple[float, float]:
+    """Combina una secuencia de números/palabras/multiplicadores en un valor ("-" inicial: negativo)."""
+    sign = -1.0 if tokens[0] == "-" else 1.0
+    total, current, confidence = 0.0, 0.0, 1.0
+    for token in tokens[1:] if sign < 0 else tokens:
+        if token[0].isdigit():
+            value, token_confidence = _parse_digits(token)
+            current += value
+            confidence = min(confidence, token_confidence)
+        elif token in _NUMBER_WORDS:
+            current += _NUMBER_WORDS[token]
+            confidence = min(confidence, 0.9)
+        elif token in _ARTICLES:
+            current += _ARTICLES[token]
+        elif token in ("millon", "millones"):
+            # Escala todo lo acumulado: "mil millones", "tres mil quinientos millones"
+            total = ((total + current) or 1) * _MULTIPLIERS[token]
+            current = 0.0
+        elif token in _MULTIPLIERS:
+            total += (current or 1) * _MULTIPLIERS[token]
+            current = 0.0
+    return sign * (total + current), confidence
+
+
+def _split_groups(tokens: List[str]) -> List[Tuple[int, int, List[str]]]:
+    """Agrupa tokens numéricos contiguos. Devuelve (inicio, fin, tokens) por grupo."""
+    groups: List[Tuple[int, int, List[str]]] = []
+    current: List[str] = []
+    start = 0
+    for i, token in enumerate(tokens):
+        # "por ciento" es un porcentaje, no el número cien
+        is_percent_word = token == "ciento" and i > 0 and tokens[i - 1] == "por"
+        # "-" es signo sólo al inicio de un número ("-5"); entre dos números es un rango ("10-20")
+        is_sign = token == "-" and not current and i + 1 < len(tokens) and tokens[i + 1][0].isdigit()
+        is_numeric = is_sign or not is_percent_word and (token[0].isdigit() or token in _NUMBER_WORDS
+                      or (token in _MULTIPLIERS and (current or token != "k"))
+                      or (token in _ARTICLES and i + 1 < len(tokens) and tokens[i + 1] in _MULTIPLIERS))
+        # "treinta y cinco": la 'y' une decenas con unidades
+        joins_tens = (token == "y" and current and current[-1] in _TENS
+                      and i + 1 < len(tokens) and _UNITS.get(tokens[i + 1], 10) < 10)
+        if is_numeric or joins_tens:
+            if not current:
+                start = i
+            if not joins_tens:
+                current.append(token)
+            continue
+        if current:
+            groups.append((start, i, current))
+            current = []
+    if current:
+        groups.append((start, len(tokens), current))
+    return groups
+
+
+def parse_number(text: Optional[str]) -> Optional[ParsedNumber]:
+    """Extrae un único valor numérico del texto, o None si no encuentra ninguno."""
+    if not text or not text.strip():
+        return None
+    tokens = _TOKEN_RE.findall(_normalize(text))
+    groups = _split_groups(tokens)
+    if not groups:
+        return None
+
+    values = [_group_value(group_tokens) for _, _, group_tokens in groups]
+    first_token = groups[0][2][1] if groups[0][2][0] == "-" else groups[0][2][0]
+    kind = "numero" if first_token[0].isdigit() else "palabras"
+    confidence = values[0][1]
+    value = values[0][0]
+
+    def followed_by_percent(end: int) -> bool:
+        following = tokens[end:end + 2]
+        return bool(following) and (following[0] == "%" or following[0] in _PERCENT_WORDS
+                                    or following[:2] == ["por", "ciento"])
+
+    if len(groups) == 2:
+        (_, end_a, _), (start_b, _, _) = groups
+        between = tokens[end_a:start_b]
+        before = tokens[groups[0][0] - 1] if groups[0][0] > 0 else None
+        # "entre 10 y 20", "de 10 a 20", "10-20", "10 o 20"
+        is_range = between in (["-"], ["a"], ["o"]) or (between == ["y"] and before == "entre")
+        if is_range:
+            value = (values[0][0] + values[1][0]) / 2
+            confidence = min(values[0][1], values[1][1], 0.85)
+            kind = "rango"
+        else:
+            confidence = min(confidence, 0.4)  # Dos números sin relación clara
+    elif len(groups) > 2:
+        confidence = min(confidence, 0.4)
+
+    if kind != "rango" and followed_by_percent(groups[0][1]):
+        kind = "porcentaje"
+
+    if any(token in _HEDGES for token in tokens):
+        confidence = min(confidence, 0.9)
+
+    return ParsedNumber(value=value, confidence=confidence, kind=kind)
@@ -0,0 +1,258 @@
+"""
+Exportación columnar (Parquet) de las interacciones, particionada por mes.
+Cada ejecución exporta sólo lo nuevo desde la última vez (id de SQLite u offset
+en bytes del log JSONL, guardados en _export_state.json) y lo escribe como nuevos
+archivos dentro de month=AAAA-MM/. Con SQLite, los archivos que contienen filas
+recalculadas después de la última exportación (columna revision) se reescriben. El desglose de la huella se expande en columnas
+breakdown_<categoría> para que los tableros lean sólo las columnas que necesitan:
+
+    pd.read_parquet("exports/interactions", columns=["month", "carbon_footprint"])
+
+Uso: python -m app.parquet_export --output exports/interactions [--source sqlite|jsonl]
+"""
+
+import argparse
+import bisect
+import datetime
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .analytics import classify_record
+from .carbon_calculator import BREAKDOWN_CATEGORIES
+from .interaction_repository import SCHEMA_COLUMNS, SQLiteInteractionRepository
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv("INTERACTIONS_EXPORT_DIR", os.path.join("exports", "interactions"))
+EXPORT_BATCH_SIZE = int(os.getenv("INTERACTIONS_EXPORT_BATCH", "50000"))
+STATE_FILE = "_export_state.json"
+UNKNOWN_MONTH = "sin_fecha"
+_SQLITE_PART_RE = re.compile(r"part-(\d+)-(\d+)\.parquet")
+
+_ARROW_TYPES = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+
+# Columnas escalares del esquema SQLite (el desglose JSON se expande aparte; 'extra' no se exporta)
+_SCALAR_COLUMNS = [(name, _ARROW_TYPES[sql_type.split()[0]]) for name, sql_type in SCHEMA_COLUMNS.items()
+                   if name != "timestamp" and sql_type != "JSON"]
+BREAKDOWN_COLUMNS = [f"breakdown_{name}" for name in BREAKDOWN_CATEGORIES]
+
+EXPORT_SCHEMA = pa.schema(
+    [("timestamp", pa.timestamp("us"))]
+    + _SCALAR_COLUMNS
+    + [(name, pa.float64()) for name in BREAKDOWN_COLUMNS]
+)
+
+
+def _coerce(value: Any, arrow_type: pa.DataType) -> Any:
+    if value is None or value == "":
+        return None
+    try:
+        if arrow_type == pa.int64():
+            return int(value)
+        if arrow_type == pa.float64():
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def _timestamp(value: Any) -> Optional[datetime.datetime]:
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _month(timestamp: Optional[datetime.datetime]) -> str:
+    return timestamp.strftime("%Y-%m") if timestamp else UNKNOWN_MONTH
+
+
+def records_to_tables(records: List[Dict[str, Any]]) -> Dict[str, pa.Table]:
+    """Una tabla Arrow (con EXPORT_SCHEMA) por mes, a partir de registros guardados."""
+    columns_by_month: Dict[str, Dict[str, list]] = {}
+    for record in records:
+        timestamp = _timestamp(record.get("timestamp"))
+        columns = columns_by_month.get(_month(timestamp))
+        if columns is None:
+            columns = columns_by_month[_month(timestamp)] = {field.name: [] for field in EXPORT_SCHEMA}
+        columns["timestamp"].append(timestamp)
+        for name, arrow_type in _SCALAR_COLUMNS:
+            columns[name].append(_coerce(record.get(name), arrow_type))
+        breakdown = record.get("footprint_breakdown")
+        breakdown = breakdown if isinstance(breakdown, dict) else {}
+        for category, column in zip(BREAKDOWN_CATEGORIES, BREAKDOWN_COLUMNS):
+            columns[column].append(_coerce(breakdown.get(category), pa.float64()))
+    return {month: pa.Table.from_pydict(columns, schema=EXPORT_SCHEMA)
+            for month, columns in columns_by_month.items()}
+
+
+def write_partitions(records: List[Dict[str, Any]], output_dir: str, part_name: str) -> int:
+    """
+    Escribe output_dir/month=AAAA-MM/<part_name>.parquet por cada mes presente.
+    El nombre se deriva del rango exportado: repetir una exportación interrumpida
+    reescribe los mismos archivos en lugar de duplicar filas.
+    """
+    written = 0
+    for month, table in records_to_tables(records).items():
+        partition = os.path.join(output_dir, f"month={month}")
+        os.makedirs(partition, exist_ok=True)
+        pq.write_table(table, os.path.join(partition, f"{part_name}.parquet"))
+        written += table.num_rows
+    return written
+
+
+# --- Estado de la exportación incremental ---
+def _load_state(output_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(output_dir, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(output_dir: str, state: Dict[str, Any]) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, STATE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# --- Fuentes ---
+def _iter_new_jsonl(path: str, offset: int, batch_size: int) -> Iterator[Tuple[int, int, List[Dict[str, Any]]]]:
+    """(offset inicial, offset final, registros) de las líneas completas agregadas desde offset."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        start, batch = offset, []
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Línea a medio escribir: queda para la próxima exportación
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning(f"Línea inválida ignorada en {path}: {line[:80]!r}")
+                continue
+            if isinstance(record, dict) and classify_record(record) != "prestamo":
+                batch.append(record)
+            if len(batch) >= batch_size:
+                yield start, offset, batch
+                start, batch = offset, []
+        if offset > start:
+            yield start, offset, batch
+
+
+def _check_source(state: Dict[str, Any], source: str, path: str, output_dir: str) -> Dict[str, Any]:
+    """Estado guardado de la fuente; falla si output_dir ya tiene exportado otro archivo de esa fuente."""
+    saved = state.get(source, {})
+    if saved.get("path") not in (None, path):
+        raise ValueError(f"{output_dir} ya contiene la exportación de {saved['path']}; "
+                         f"para exportar {path} use otro directorio de salida.")
+    return saved
+
+
+def export_from_jsonl(log_path: str, output_dir: str = EXPORT_DIR, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """Exporta las líneas del log JSONL agregadas desde la última ejecución. Devuelve las filas escritas."""
+    state = _load_state(output_dir)
+    offset = _check_source(state, "jsonl", os.path.abspath(log_path), output_dir).get("offset", 0)
+    if offset > os.path.getsize(log_path):
+        logger.warning(f"{log_path} es más chico que lo ya exportado (¿rotado?); se exporta desde el inicio.")
+        offset = 0
+    written = 0
+    for start, end, records in _iter_new_jsonl(log_path, offset, batch_size):
+        written += write_partitions(records, output_dir, f"part-o{start}-{end}")
+        state["jsonl"] = {"path": os.path.abspath(log_path), "offset": end}
+        _save_state(output_dir, state)
+    logger.info(f"Exportadas {written} interacciones de {log_path} a {output_dir}.")
+    return written
+
+
+def _exported_parts(output_dir: str) -> List[Tuple[int, int]]:
+    """Rangos de id (primero, último) de los archivos exportados desde SQLite, ordenados."""
+    parts = set()
+    for entry in os.scandir(output_dir):
+        if entry.is_dir() and entry.name.startswith("month="):
+            for name in os.listdir(entry.path):
+                match = _SQLITE_PART_RE.fullmatch(name)
+                if match:
+                    parts.add((int(match.group(1)), int(match.group(2))))
+    return sorted(parts)
+
+
+def _rewrite_revised(repository: SQLiteInteractionRepository, output_dir: str, revision: int,
+                     up_to: int, max_id: int) -> int:
+    """Reescribe los archivos que contienen filas recalculadas después de la revisión exportada."""
+    ids = repository.revised_after(revision, up_to, max_id)
+    if not ids:
+        return 0
+    parts = _exported_parts(output_dir)
+    starts = [first for first, _ in parts]
+    affected = set()
+    for row_id in ids:
+        index = bisect.bisect_right(starts, row_id) - 1
+        if index >= 0 and row_id <= parts[index][1]:
+            affected.add(parts[index])
+    written = 0
+    for first_id, last_id in sorted(affected):
+        # Las filas no cambian de mes: el mismo rango reescribe los mismos archivos
+        rows = repository.records_between(first_id, last_id)
+        written += write_partitions([record for _, record in rows], output_dir, f"part-{first_id}-{last_id}")
+    logger.info(f"Reescritos {len(affected)} archivos con {len(ids)} interacciones recalculadas.")
+    return written
+
+
+def export_from_repository(repository: SQLiteInteractionRepository, output_dir: str = EXPORT_DIR,
+                           batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """
+    Exporta las filas de SQLite con id mayor al último exportado y reescribe los archivos con
+    filas ya exportadas que update_footprints recalculó desde entonces. Devuelve las filas escritas.
+    """
+    state = _load_state(output_dir)
+    path = os.path.abspath(repository.path)
+    source = _check_source(state, "sqlite", path, output_dir)
+    last_id, revision = source.get("last_id", 0), source.get("revision", 0)
+    current_revision = repository.current_revision()
+    written = 0
+    if current_revision > revision:
+        written += _rewrite_revised(repository, output_dir, revision, current_revision, last_id)
+        state["sqlite"] = {"path": path, "last_id": last_id, "revision": current_revision}
+        _save_state(output_dir, state)
+    while True:
+        rows = repository.records_after(last_id, batch_size)
+        if not rows:
+            break
+        first_id, last_id = rows[0][0], rows[-1][0]
+        written += write_partitions([record for _, record in rows], output_dir, f"part-{first_id}-{last_id}")
+        state["sqlite"] = {"path": path, "last_id": last_id, "revision": current_revision}
+        _save_state(output_dir, state)
+    logger.info(f"Exportadas {written} interacciones de {repository.path} a {output_dir}.")
+    return written
+
+
+if __name__ == "__main__":
+    from .persistence import INTERACTIONS_BACKEND, LOG_FILE, get_repository
+
+    parser = argparse.ArgumentParser(description="Exportación incremental de interacciones a Parquet por mes.")
+    parser.add_argument("--output", default=EXPORT_DIR)
+    parser.add_argument("--source", choices=("sqlite", "jsonl"), default=INTERACTIONS_BACKEND)
+    parser.add_argument("--log", default=LOG_FILE, help="Log JSON Lines (con --source jsonl)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    try:
+        if args.source == "jsonl":
+            rows = export_from_jsonl(args.log, args.output, args.batch_size)
+        else:
+            rows = export_from_repository(get_repository() or SQLiteInteractionRepository(), args.output,
+                                          args.batch_size)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"{rows} interacciones exportadas a {args.output}")
@@ -1,65 +1,424 @@
 import json
 import datetime
-from typing import Dict, Any
+import os
+import atexit
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import pandas as pd
 from .state import GraphState # Ya no necesitamos LoanOption aquí
+from .interaction_repository import SQLiteInteractionRepository, NON_PERSISTED_FIELDS
+from .carbon_calculator import BREAKDOWN_CATEGORIES, calculate_carbon_footprint_batch
+from .emission_factors import DEFAULT_COUNTRY, get_factor_registry, get_factor_set
+from .benchmarking import FootprintPercentileIndex, PercentileRank
 import logging
 
+try:
+    import fcntl  # Bloqueo entre procesos (POSIX)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
 logger = logging.getLogger(__name__)
-LOG_FILE = "interactions_log.json" # Mantenemos el mismo archivo de log
+LOG_FILE = "interactions_log.jsonl"        # Un registro JSON por línea (append-only)
+LEGACY_LOG_FILE = "interactions_log.json"  # Formato anterior: un único array JSON
 
-def save_interaction_data(state: GraphState) -> bool:
-    """Guarda los datos de la empresa recolectados durante la interacción."""
-    # Crear el registro con los campos relevantes del NUEVO GraphState
-    interaction_record = {
+# fsync agrupado: se sincroniza a disco cada N registros o cada T segundos
+FSYNC_BATCH_SIZE = int(os.getenv("INTERACTIONS_FSYNC_BATCH", "8"))
+FSYNC_INTERVAL_SECONDS = float(os.getenv("INTERACTIONS_FSYNC_INTERVAL", "1.0"))
+
+# Backend principal: "sqlite" (consultas indexadas) o "jsonl" (log append-only).
+# El log JSONL también actúa como respaldo si SQLite falla.
+INTERACTIONS_BACKEND = os.getenv("INTERACTIONS_BACKEND", "sqlite").lower()
+
+
+def build_interaction_record(state: GraphState) -> Dict[str, Any]:
+    """Construye el registro persistible a partir de los datos de empresa del GraphState."""
+    record = {
         "interaction_id": getattr(state, 'interaction_id', 'N/A'),
         "timestamp": datetime.datetime.now().isoformat(),
-
-        # --- Campos Nuevos de Empresa ---
-        "company_name": getattr(state, 'company_name', None),
-        "responsible_name": getattr(state, 'responsible_name', None),
-        "employee_count": getattr(state, 'employee_count', None),
-        "expense_light": getattr(state, 'expense_light', None),
-        "expense_fuel": getattr(state, 'expense_fuel', None),
-        "expense_gas": getattr(state, 'expense_gas', None),
-        "employee_transport_method": getattr(state, 'employee_transport_method', None),
-
-        # --- Campos Antiguos (Eliminados) ---
-        # "requested_amount": getattr(state, 'requested_amount', None),
-        # "credit_type_purpose": getattr(state, 'credit_type_purpose', None),
-        # "monthly_income": getattr(state, 'monthly_income', None),
-        # "monthly_expenses": getattr(state, 'monthly_expenses', None),
-        # "cashflow_description": getattr(state, 'cashflow_description', None),
-        # "preference": getattr(state, 'preference', None),
-        # "is_unaffordable": getattr(state, 'is_unaffordable', None),
-        # "presented_option": ...,
-        # "calculation_error_occurred": ...,
-
-        # Podríamos guardar el historial de mensajes si es útil
-        # "messages_history": getattr(state, 'messages', [])
     }
-    try:
-        # Lógica para leer, añadir y escribir en el JSON (sin cambios)
+    record.update(state.model_dump(exclude=NON_PERSISTED_FIELDS))
+    return record
+
+
+class JsonlInteractionStore:
+    """
+    Almacén append-only de interacciones en formato JSON Lines.
+    Guardar un registro es O(1): una única escritura al final del archivo,
+    protegida con flock para que varias sesiones no pisen sus registros.
+    """
+
+    def __init__(self, path: str = LOG_FILE, legacy_path: Optional[str] = LEGACY_LOG_FILE,
+                 fsync_batch_size: int = FSYNC_BATCH_SIZE,
+                 fsync_interval: float = FSYNC_INTERVAL_SECONDS):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync_batch_size = max(1, fsync_batch_size)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._lock_file = None
+        self._pending_fsync = 0
+        self._last_fsync = time.monotonic()
+        self._fsync_timer: Optional[threading.Timer] = None
+
+    # --- Bloqueo entre procesos ---
+    def _acquire(self):
+        if self._lock_file is None:
+            self._lock_file = open(self.path + ".lock", "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _release(self):
+        if fcntl is not None and self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _ensure_open(self):
+        """Abre el archivo en modo append, migrando antes el log legado si hace falta."""
+        if self._file is None:
+            self._migrate_legacy()
+            self._file = open(self.path, "a+b")
+
+    def _torn_line_prefix(self) -> bytes:
+        """Salto de línea a anteponer si el log termina en una línea cortada (escritura interrumpida)."""
+        size = os.fstat(self._file.fileno()).st_size
+        if not size:
+            return b""
+        self._file.seek(size - 1)
+        return b"" if self._file.read(1) == b"\n" else b"\n"
+
+    def _migrate_legacy(self):
+        """Migración única: convierte el array JSON anterior en JSON Lines."""
+        if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
         try:
-            with open(LOG_FILE, 'r', encoding='utf-8') as f: log_data = json.load(f)
-            if not isinstance(log_data, list): log_data = []
-        except (FileNotFoundError, json.JSONDecodeError): log_data = []
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                legacy_data = json.load(f)
+            if not isinstance(legacy_data, list):
+                legacy_data = []
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"No se pudo leer {self.legacy_path} para migrar: {e}")
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in legacy_data:
+                if isinstance(record, dict):
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        logger.info(f"Migrados {len(legacy_data)} registros de {self.legacy_path} a {self.path}.")
+
+    def _maybe_fsync(self, force: bool = False):
+        if self._file is None or self._pending_fsync == 0:
+            return
+        now = time.monotonic()
+        if (force or self._pending_fsync >= self.fsync_batch_size
+                or now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._pending_fsync = 0
+            self._last_fsync = now
+        elif self._fsync_timer is None:
+            # Sin más escrituras, los pendientes se sincronizan al vencer el intervalo
+            self._fsync_timer = threading.Timer(self.fsync_interval, self._timed_fsync)
+            self._fsync_timer.daemon = True
+            self._fsync_timer.start()
+
+    def _timed_fsync(self):
+        with self._lock:
+            self._fsync_timer = None
+            self._maybe_fsync(force=True)
+
+    # --- API pública ---
+    def append(self, record: Dict[str, Any]) -> None:
+        """Añade un registro al final del log."""
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            self._acquire()
+            try:
+                self._ensure_open()
+                self._file.write(self._torn_line_prefix() + line)
+                self._file.flush()
+                self._pending_fsync += 1
+                self._maybe_fsync()
+            finally:
+                self._release()
+
+    def append_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Añade varios registros en una única escritura (con fsync). Devuelve la cantidad añadida."""
+        lines = [json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records if isinstance(r, dict)]
+        with self._lock:
+            self._acquire()
+            try:
+                self._ensure_open()
+                self._file.write(self._torn_line_prefix() + "".join(lines).encode("utf-8"))
+                self._file.flush()
+                self._pending_fsync += len(lines)
+                self._maybe_fsync(force=True)
+            finally:
+                self._release()
+        return len(lines)
+
+    def flush(self) -> None:
+        """Fuerza el fsync de los registros pendientes."""
+        with self._lock:
+            self._maybe_fsync(force=True)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fsync_timer is not None:
+                self._fsync_timer.cancel()
+                self._fsync_timer = None
+            self._maybe_fsync(force=True)
+            for fh in (self._file, self._lock_file):
+                if fh is not None:
+                    fh.close()
+            self._file = None
+            self._lock_file = None
+
+    def _migrate_before_read(self) -> None:
+        with self._lock:
+            self._acquire()
+            try:
+                self._migrate_legacy()
+            finally:
+                self._release()
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Recorre el log línea a línea (memoria constante). Ignora líneas corruptas."""
+        self._migrate_before_read()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Línea inválida ignorada en {self.path}: {line[:80]}")
+
+    def read_from(self, offset: int = 0, limit: int = 1000) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Hasta limit registros a partir del byte offset y el offset donde sigue la lectura.
+        Una línea sin salto final (escritura en curso) queda para la próxima lectura; si el
+        archivo es más corto que offset (se reemplazó), se lee desde el principio.
+        """
+        self._migrate_before_read()
+        if not os.path.exists(self.path):
+            return [], offset
+        if offset > os.path.getsize(self.path):
+            offset = 0
+        records: List[Dict[str, Any]] = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while len(records) < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logger.warning(f"Línea inválida ignorada en {self.path}: {line[:80]!r}")
+        return records, offset
+
+    def tail(self, n: int) -> List[Dict[str, Any]]:
+        """Devuelve los últimos n registros."""
+        return list(deque(self.iter_records(), maxlen=n))
+
+
+_default_store = JsonlInteractionStore()
+atexit.register(_default_store.close)
 
-        log_data.append(interaction_record)
+_repository: Optional[SQLiteInteractionRepository] = None
+_repository_lock = threading.Lock()
+_fallback_pending = False  # Hay registros guardados en el log de respaldo sin copiar a SQLite
 
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            # Usar default=str para manejar tipos no serializables (aunque ahora son más simples)
-            json.dump(log_data, f, indent=4, ensure_ascii=False, default=str)
+
+def import_fallback_log(repository: SQLiteInteractionRepository, store: Optional[JsonlInteractionStore] = None,
+                        batch_size: int = 1000) -> int:
+    """
+    Copia a SQLite los registros del log JSONL que todavía no importó: el historial previo
+    a SQLite y los que save_interaction_data guardó como respaldo mientras SQLite fallaba.
+    Se recuerda hasta qué byte del log se importó y se omiten los registros ya presentes,
+    así que puede llamarse las veces que haga falta. Devuelve la cantidad importada.
+    """
+    store = store or _default_store
+    log_path = os.path.abspath(store.path)
+    offset = repository.imported_offset(log_path)
+    imported = 0
+    while True:
+        records, next_offset = store.read_from(offset, batch_size)
+        if next_offset == offset:
+            break
+        imported += repository.import_log_batch(records, log_path, next_offset)
+        offset = next_offset
+    if imported:
+        logger.info(f"Importadas {imported} interacciones de {store.path} a {repository.path}.")
+    return imported
+
+
+def get_repository() -> Optional[SQLiteInteractionRepository]:
+    """Devuelve el repositorio SQLite (importando lo nuevo del log JSONL la primera vez), o None si no se usa."""
+    global _repository
+    if INTERACTIONS_BACKEND != "sqlite":
+        return None
+    with _repository_lock:
+        if _repository is None:
+            repository = SQLiteInteractionRepository()
+            import_fallback_log(repository)
+            _repository = repository
+    return _repository
+
+
+_percentile_index: Optional[FootprintPercentileIndex] = None
+_percentile_index_lock = threading.Lock()
+
+
+def get_percentile_index() -> FootprintPercentileIndex:
+    """Índice ordenado de huellas por empleado (se construye del historial la primera vez)."""
+    global _percentile_index
+    with _percentile_index_lock:
+        if _percentile_index is None:
+            records = None
+            try:
+                repository = get_repository()
+                if repository is not None:
+                    records = repository.per_employee_footprints()
+            except Exception as e:
+                logger.error(f"Error leyendo huellas de SQLite, se usa el log {LOG_FILE}: {e}", exc_info=True)
+            _percentile_index = FootprintPercentileIndex.from_records(
+                records if records is not None else _default_store.iter_records())
+    return _percentile_index
+
+
+def reset_percentile_index() -> None:
+    """Descarta el índice (se reconstruye en la próxima consulta)."""
+    global _percentile_index
+    with _percentile_index_lock:
+        _percentile_index = None
+
+
+def rank_footprint(per_employee: float, employee_count: Optional[int] = None) -> Optional[PercentileRank]:
+    """Percentil de la huella por empleado entre las interacciones guardadas (ver FootprintPercentileIndex.rank)."""
+    return get_percentile_index().rank(per_employee, employee_count)
+
+
+def _index_saved_record(record: Dict[str, Any]) -> None:
+    # Si el índice aún no existe, el registro se incluirá al construirlo
+    with _percentile_index_lock:
+        index = _percentile_index
+    if index is not None:
+        index.add_record(record)
+
+def _import_pending_fallback(repository: SQLiteInteractionRepository) -> None:
+    """SQLite volvió a responder: se copian los registros que quedaron en el log de respaldo."""
+    global _fallback_pending
+    _fallback_pending = False
+    try:
+        import_fallback_log(repository)
+    except Exception as e:
+        _fallback_pending = True
+        logger.error(f"Error importando el log {LOG_FILE} a SQLite: {e}", exc_info=True)
+
+def save_interaction_data(state: GraphState) -> bool:
+    """Guarda los datos de la empresa recolectados durante la interacción."""
+    global _fallback_pending
+    interaction_record = build_interaction_record(state)
+    try:
+        repository = get_repository()
+        if repository is not None:
+            repository.insert(interaction_record)
+            _index_saved_record(interaction_record)
+            logger.info(f"Datos de interacción {interaction_record['interaction_id']} guardados en {repository.path}.")
+            if _fallback_pending:
+                _import_pending_fallback(repository)
+            return True
+    except Exception as e:
+        logger.error(f"Error guardando en SQLite, se usa el log {LOG_FILE} como respaldo: {e}", exc_info=True)
+    try:
+        _default_store.append(interaction_record)
+        _fallback_pending = INTERACTIONS_BACKEND == "sqlite"
+        _index_saved_record(interaction_record)
         logger.info(f"Datos de interacción {interaction_record['interaction_id']} guardados en {LOG_FILE}.")
         return True
     except Exception as e:
         logger.error(f"Error guardando interacción {interaction_record.get('interaction_id', 'N/A')}: {e}", exc_info=True)
         return False
 
+def save_interaction_records(records: List[Dict[str, Any]]) -> int:
+    """
+    Guarda un lote de registros en el backend configurado: una transacción en SQLite
+    o una escritura al final del log JSONL. Los errores se propagan (no hay respaldo).
+    """
+    repository = get_repository()
+    if repository is not None:
+        saved = repository.bulk_insert(records)
+        logger.info(f"{saved} interacciones guardadas en {repository.path}.")
+    else:
+        saved = _default_store.append_many(records)
+        logger.info(f"{saved} interacciones guardadas en {_default_store.path}.")
+    return saved
+
+def load_recent_interactions(limit: int = 5) -> List[Dict[str, Any]]:
+    """Devuelve las últimas interacciones guardadas."""
+    try:
+        repository = get_repository()
+        if repository is not None:
+            return repository.latest(limit)
+    except Exception as e:
+        logger.error(f"Error leyendo interacciones de SQLite: {e}", exc_info=True)
+    return _default_store.tail(limit)
+
+def recalculate_stale_footprints(country: str = DEFAULT_COUNTRY, version: Optional[str] = None,
+                                 batch_size: int = 1000) -> int:
+    """
+    Recalcula con el cálculo en lote sólo las interacciones cuyo resultado se obtuvo con otra
+    versión de factores (o sin versión registrada), cada una con los factores de su propio país
+    en la versión indicada (la vigente si es None). Las filas sin país registrado usan 'country'.
+    Devuelve la cantidad de filas actualizadas. Requiere el backend SQLite: el log JSONL es append-only.
+    """
+    repository = get_repository()
+    if repository is None:
+        logger.warning("El recálculo por versión de factores requiere el backend SQLite.")
+        return 0
+    version = version or get_factor_registry().current_version
+    updated = 0
+    for row_country in repository.stale_countries(version):
+        factors = get_factor_set(row_country or country, version)
+        after_id = 0
+        while True:
+            stale = repository.stale_footprints(version, row_country, after_id, batch_size)
+            if not stale:
+                break
+            ids = [row_id for row_id, _ in stale]
+            results = calculate_carbon_footprint_batch(pd.DataFrame([record for _, record in stale]), factors=factors)
+            updated += repository.update_footprints(
+                (row_id, {
+                    "carbon_footprint": row["total_footprint"],
+                    "carbon_per_employee": row["per_employee"],
+                    "sustainability_score": row["sustainability_score"],
+                    "footprint_breakdown": {name: row[name] for name in BREAKDOWN_CATEGORIES},
+                    "factor_version": row["factor_version"],
+                    "factor_country": row["factor_country"],
+                })
+                for row_id, row in zip(ids, results.to_dict("records"))
+            )
+            after_id = ids[-1]
+    if updated:
+        reset_percentile_index()  # Cambiaron las huellas guardadas
+    logger.info(f"Recalculadas {updated} interacciones con los factores {version}.")
+    return updated
+
 def save_data_node(state: GraphState) -> Dict[str, Any]:
     """Nodo que llama a la función de persistencia."""
     logger.info("--- Guardando Datos de Interacción ---")
-    success = save_interaction_data(state)
-    # Este nodo ahora es llamado justo antes de 'mark_finished_node',
-    # así que no necesita devolver un 'current_task'.
-    # Devolver un diccionario vacío o con alguna info de éxito/fallo es suficiente.
-    return {"persistence_success": success}
\ No newline at end of file
+    if not save_interaction_data(state):
+        logger.error(f"No se pudo guardar la interacción {state.interaction_id}.")
+    # GraphState no tiene un campo para el resultado: el nodo no modifica el estado
+    return {}
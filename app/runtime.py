@@ -0,0 +1,255 @@
+"""
+Runtime de sesiones compartido por la CLI (app.main) y la interfaz web (app_web.py).
+El grafo se compila una sola vez por proceso y atiende a todas las conversaciones:
+cada sesión es un thread_id del checkpointer, así que pueden convivir muchas sesiones
+en paralelo y retomarse después de un reinicio. El enrutamiento se resuelve con
+tablas de despacho (tarea -> nodo, campo -> nodo) en lugar de cadenas de if/elif.
+"""
+
+import contextlib
+import os
+import threading
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional
+import logging
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, StateGraph
+
+from .state import GraphState, TaskStateType
+from .nodes.conversation import (
+    QUESTION_NODES,
+    calculate_carbon_footprint_node,
+    select_question,
+    start_node,
+)
+from .nodes.bulk_extraction import bulk_extraction_node, is_bulk_answer
+from .nodes.narrative import results_narrative_node
+from .persistence import save_data_node
+from .checkpointer import SQLiteCheckpointSaver
+
+logger = logging.getLogger(__name__)
+
+# "exit": un checkpoint por turno al terminar (el turno se guarda entero o no se guarda);
+# "async"/"sync" guardan además cada paso intermedio
+GRAPH_DURABILITY = os.getenv("GRAPH_DURABILITY", "exit")
+
+# Tareas que no son preguntas del cuestionario
+TASK_ROUTES: Dict[TaskStateType, str] = {
+    None: "start_node",
+    "calculando_huella": "calculate_carbon_footprint_node",
+    "mostrando_resultados": END,
+    "revisando_datos": END,
+    "finalizando": END,
+}
+# Preguntas: campo pendiente de la tarea actual -> nodo
+QUESTION_ROUTES: Dict[str, str] = {field: node.__name__ for field, node in QUESTION_NODES.items()}
+
+
+def route_next_step(state: GraphState) -> str:
+    """Decide qué nodo ejecutar basándose en la tarea actual."""
+    task = state.current_task
+    route = TASK_ROUTES.get(task)
+    if route is not None:
+        return route
+    # Varios datos en un solo mensaje: se completa todo lo reconocible y se salta a lo que falte
+    if is_bulk_answer(state.user_input):
+        return "bulk_extraction_node"
+    spec = select_question(state)
+    if spec is None:
+        logger.error(f"Router: Tarea inesperada encontrada: {task}. Finalizando.")
+        return END
+    return QUESTION_ROUTES[spec.field]
+
+
+def route_after_answer(state: GraphState) -> str:
+    """Con la última respuesta el cálculo se hace en el mismo turno, sin esperar otro mensaje."""
+    return "calculate_carbon_footprint_node" if state.current_task == "calculando_huella" else END
+
+
+def create_data_collection_workflow() -> StateGraph:
+    """Crea un grafo para la recolección de datos de la empresa, controlado por tareas."""
+    workflow = StateGraph(GraphState)
+    workflow.add_node("start_node", start_node)
+    workflow.add_node("bulk_extraction_node", bulk_extraction_node)
+    for name, node in zip(QUESTION_ROUTES.values(), QUESTION_NODES.values()):
+        workflow.add_node(name, node)
+    workflow.add_node("calculate_carbon_footprint_node", calculate_carbon_footprint_node)
+    workflow.add_node("save_data_node", save_data_node)
+    workflow.add_node("results_narrative_node", results_narrative_node)
+
+    destinations = ["start_node", "bulk_extraction_node", "calculate_carbon_footprint_node",
+                    *QUESTION_ROUTES.values(), END]
+    workflow.set_conditional_entry_point(route_next_step, destinations)
+    workflow.add_edge("start_node", END)
+    for name in ["bulk_extraction_node", *QUESTION_ROUTES.values()]:
+        workflow.add_conditional_edges(name, route_after_answer, ["calculate_carbon_footprint_node", END])
+    workflow.add_edge("calculate_carbon_footprint_node", "save_data_node")
+    # El plan de acción del LLM se redacta con los resultados ya guardados
+    workflow.add_edge("save_data_node", "results_narrative_node")
+    workflow.add_edge("results_narrative_node", END)
+    return workflow
+
+
+class SessionLocks:
+    """
+    Un lock por sesión activa: los turnos de una sesión se serializan y las demás
+    sesiones siguen en paralelo. El lock se descarta cuando nadie lo usa, así que
+    el diccionario no crece con la cantidad de sesiones.
+    """
+
+    def __init__(self, factory: Callable[[], Any] = threading.Lock):
+        self._factory = factory
+        self._locks: Dict[str, list] = {}  # thread_id -> [lock, usuarios]
+        self._guard = threading.Lock()
+
+    def _checkout(self, thread_id: str) -> Any:
+        with self._guard:
+            entry = self._locks.get(thread_id)
+            if entry is None:
+                entry = self._locks[thread_id] = [self._factory(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _checkin(self, thread_id: str) -> None:
+        with self._guard:
+            entry = self._locks[thread_id]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[thread_id]
+
+    @contextlib.contextmanager
+    def hold(self, thread_id: str) -> Iterator[None]:
+        lock = self._checkout(thread_id)
+        try:
+            with lock:
+                yield
+        finally:
+            self._checkin(thread_id)
+
+    @contextlib.asynccontextmanager
+    async def hold_async(self, thread_id: str) -> AsyncIterator[None]:
+        """Variante para el event loop (construir con factory=asyncio.Lock)."""
+        lock = self._checkout(thread_id)
+        try:
+            async with lock:
+                yield
+        finally:
+            self._checkin(thread_id)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class SessionTurn(NamedTuple):
+    thread_id: str
+    messages: List[str]  # Mensajes del asistente en este turno (al retomar, el historial completo)
+    current_task: TaskStateType
+    finished: bool
+
+
+class TurnEvent(NamedTuple):
+    kind: str  # "token": fragmento de texto del LLM; "message": mensaje completo; "end": fin del turno
+    content: str = ""
+    turn: Optional[SessionTurn] = None  # Sólo en "end"
+
+
+class SessionRuntime:
+    """Grafo compilado una vez y compartido por todas las sesiones (una por thread_id)."""
+
+    def __init__(self, checkpointer: Optional[BaseCheckpointSaver] = None):
+        # Checkpoints en disco: las conversaciones sobreviven a un reinicio
+        self.checkpointer = checkpointer if checkpointer is not None else SQLiteCheckpointSaver()
+        self.app = create_data_collection_workflow().compile(checkpointer=self.checkpointer)
+        self.locks = SessionLocks()
+
+    @staticmethod
+    def config(thread_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": thread_id}}
+
+    def exists(self, thread_id: str) -> bool:
+        return self.checkpointer.get_tuple(self.config(thread_id)) is not None
+
+    def get_state(self, thread_id: str) -> Optional[GraphState]:
+        values = self.app.get_state(self.config(thread_id)).values
+        return GraphState.model_validate(values) if values else None
+
+    def _events(self, thread_id: str, update: Dict[str, Any]) -> Iterator[TurnEvent]:
+        """
+        Ejecuta un turno emitiendo cada mensaje apenas termina su nodo y, antes, los
+        fragmentos que los nodos que usan el LLM en streaming escriben como {"token": texto}.
+        """
+        for mode, chunk in self.app.stream(update, self.config(thread_id), stream_mode=["updates", "custom"],
+                                           durability=GRAPH_DURABILITY):
+            if mode == "custom":
+                if isinstance(chunk, dict) and "token" in chunk:
+                    yield TurnEvent("token", chunk["token"])
+                continue
+            for node_update in chunk.values():
+                for message in (node_update or {}).get("messages", []):
+                    yield TurnEvent("message", message)
+
+    def _turn(self, thread_id: str, messages: List[str]) -> SessionTurn:
+        # Del último checkpoint alcanza con los canales de control (sin reconstruir el historial)
+        values = self.checkpointer.get_tuple(self.config(thread_id)).checkpoint["channel_values"]
+        return SessionTurn(thread_id, messages, values.get("current_task"),
+                           bool(values.get("conversation_finished", False)))
+
+    def start(self, thread_id: Optional[str] = None) -> SessionTurn:
+        """Crea la sesión (con el mensaje de bienvenida) o, si ya existe, la retoma con su historial."""
+        thread_id = thread_id or str(uuid.uuid4())
+        with self.locks.hold(thread_id):
+            state = self.get_state(thread_id)
+            if state is not None:
+                logger.info(f"Retomando la sesión {thread_id}")
+                return SessionTurn(thread_id, list(state.messages), state.current_task,
+                                   state.conversation_finished)
+            events = self._events(thread_id, {"interaction_id": str(uuid.uuid4())})
+            return self._turn(thread_id, [event.content for event in events if event.kind == "message"])
+
+    def stream_answer(self, thread_id: str, user_input: str) -> Iterator[TurnEvent]:
+        """
+        Procesa la respuesta del usuario emitiendo los eventos del turno a medida que
+        ocurren: los fragmentos del LLM ("token"), cada mensaje completo ("message") y,
+        al final, "end" con el SessionTurn. La sesión queda bloqueada hasta consumirlos.
+        """
+        with self.locks.hold(thread_id):
+            if not self.exists(thread_id):
+                raise KeyError(f"Sesión desconocida: {thread_id}")
+            messages: List[str] = []
+            for event in self._events(thread_id, {"user_input": user_input}):
+                if event.kind == "message":
+                    messages.append(event.content)
+                yield event
+            yield TurnEvent("end", turn=self._turn(thread_id, messages))
+
+    def answer(self, thread_id: str, user_input: str,
+               on_message: Optional[Callable[[str], None]] = None,
+               on_token: Optional[Callable[[str], None]] = None) -> SessionTurn:
+        """
+        Procesa la respuesta del usuario en su sesión y devuelve los mensajes nuevos.
+        on_message recibe cada mensaje apenas termina el nodo que lo generó (el
+        resultado del cálculo llega después de la confirmación de la última respuesta)
+        y on_token cada fragmento del texto que el LLM genera en streaming.
+        """
+        callbacks = {"message": on_message, "token": on_token}
+        turn = None
+        for event in self.stream_answer(thread_id, user_input):
+            if event.kind == "end":
+                turn = event.turn
+            elif callbacks[event.kind] is not None:
+                callbacks[event.kind](event.content)
+        return turn
+
+
+_runtime: Optional[SessionRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> SessionRuntime:
+    """Runtime del proceso: el grafo se compila la primera vez y se reutiliza en cada sesión."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = SessionRuntime()
+    return _runtime
@@ -0,0 +1,178 @@
+"""
+Simulador de escenarios (what-if) para medidas de reducción.
+Cada medida es una intervención parametrizada sobre campos del GraphState
+(p.ej. -30% kWh, auto como máximo 40%, reciclaje como mínimo 60%). Todas las
+combinaciones de medidas se arman como filas de una tabla y se evalúan en una
+sola pasada de calculate_carbon_footprint_batch, para ordenar las
+recomendaciones por toneladas de CO₂e ahorradas.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .state import GraphState
+from .emission_factors import FactorSet, get_factor_set
+from .carbon_calculator import (
+    DEFAULT_PCT_CAR,
+    DEFAULT_PCT_PUBLIC,
+    INPUT_COLUMNS,
+    calculate_carbon_footprint_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+# Valor efectivo de los campos cuando no hay respuesta (igual que en el cálculo)
+_EFFECTIVE_DEFAULTS = {"transport_pct_car": DEFAULT_PCT_CAR, "transport_pct_public": DEFAULT_PCT_PUBLIC}
+_CATEGORICAL_COLUMNS = {"fuel_type", "climate_control"}
+
+# Con más medidas las combinaciones crecen como 2^n
+MAX_COMBINED_INTERVENTIONS = 10
+
+
+class Intervention(NamedTuple):
+    """
+    Medida de reducción sobre un campo del GraphState.
+    operation: "reducir" (multiplica por 1 - value), "como_maximo", "como_minimo" o "cambiar_a".
+    transfer_to: campo que recibe lo que se quita (p.ej. el % de auto pasa a transporte público).
+    only_if: para "cambiar_a", valores actuales sobre los que se aplica (vacío: cualquiera no nulo).
+    """
+    key: str
+    recommendation: str
+    field: str
+    operation: str
+    value: Any
+    transfer_to: Optional[str] = None
+    only_if: Tuple[Any, ...] = ()
+
+
+DEFAULT_INTERVENTIONS: Tuple[Intervention, ...] = (
+    Intervention("eficiencia_electrica",
+                 "Optimizar el consumo eléctrico: cambiar a iluminación LED y equipos eficientes (-30% kWh).",
+                 "electricity_kwh", "reducir", 0.30),
+    Intervention("energia_renovable",
+                 "Instalar paneles solares u otras fuentes de energía renovable (-50% de kWh de la red).",
+                 "electricity_kwh", "reducir", 0.50),
+    Intervention("flota_eficiente",
+                 "Renovar la flota y promover la conducción eficiente (-20% de combustible).",
+                 "fuel_consumption", "reducir", 0.20),
+    Intervention("transporte_compartido",
+                 "Implementar un programa de transporte compartido o subsidios para transporte público (auto ≤ 40%).",
+                 "transport_pct_car", "como_maximo", 40, transfer_to="transport_pct_public"),
+    Intervention("reciclaje",
+                 "Establecer un programa de reciclaje y reducción de residuos (≥ 60% reciclado).",
+                 "recycle_pct", "como_minimo", 60),
+    Intervention("oficina_sin_papel",
+                 "Implementar una política de oficina sin papel y digitalizar procesos (-50% de papel).",
+                 "paper_consumption", "reducir", 0.50),
+    Intervention("climatizacion_eficiente",
+                 "Mejorar el aislamiento térmico y pasar a bomba de calor.",
+                 "climate_control", "cambiar_a", "bomba_calor",
+                 only_if=("aire_acondicionado", "calefaccion_electrica", "calefaccion_gas")),
+    Intervention("menos_vuelos",
+                 "Reemplazar parte de los viajes aéreos por videollamadas (-30% de km en avión).",
+                 "air_travel_km", "reducir", 0.30),
+)
+
+
+def _effective(table: pd.DataFrame, field: str) -> np.ndarray:
+    values = pd.to_numeric(table[field], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    default = _EFFECTIVE_DEFAULTS.get(field)
+    return values if default is None else np.where(values != 0, values, default)
+
+
+def _apply(table: pd.DataFrame, intervention: Intervention, mask: np.ndarray) -> None:
+    """Aplica la intervención (en el lugar) a las filas de la máscara."""
+    field, value = intervention.field, intervention.value
+    if intervention.operation == "cambiar_a":
+        current = table[field]
+        eligible = current.isin(intervention.only_if) if intervention.only_if else current.notna()
+        table[field] = current.where(~(mask & eligible.to_numpy()), value)
+        return
+    current = _effective(table, field)
+    if intervention.operation == "reducir":
+        new = current * (1 - value)
+    elif intervention.operation == "como_maximo":
+        new = np.minimum(current, value)
+    elif intervention.operation == "como_minimo":
+        new = np.maximum(current, value)
+    else:
+        raise ValueError(f"Operación desconocida: {intervention.operation}")
+    new = np.where(mask, new, current)
+    if intervention.transfer_to:
+        table[intervention.transfer_to] = _effective(table, intervention.transfer_to) + (current - new)
+    table[field] = new
+
+
+def _state_table(state: GraphState, rows: int) -> pd.DataFrame:
+    data = {}
+    for field in INPUT_COLUMNS:
+        value = getattr(state, field)
+        if field in _CATEGORICAL_COLUMNS:
+            data[field] = pd.Series([value] * rows, dtype=object)
+        else:
+            data[field] = np.full(rows, np.nan if value is None else float(value))
+    return pd.DataFrame(data)
+
+
+def _applicable(state: GraphState, interventions: Sequence[Intervention], factors: FactorSet) -> List[Intervention]:
+    """Medidas que por sí solas cambian la huella (las demás no pueden ahorrar nada)."""
+    table = _state_table(state, len(interventions) + 1)
+    rows = np.arange(len(table))
+    for index, intervention in enumerate(interventions):
+        _apply(table, intervention, rows == index + 1)
+    totals = calculate_carbon_footprint_batch(table, factors=factors)["total_footprint"].to_numpy()
+    return [intervention for index, intervention in enumerate(interventions) if totals[index + 1] != totals[0]]
+
+
+def evaluate_scenarios(state: GraphState, interventions: Sequence[Intervention] = DEFAULT_INTERVENTIONS,
+                       country: str = "default", factors: Optional[FactorSet] = None) -> pd.DataFrame:
+    """
+    Evalúa todas las combinaciones de las medidas aplicables en una sola pasada del cálculo en lote.
+    Devuelve una fila por escenario (la primera es la situación actual) con la tupla de medidas
+    ('interventions'), los resultados del cálculo y el ahorro ('saved', t CO₂e, y 'saved_pct').
+    """
+    factors = factors or get_factor_set(country)
+    applicable = _applicable(state, interventions, factors)
+    if len(applicable) > MAX_COMBINED_INTERVENTIONS:
+        raise ValueError(f"Demasiadas medidas para combinar ({len(applicable)} > {MAX_COMBINED_INTERVENTIONS}).")
+
+    codes = np.arange(2 ** len(applicable))
+    table = _state_table(state, len(codes))
+    for bit, intervention in enumerate(applicable):
+        _apply(table, intervention, (codes >> bit) & 1 == 1)
+
+    results = calculate_carbon_footprint_batch(table, factors=factors)
+    baseline = results["total_footprint"].iloc[0]
+    results.insert(0, "interventions", [tuple(intervention.key for bit, intervention in enumerate(applicable)
+                                               if code >> bit & 1) for code in codes])
+    results["saved"] = baseline - results["total_footprint"]
+    results["saved_pct"] = results["saved"] / baseline if baseline > 0 else 0.0
+    logger.info(f"Evaluados {len(results)} escenarios con {len(applicable)} medidas aplicables.")
+    return results
+
+
+def rank_recommendations(state: GraphState, interventions: Sequence[Intervention] = DEFAULT_INTERVENTIONS,
+                         country: str = "default", factors: Optional[FactorSet] = None,
+                         scenarios: Optional[pd.DataFrame] = None) -> List[Dict[str, Any]]:
+    """
+    Recomendaciones con ahorro positivo, ordenadas por t CO₂e ahorradas (medida individual).
+    Cada una: {key, recommendation, saved, saved_pct, sustainability_score}.
+    """
+    if scenarios is None:
+        scenarios = evaluate_scenarios(state, interventions, country, factors)
+    by_key = {intervention.key: intervention for intervention in interventions}
+    singles = scenarios[scenarios["interventions"].map(len) == 1]
+    ranked = [
+        {
+            "key": row["interventions"][0],
+            "recommendation": by_key[row["interventions"][0]].recommendation,
+            "saved": row["saved"],
+            "saved_pct": row["saved_pct"],
+            "sustainability_score": row["sustainability_score"],
+        }
+        for row in singles.to_dict("records") if row["saved"] > 0
+    ]
+    return sorted(ranked, key=lambda item: item["saved"], reverse=True)
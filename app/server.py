@@ -0,0 +1,210 @@
+"""
+Servidor HTTP + WebSocket (ASGI) de la conversación sobre el runtime de sesiones.
+Un solo proceso atiende cientos de conversaciones: las conexiones se manejan en el
+event loop y cada turno del grafo (síncrono, con SQLite) corre en un pool de hilos.
+Los turnos de una misma sesión se encolan con un lock por sesión; el thread_id viaja
+en la cookie y en el encabezado X-Session-Id para que un balanceador con afinidad
+envíe siempre la sesión al mismo proceso.
+
+    POST /sessions                     {"thread_id": opcional} -> crea o retoma la sesión
+    POST /sessions/{thread_id}/answer  {"text": "..."} -> mensajes del turno (?stream=1: NDJSON)
+    GET  /sessions/{thread_id}         datos recolectados hasta el momento
+    WS   /sessions/{thread_id}/ws      envía {"text": ...}; recibe cada mensaje (y fragmento del LLM) apenas se genera
+
+Uso: python -m app.server --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+import logging
+
+import anyio
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from .runtime import SessionLocks, SessionRuntime, SessionTurn, get_runtime
+
+logger = logging.getLogger(__name__)
+
+# Hilos para ejecutar turnos del grafo en paralelo (las conexiones en espera no ocupan hilos)
+SERVER_WORKER_THREADS = int(os.getenv("SERVER_WORKER_THREADS", "32"))
+# Conexiones inactivas se mantienen abiertas este tiempo: entre respuestas el usuario piensa
+# (con el valor por defecto de uvicorn, 5 s, el cliente reutiliza conexiones ya cerradas)
+SERVER_KEEP_ALIVE_SECONDS = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "75"))
+SESSION_COOKIE = "carbon_session"
+SESSION_HEADER = "X-Session-Id"
+
+_DONE = object()
+
+
+def _turn_payload(turn: SessionTurn) -> Dict[str, Any]:
+    return turn._asdict()
+
+
+def _with_session(response: Response, thread_id: str) -> Response:
+    """Afinidad de sesión: el balanceador (y el navegador) reenvían el thread_id en cada pedido."""
+    response.headers[SESSION_HEADER] = thread_id
+    response.set_cookie(SESSION_COOKIE, thread_id, httponly=True, samesite="lax")
+    return response
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status)
+
+
+async def _json_body(request: Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+async def stream_turn(runtime: SessionRuntime, thread_id: str, text: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Eventos de un turno: {"type": "token"} por cada fragmento del texto que el LLM
+    genera en streaming, {"type": "message"} por cada mensaje apenas termina su nodo
+    y {"type": "end"} con la tarea actual al final. El llamador debe tener el lock de la sesión.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(kind: str) -> Callable[[str], None]:
+        return lambda content: loop.call_soon_threadsafe(queue.put_nowait, {"type": kind, "content": content})
+
+    def run() -> SessionTurn:
+        try:
+            return runtime.answer(thread_id, text, on_message=emit("message"), on_token=emit("token"))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    task = asyncio.ensure_future(anyio.to_thread.run_sync(run))
+    while (event := await queue.get()) is not _DONE:
+        yield event
+    turn = await task
+    yield {"type": "end", "thread_id": thread_id, "current_task": turn.current_task, "finished": turn.finished}
+
+
+# --- Endpoints ---
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", "active_sessions": len(request.app.state.locks)})
+
+
+async def create_session(request: Request) -> Response:
+    body = await _json_body(request)
+    # Sólo se retoma una sesión si se pide explícitamente (la cookie es para el balanceador)
+    thread_id = str(body.get("thread_id") or uuid.uuid4())
+    async with request.app.state.locks.hold_async(thread_id):
+        turn = await anyio.to_thread.run_sync(request.app.state.runtime.start, thread_id)
+    return _with_session(JSONResponse(_turn_payload(turn), status_code=201), thread_id)
+
+
+async def get_session(request: Request) -> Response:
+    thread_id = request.path_params["thread_id"]
+    state = await anyio.to_thread.run_sync(request.app.state.runtime.get_state, thread_id)
+    if state is None:
+        return _error(404, f"Sesión desconocida: {thread_id}")
+    return _with_session(JSONResponse(state.model_dump(mode="json")), thread_id)
+
+
+async def answer(request: Request) -> Response:
+    thread_id = request.path_params["thread_id"]
+    text = (await _json_body(request)).get("text")
+    if not isinstance(text, str):
+        return _error(400, "Falta el campo 'text' con la respuesta del usuario")
+    runtime: SessionRuntime = request.app.state.runtime
+    locks: SessionLocks = request.app.state.locks
+    if not await anyio.to_thread.run_sync(runtime.exists, thread_id):
+        return _error(404, f"Sesión desconocida: {thread_id}")
+
+    if request.query_params.get("stream") in ("1", "true"):
+        async def events() -> AsyncIterator[str]:
+            async with locks.hold_async(thread_id):
+                async for event in stream_turn(runtime, thread_id, text):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+        return _with_session(StreamingResponse(events(), media_type="application/x-ndjson"), thread_id)
+
+    async with locks.hold_async(thread_id):
+        turn = await anyio.to_thread.run_sync(runtime.answer, thread_id, text)
+    return _with_session(JSONResponse(_turn_payload(turn)), thread_id)
+
+
+async def session_socket(websocket: WebSocket) -> None:
+    thread_id = websocket.path_params["thread_id"]
+    runtime: SessionRuntime = websocket.app.state.runtime
+    await websocket.accept()
+    if not await anyio.to_thread.run_sync(runtime.exists, thread_id):
+        await websocket.send_json({"type": "error", "error": f"Sesión desconocida: {thread_id}"})
+        await websocket.close(code=4404)
+        return
+    try:
+        while True:
+            try:
+                text = (await websocket.receive_json()).get("text")
+            except (json.JSONDecodeError, AttributeError):
+                text = None
+            if not isinstance(text, str):
+                await websocket.send_json({"type": "error", "error": "Se espera {\"text\": \"...\"}"})
+                continue
+            async with websocket.app.state.locks.hold_async(thread_id):
+                async for event in stream_turn(runtime, thread_id, text):
+                    await websocket.send_json(event)
+    except WebSocketDisconnect:
+        logger.debug(f"WebSocket de la sesión {thread_id} desconectado")
+
+
+def create_app(runtime: Optional[SessionRuntime] = None) -> Starlette:
+    """Aplicación ASGI; sin runtime usa el del proceso (grafo compilado una vez)."""
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = SERVER_WORKER_THREADS
+        app.state.runtime = runtime or get_runtime()
+        app.state.locks = SessionLocks(asyncio.Lock)
+        yield
+
+    return Starlette(
+        routes=[
+            Route("/health", health),
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{thread_id}", get_session),
+            Route("/sessions/{thread_id}/answer", answer, methods=["POST"]),
+            WebSocketRoute("/sessions/{thread_id}/ws", session_socket),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    from .llm_integration import configure_gemini_client
+
+    parser = argparse.ArgumentParser(description="API HTTP/WebSocket del asistente de huella de carbono.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper(), logging.WARNING))
+    if os.getenv("GOOGLE_API_KEY"):
+        try:
+            configure_gemini_client()
+        except Exception as e:
+            logger.error(f"Fallo al configurar el cliente LLM: {e}. Se usa sólo el intérprete local.")
+    else:
+        logger.warning("GOOGLE_API_KEY no configurada: las respuestas se interpretan sólo localmente.")
+    # Un solo proceso: la concurrencia es por conexión (event loop) y por turno (pool de hilos)
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level,
+                timeout_keep_alive=SERVER_KEEP_ALIVE_SECONDS)
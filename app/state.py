@@ -1,9 +1,15 @@
-from typing import Dict, Optional, List, Any, Literal
+from typing import Annotated, Dict, Optional, List, Any, Literal, Sequence
 # Importar ConfigDict si quieres usarlo explícitamente, aunque no es estrictamente necesario
 # from pydantic import BaseModel, Field, ConfigDict 
 from pydantic import BaseModel, Field
 import uuid
 
+try:
+    # langgraph reciente: el checkpoint guarda sólo los mensajes nuevos de cada turno
+    from langgraph.channels.delta import DeltaChannel
+except ImportError:  # pragma: no cover - versiones anteriores de langgraph
+    DeltaChannel = None
+
 # Tareas para el flujo de recolección de datos de huella de carbono
 TaskStateType = Literal[
     # Datos básicos
@@ -68,11 +74,31 @@ ClimateControlType = Literal[
     None
 ]
 
+# Cada cuántas actualizaciones del historial se guarda una copia completa en el checkpoint
+# (entre copias sólo se guardan los mensajes nuevos de cada turno)
+MESSAGES_SNAPSHOT_FREQUENCY = 10
+
+
+def append_messages(current: List[str], new: List[str]) -> List[str]:
+    """Reducer del historial: los nodos devuelven sólo los mensajes nuevos."""
+    return current + new
+
+
+def _append_message_batches(current: List[str], batches: Sequence[List[str]]) -> List[str]:
+    return current + [message for batch in batches for message in batch]
+
+
+MessageHistory = (
+    Annotated[List[str], DeltaChannel(_append_message_batches, snapshot_frequency=MESSAGES_SNAPSHOT_FREQUENCY)]
+    if DeltaChannel is not None else Annotated[List[str], append_messages]
+)
+
+
 class GraphState(BaseModel):
     """Estado para la conversación de recolección de datos de huella de carbono empresarial."""
     
     interaction_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    messages: list[str] = Field(default_factory=list)
+    messages: MessageHistory = Field(default_factory=list)  # Se acumula: los nodos emiten sólo lo nuevo
     user_input: Optional[str] = None
 
     # --- Campos Nuevos para Datos de Empresa ---
@@ -113,6 +139,9 @@ class GraphState(BaseModel):
     carbon_per_employee: Optional[float] = None # Toneladas CO₂e por empleado
     sustainability_score: Optional[int] = None  # Puntaje 0-100
     footprint_breakdown: Dict[str, float] = Field(default_factory=dict)  # Desglose por categoría
+    factor_version: Optional[str] = None        # Versión de los factores de emisión usados
+    factor_country: Optional[str] = None        # País de los factores de emisión usados
+    partial_footprint: Dict[str, float] = Field(default_factory=dict)  # Vista previa: kg CO₂e por categoría
 
     # --- Campos de Control de Flujo ---
     current_task: TaskStateType = None
@@ -120,6 +149,14 @@ class GraphState(BaseModel):
     last_user_intent: IntentType = None
     conversation_finished: bool = False
 
+    def apply_update(self, update: Dict[str, Any]) -> None:
+        """Aplica la salida de un nodo fuera del grafo, con la misma semántica que el reducer de messages."""
+        for key, value in update.items():
+            if key == "messages":
+                self.messages = append_messages(self.messages, value)
+            else:
+                setattr(self, key, value)
+
     def add_message(self, message: str): 
         """Añade un mensaje al historial."""
         self.messages.append(message)
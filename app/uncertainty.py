@@ -0,0 +1,145 @@
+"""
+Modo de incertidumbre para la huella de carbono (Monte Carlo).
+El cálculo puntual asume vuelos 50/50 cortos/largos, viajes terrestres 50/50 tren/bus,
+22 días laborables y un reparto 60/30/10 del transporte cuando falta la respuesta.
+Aquí esos supuestos y los factores de emisión se muestrean de distribuciones con NumPy y
+se evalúan las mismas funciones por categoría del cálculo puntual (CATEGORY_FUNCTIONS)
+sobre los arrays de muestras; se devuelven intervalos de confianza por categoría.
+"""
+
+import os
+from typing import Any, Dict, Optional, Union
+import logging
+
+import numpy as np
+
+from .state import GraphState
+from .emission_factors import FACTOR_INDEX, FactorSet, get_factor_set
+from .carbon_calculator import BREAKDOWN_CATEGORIES, CATEGORY_FUNCTIONS, DEFAULT_ASSUMPTIONS, Assumptions, sustainability_scores
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLES = int(os.getenv("FOOTPRINT_UNCERTAINTY_SAMPLES", "100000"))
+DEFAULT_CONFIDENCE = 0.95
+
+# Incertidumbre relativa de los factores por grupo: desvío de un multiplicador lognormal de media 1
+FACTOR_UNCERTAINTY = {
+    "electricidad": 0.10,
+    "combustible": 0.05,
+    "transporte": 0.20,
+    "viajes": 0.25,
+    "residuos": 0.30,
+    "agua": 0.20,
+    "papel": 0.20,
+    "infraestructura": 0.30,
+    "climatizacion": 0.10,
+}
+
+# Supuestos del cálculo puntual y la distribución con que se muestrean
+AIR_SHORT_SHARE_RANGE = (0.3, 0.7)       # Fracción de km aéreos en vuelos cortos (puntual: 0.5), uniforme
+TRAIN_SHARE_RANGE = (0.3, 0.7)           # Fracción de km terrestres en tren (puntual: 0.5), uniforme
+WORK_DAYS_TRIANGULAR = (18, 22, 24)      # Días laborables al mes: mínimo, moda, máximo (puntual: 22)
+DEFAULT_TRANSPORT_SHARES = (0.6, 0.3, 0.1)  # Auto/público/verde cuando falta la respuesta
+TRANSPORT_SHARES_CONCENTRATION = 20.0    # Dirichlet: cuanto mayor, más concentrado alrededor del default
+
+Samples = Union[float, np.ndarray]
+
+
+class _SampledFactors:
+    """
+    Sustituto de FactorSet para CATEGORY_FUNCTIONS: get() devuelve un array de muestras del
+    factor (un multiplicador lognormal de media 1), o el valor puntual si no tiene incertidumbre.
+    Cada factor se muestrea una sola vez, aunque lo usen varias categorías.
+    """
+
+    def __init__(self, factors: FactorSet, samples: int, rng: np.random.Generator):
+        self.factors = factors
+        self.version = factors.version
+        self.samples = samples
+        self.rng = rng
+        self._drawn: Dict[str, Samples] = {}
+
+    def get(self, key: str, default: float = 0.0) -> Samples:
+        if key not in FACTOR_INDEX:
+            return default
+        if key not in self._drawn:
+            base = self.factors.get(key)
+            sigma = FACTOR_UNCERTAINTY.get(key.split(".")[0], 0.0)
+            if base == 0 or sigma <= 0:
+                self._drawn[key] = base
+            else:
+                self._drawn[key] = base * self.rng.lognormal(-sigma ** 2 / 2, sigma, self.samples)
+        return self._drawn[key]
+
+
+def _sample_assumptions(state: GraphState, samples: int, rng: np.random.Generator) -> Assumptions:
+    """Supuestos del cálculo puntual muestreados; sólo los que intervienen en las respuestas de la empresa."""
+    assumptions = DEFAULT_ASSUMPTIONS
+
+    def uniform(bounds) -> Samples:
+        low, high = bounds
+        return low if low == high else rng.uniform(low, high, samples)
+
+    if state.employee_count and state.employee_commute_distance:
+        low, mode, high = WORK_DAYS_TRIANGULAR
+        assumptions = assumptions._replace(work_days=mode if low == high else rng.triangular(low, mode, high, samples))
+        if not (state.transport_pct_car and state.transport_pct_public):
+            alpha = np.asarray(DEFAULT_TRANSPORT_SHARES) * TRANSPORT_SHARES_CONCENTRATION
+            shares = rng.dirichlet(alpha, samples)
+            assumptions = assumptions._replace(pct_car=shares[:, 0] * 100, pct_public=shares[:, 1] * 100)
+    if state.air_travel_km:
+        assumptions = assumptions._replace(air_short_share=uniform(AIR_SHORT_SHARE_RANGE))
+    if state.ground_travel_km:
+        assumptions = assumptions._replace(train_share=uniform(TRAIN_SHARE_RANGE))
+    return assumptions
+
+
+def _category_samples(state: GraphState, factors: FactorSet, samples: int,
+                      rng: np.random.Generator) -> Dict[str, Samples]:
+    """Huella por categoría (kg CO₂e): las funciones del cálculo puntual evaluadas sobre las muestras."""
+    sampled_factors = _SampledFactors(factors, samples, rng)
+    assumptions = _sample_assumptions(state, samples, rng)
+    return {name: function(state, sampled_factors, assumptions) for name, function in CATEGORY_FUNCTIONS.items()}
+
+
+def _interval(values: Samples, confidence: float) -> Dict[str, float]:
+    if np.ndim(values) == 0:  # Sin incertidumbre (p.ej. categoría sin datos)
+        value = float(values)
+        return {"mean": value, "low": value, "median": value, "high": value}
+    tail = (1 - confidence) / 2 * 100
+    low, median, high = np.percentile(values, [tail, 50, 100 - tail])
+    return {"mean": float(values.mean()), "low": float(low), "median": float(median), "high": float(high)}
+
+
+def simulate_carbon_footprint(state: GraphState, samples: int = DEFAULT_SAMPLES, confidence: float = DEFAULT_CONFIDENCE,
+                              country: str = "default", factors: Optional[FactorSet] = None,
+                              seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Simula la huella de una empresa con 'samples' muestras de los supuestos y factores.
+    Devuelve intervalos {mean, low, median, high} (toneladas CO₂e) para el total, el valor
+    por empleado, cada categoría del desglose y el puntaje de sostenibilidad.
+    """
+    factors = factors or get_factor_set(country)
+    rng = np.random.default_rng(seed)
+    categories = {name: values / 1000 for name, values in _category_samples(state, factors, samples, rng).items()}
+
+    total = np.zeros(samples) + sum(categories[name] for name in BREAKDOWN_CATEGORIES)
+    if state.employee_count and state.employee_count > 0:
+        per_employee = total / state.employee_count
+    else:
+        per_employee = np.zeros(samples)
+    scores = sustainability_scores(per_employee)
+
+    results = {
+        "samples": samples,
+        "confidence": confidence,
+        "total_footprint": _interval(total, confidence),
+        "per_employee": _interval(per_employee, confidence),
+        "breakdown": {name: _interval(values, confidence) for name, values in categories.items()},
+        "sustainability_score": _interval(scores, confidence),
+        "factor_version": factors.version,
+    }
+    total_interval = results["total_footprint"]
+    logger.info(f"Huella simulada ({samples} muestras): {total_interval['median']:.2f} t CO₂e "
+                f"[{total_interval['low']:.2f} - {total_interval['high']:.2f}] al {confidence:.0%}")
+    return results
@@ -0,0 +1,103 @@
+"""
+Benchmark del cálculo de huella en lote.
+Genera tablas sintéticas de empresas (10k, 100k y 1M filas), mide
+calculate_carbon_footprint_batch contra el cálculo escalar fila a fila
+(extrapolado desde una muestra) y verifica que los resultados coincidan.
+
+Uso: python -m benchmarks.bench_carbon_batch --rows 10000 100000 1000000
+"""
+
+import argparse
+import logging
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from app.carbon_calculator import (
+    BREAKDOWN_CATEGORIES,
+    CLIMATE_ADJUSTMENTS,
+    FUEL_FACTORS,
+    calculate_carbon_footprint,
+    calculate_carbon_footprint_batch,
+)
+from app.state import GraphState
+
+
+def random_companies(rows: int, seed: int = 42) -> pd.DataFrame:
+    """Tabla de empresas sintéticas con ~10% de datos faltantes por columna."""
+    rng = np.random.default_rng(seed)
+
+    def numeric(low: float, high: float, integer: bool = False) -> pd.Series:
+        values = rng.integers(low, high, rows) if integer else np.round(rng.uniform(low, high, rows), 2)
+        series = pd.Series(values, dtype="Int64" if integer else "float64")
+        series[rng.random(rows) < 0.1] = None
+        return series
+
+    def choice(options: List[str]) -> pd.Series:
+        series = pd.Series(rng.choice(options, rows), dtype=object)
+        series[rng.random(rows) < 0.1] = None
+        return series
+
+    return pd.DataFrame({
+        "employee_count": numeric(1, 500, integer=True),
+        "electricity_kwh": numeric(0, 50000),
+        "fuel_type": choice(list(FUEL_FACTORS)),
+        "fuel_consumption": numeric(0, 2000),
+        "gas_consumption": numeric(0, 1000),
+        "employee_commute_distance": numeric(0, 40),
+        "transport_pct_car": numeric(0, 101, integer=True),
+        "transport_pct_public": numeric(0, 101, integer=True),
+        "transport_pct_green": numeric(0, 101, integer=True),
+        "waste_kg": numeric(0, 3000),
+        "recycle_pct": numeric(0, 101, integer=True),
+        "water_consumption": numeric(0, 500),
+        "paper_consumption": numeric(0, 300),
+        "office_sqm": numeric(10, 5000),
+        "climate_control": choice(list(CLIMATE_ADJUSTMENTS)),
+        "air_travel_km": numeric(0, 100000),
+        "ground_travel_km": numeric(0, 20000),
+    })
+
+
+def _scalar_rows(table: pd.DataFrame) -> List[dict]:
+    records = table.astype(object).where(table.notna(), None).to_dict("records")
+    return [calculate_carbon_footprint(GraphState(**record)) for record in records]
+
+
+def _assert_identical(batch: pd.DataFrame, scalar: List[dict]) -> None:
+    for position, expected in enumerate(scalar):
+        row = batch.iloc[position]
+        assert row["total_footprint"] == expected["total_footprint"], position
+        assert row["per_employee"] == expected["per_employee"], position
+        assert row["sustainability_score"] == expected["sustainability_score"], position
+        assert all(row[name] == expected["breakdown"][name] for name in BREAKDOWN_CATEGORIES), position
+
+
+def run(row_counts: List[int], scalar_sample: int = 2000, seed: int = 42) -> None:
+    for rows in row_counts:
+        table = random_companies(rows, seed)
+        start = time.perf_counter()
+        batch = calculate_carbon_footprint_batch(table)
+        batch_elapsed = time.perf_counter() - start
+
+        sample = table.head(min(rows, scalar_sample))
+        start = time.perf_counter()
+        scalar = _scalar_rows(sample)
+        scalar_elapsed = (time.perf_counter() - start) / len(sample) * rows
+        _assert_identical(batch, scalar)
+
+        print(f"{rows:>9,} filas: lote {batch_elapsed * 1000:8.1f} ms "
+              f"({rows / batch_elapsed:,.0f} filas/s) | escalar ~{scalar_elapsed:8.1f} s "
+              f"(extrapolado de {len(sample)} filas) | x{scalar_elapsed / batch_elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)  # El cálculo escalar registra cada categoría en INFO
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--scalar-sample", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.rows, args.scalar_sample, args.seed)
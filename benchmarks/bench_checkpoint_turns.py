@@ -0,0 +1,105 @@
+"""
+Benchmark de checkpoints por turno en una conversación larga.
+Compara el historial con reducer (los nodos emiten sólo el mensaje nuevo y el
+checkpoint guarda deltas) contra el esquema anterior (cada nodo devuelve la lista
+completa y cada checkpoint la copia entera). Por cada bloque de turnos muestra la
+latencia de invoke + get_state, los bytes que agrega el checkpoint en SQLite y la
+memoria del proceso.
+
+Uso: python -m benchmarks.bench_checkpoint_turns --turns 100
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List
+
+from langgraph.graph import END, StateGraph
+
+from app.checkpointer import SQLiteCheckpointSaver
+from app.nodes.conversation import QUESTION_SPECS
+from app.state import GraphState
+
+
+class FullCopyState(GraphState):
+    """Esquema anterior: messages sin reducer (último valor gana)."""
+    messages: List[str] = []
+
+
+def _reply(state: GraphState) -> str:
+    # Texto distinto en cada turno (como las respuestas con datos de la empresa) para que zlib no lo oculte
+    question = QUESTION_SPECS[len(state.messages) % len(QUESTION_SPECS)].question
+    return f"{question}\nRegistro {uuid.uuid4()} - respuesta anterior: {state.user_input}"
+
+
+def delta_node(state: GraphState) -> Dict[str, Any]:
+    return {"messages": [_reply(state)], "user_input": None}
+
+
+def full_copy_node(state: FullCopyState) -> Dict[str, Any]:
+    return {"messages": state.messages + [_reply(state)], "user_input": None}
+
+
+def build_app(state_class, node, saver):
+    workflow = StateGraph(state_class)
+    workflow.add_node("turno", node)
+    workflow.set_entry_point("turno")
+    workflow.add_edge("turno", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def _stored_bytes(saver: SQLiteCheckpointSaver) -> int:
+    conn = saver._connection()
+    return sum(conn.execute(f"SELECT COALESCE(SUM(LENGTH({column})), 0) FROM {table}").fetchone()[0]
+               for table, column in (("blobs", "value"), ("writes", "value"), ("checkpoints", "checkpoint")))
+
+
+def _conversation(state_class, node, turns: int, block: int, traced: bool) -> List[tuple]:
+    """Corre la conversación y devuelve, por bloque, (ms/turno, bytes/turno, KB de memoria)."""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        saver = SQLiteCheckpointSaver(os.path.join(directory, "checkpoints.db"))
+        app = build_app(state_class, node, saver)
+        config = {"configurable": {"thread_id": "bench"}}
+        stored, elapsed = _stored_bytes(saver), 0.0
+        for turn in range(1, turns + 1):
+            start = time.perf_counter()
+            app.invoke({"user_input": f"respuesta {turn}"}, config)
+            values = app.get_state(config).values
+            elapsed += time.perf_counter() - start
+            if turn % block == 0:
+                now = _stored_bytes(saver)
+                memory = tracemalloc.get_traced_memory()[0] / 1024 if traced else None
+                rows.append((elapsed / block * 1000, (now - stored) / block, memory))
+                stored, elapsed = now, 0.0
+        assert len(values["messages"]) == turns
+        saver.close()
+    return rows
+
+
+def run(turns: int, block: int) -> None:
+    for label, state_class, node in (("copia completa", FullCopyState, full_copy_node),
+                                     ("delta (reducer)", GraphState, delta_node)):
+        timings = _conversation(state_class, node, turns, block, traced=False)
+        # La memoria se mide en una segunda pasada: tracemalloc distorsiona la latencia
+        tracemalloc.start()
+        memory = _conversation(state_class, node, turns, block, traced=True)
+        tracemalloc.stop()
+        print(f"\n{label}")
+        print(f"  {'turnos':>11} | {'ms/turno':>8} | {'bytes/turno':>11} | {'KB memoria':>10}")
+        for index, ((ms, stored, _), (_, _, kb)) in enumerate(zip(timings, memory)):
+            first = index * block + 1
+            print(f"  {first:>4} - {first + block - 1:>4} | {ms:8.2f} | {stored:11,.0f} | {kb:10,.0f}")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)  # Algunos módulos configuran INFO al importarse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--block", type=int, default=10, help="Turnos por fila del informe")
+    args = parser.parse_args()
+    run(args.turns, args.block)
@@ -0,0 +1,121 @@
+"""
+Benchmark offline del flujo de nodos process_*_node.
+Recorre conversaciones completas contra el proveedor LLM falso (sin API Key), con
+latencia y tasa de errores configurables, y mide conversaciones/turnos por segundo
+y cuántos turnos terminaron llamando al LLM.
+
+Uso: python -m benchmarks.bench_conversation_nodes --conversations 200 --workers 16 --latency-ms 300
+"""
+
+import argparse
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from app import llm_integration
+from app.llm_providers import FakeLLMProvider
+from app.number_parser import parse_number
+from app.state import GraphState
+from app.nodes.conversation import (
+    SPECS_BY_TASK,
+    calculate_carbon_footprint_node,
+    process_question_node,
+    select_question,
+)
+
+# Respuestas por campo; algunas son ambiguas a propósito para que pasen por el LLM
+ANSWERS: Dict[str, str] = {
+    "company_name": "Ruedas SA",
+    "responsible_name": "Ana",
+    "employee_count": "somos unas 50 personas",
+    "electricity_kwh": "1,500",
+    "fuel_type": "diesel",
+    "fuel_consumption": "300 litros",
+    "gas_consumption": "100 en invierno y 50 en verano",
+    "employee_commute_distance": "15 km",
+    "transport_pct_car": "60%",
+    "transport_pct_public": "30",
+    "transport_pct_green": "10",
+    "waste_kg": "200 kg",
+    "recycle_pct": "la mitad",
+    "water_consumption": "30 m3",
+    "paper_consumption": "50 kg",
+    "office_sqm": "400",
+    "climate_control": "1",
+    "air_travel_km": "2.000",
+    "ground_travel_km": "500",
+}
+
+MAX_TURNS = 60
+
+
+def _llm_number(prompt: str) -> str:
+    """Respuesta guionada del LLM falso a los prompts de extracción numérica."""
+    answer = re.search(r"El usuario ha respondido '(.*?)'", prompt, re.DOTALL).group(1)
+    if answer == "la mitad":
+        return "50"
+    parsed = parse_number(answer)
+    return str(parsed.value) if parsed else "None"
+
+
+def run_conversation() -> int:
+    """Ejecuta una conversación completa. Devuelve la cantidad de turnos."""
+    state = GraphState(current_task="esperando_nombre_empresa")
+    turns = 0
+    while state.current_task in SPECS_BY_TASK or state.current_task == "calculando_huella":
+        if turns >= MAX_TURNS:
+            raise RuntimeError(f"La conversación no terminó (tarea '{state.current_task}')")
+        if state.current_task == "calculando_huella":
+            state.user_input = "calcular"
+            update = calculate_carbon_footprint_node(state)
+        else:
+            spec = select_question(state)
+            state.user_input = ANSWERS[spec.field]
+            update = process_question_node(state, spec)
+        for key, value in update.items():
+            setattr(state, key, value)
+        turns += 1
+    return turns
+
+
+def run(conversations: int = 100, workers: int = 8, latency_ms: float = 200.0, jitter_ms: float = 50.0,
+        distribution: str = "lognormal", error_rate: float = 0.0, use_cache: bool = False, seed: int = 42) -> None:
+    provider = FakeLLMProvider(
+        rules=[(r"El usuario ha respondido", _llm_number)],
+        latency_ms=latency_ms, latency_jitter_ms=jitter_ms,
+        latency_distribution=distribution, error_rate=error_rate, seed=seed,
+    )
+    llm_integration.set_llm_provider(provider)
+    if not use_cache:
+        llm_integration.LLM_CACHE_MAX_TEMPERATURE = -1.0  # Todas las llamadas llegan al proveedor
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        turn_counts: List[int] = list(executor.map(lambda _: run_conversation(), range(conversations)))
+    elapsed = time.perf_counter() - start
+
+    total_turns = sum(turn_counts)
+    stats = provider.stats()
+    print(f"Conversaciones: {conversations} ({workers} workers), latencia LLM {distribution} "
+          f"{latency_ms:.0f}±{jitter_ms:.0f} ms, errores {error_rate:.0%}, caché {'sí' if use_cache else 'no'}")
+    print(f"Tiempo total: {elapsed:.2f} s")
+    print(f"Throughput: {conversations / elapsed:.1f} conversaciones/s, {total_turns / elapsed:.1f} turnos/s")
+    print(f"Llamadas al LLM: {stats['calls']} ({stats['calls'] / total_turns:.1%} de los turnos), "
+          f"errores simulados: {stats['errors']}")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)  # Algunos módulos configuran INFO al importarse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--distribution", default="lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true")
+    args = parser.parse_args()
+    run(args.conversations, args.workers, args.latency_ms, args.jitter_ms,
+        args.distribution, args.error_rate, args.cache)
@@ -0,0 +1,44 @@
+"""
+Benchmark del parser numérico local.
+Mide la tasa de respuestas que aún necesitarían el LLM (confianza baja o sin número)
+sobre un corpus de respuestas típicas, y el tiempo medio de parseo local.
+
+Uso: python -m benchmarks.bench_number_parser
+"""
+
+import time
+
+from app.number_parser import parse_number, LOCAL_PARSE_MIN_CONFIDENCE
+
+# Respuestas típicas a las preguntas numéricas del flujo
+CORPUS = [
+    "50", "1500", "10.5", "0", "200 kg", "1.500 kWh", "1.500.000", "2.350,5", "1,5k", "3k",
+    "cinco", "cinco mil", "doce", "veinticinco", "treinta y cinco", "ciento veinte",
+    "3 mil quinientos", "dos mil", "mil", "un millón", "1 millón", "20%", "12,5 %",
+    "veinte por ciento", "aprox 200", "unos 40 m²", "alrededor de 30 km", "más o menos 15",
+    "casi 100", "entre 10 y 20", "de 100 a 200 km", "10-20", "30 o 40", "somos 12 personas",
+    "consumimos 800 kwh por mes", "gastamos 300 litros de diesel", "30 m3", "60% en auto",
+    "1,500", "50 empleados y 20 autos", "no sé", "ninguno", "depende del mes",
+    "la mitad", "bastante", "100 en invierno y 50 en verano",
+]
+
+
+def run(repetitions: int = 2000) -> None:
+    fallbacks = [t for t in CORPUS
+                 if (p := parse_number(t)) is None or p.confidence < LOCAL_PARSE_MIN_CONFIDENCE]
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for text in CORPUS:
+            parse_number(text)
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / (repetitions * len(CORPUS)) * 1e6
+
+    print(f"Corpus: {len(CORPUS)} respuestas")
+    print(f"Requieren LLM: {len(fallbacks)} ({len(fallbacks) / len(CORPUS):.1%})")
+    for text in fallbacks:
+        print(f"  - {text!r}")
+    print(f"Parseo local: {per_call_us:.1f} µs por respuesta")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,174 @@
+"""
+Generador de carga para el servidor HTTP/WebSocket (app.server).
+Abre N conversaciones a la vez, cada una responde el cuestionario completo (con una
+pausa opcional entre respuestas, como un usuario real) y mide la latencia de cada
+turno, turnos por segundo y errores. Sin --url levanta el servidor en un subproceso
+(un solo worker) con el proveedor LLM falso y bases temporales.
+
+Uso: python -m benchmarks.bench_server_load --sessions 300 --mode ws --think-ms 3000 --ramp-s 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import httpx
+import websockets
+
+# Una respuesta por turno: el cuestionario completo hasta el cálculo
+ANSWERS = ["Ruedas SA", "Ana", "50", "1500", "diesel", "300 litros", "100", "15", "60", "30", "10",
+           "200", "30", "40", "20", "500", "1", "2000", "800"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.completed = 0
+        self.open_sessions = 0
+        self.peak_sessions = 0
+
+    def opened(self) -> None:
+        self.open_sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.open_sessions)
+
+    def closed(self, completed: bool) -> None:
+        self.open_sessions -= 1
+        self.completed += completed
+
+
+async def _http_conversation(client: httpx.AsyncClient, think: float, stats: LoadStats) -> bool:
+    response = await client.post("/sessions", json={})
+    response.raise_for_status()
+    thread_id = response.json()["thread_id"]
+    finished = False
+    for text in ANSWERS:
+        await asyncio.sleep(think)
+        start = time.perf_counter()
+        response = await client.post(f"/sessions/{thread_id}/answer", json={"text": text})
+        response.raise_for_status()
+        stats.latencies.append(time.perf_counter() - start)
+        finished = response.json()["finished"]
+    return finished
+
+
+async def _ws_conversation(client: httpx.AsyncClient, ws_url: str, think: float, stats: LoadStats) -> bool:
+    response = await client.post("/sessions", json={})
+    response.raise_for_status()
+    thread_id = response.json()["thread_id"]
+    finished = False
+    async with websockets.connect(f"{ws_url}/sessions/{thread_id}/ws", max_size=None) as websocket:
+        for text in ANSWERS:
+            await asyncio.sleep(think)
+            start = time.perf_counter()
+            await websocket.send(json.dumps({"text": text}))
+            while True:
+                event = json.loads(await websocket.recv())
+                if event["type"] == "end":
+                    finished = event["finished"]
+                    break
+                if event["type"] == "error":
+                    raise RuntimeError(event["error"])
+            stats.latencies.append(time.perf_counter() - start)
+    return finished
+
+
+async def _user(client: httpx.AsyncClient, mode: str, ws_url: str, think: float, delay: float,
+                stats: LoadStats) -> None:
+    await asyncio.sleep(delay)
+    stats.opened()
+    completed = False
+    try:
+        if mode == "ws":
+            completed = await _ws_conversation(client, ws_url, think, stats)
+        else:
+            completed = await _http_conversation(client, think, stats)
+    except Exception as e:
+        stats.errors += 1
+        print(f"  error: {type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        stats.closed(completed)
+
+
+async def run_load(url: str, sessions: int, mode: str, think_ms: float, ramp_s: float = 0.0) -> LoadStats:
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    ws_url = "ws" + url[len("http"):]
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        # Las conversaciones arrancan repartidas en ramp_s segundos (0: todas juntas)
+        await asyncio.gather(*(_user(client, mode, ws_url, think_ms / 1000, ramp_s * i / sessions, stats)
+                               for i in range(sessions)))
+    return stats
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(directory: str, llm_latency_ms: float) -> tuple:
+    port = _free_port()
+    env = {**os.environ, "LLM_PROVIDER": "fake", "FAKE_LLM_LATENCY_MS": str(llm_latency_ms),
+           "CHECKPOINT_DB": os.path.join(directory, "checkpoints.db"),
+           "INTERACTIONS_DB": os.path.join(directory, "interactions.db"),
+           "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    process = subprocess.Popen([sys.executable, "-m", "app.server", "--port", str(port)],
+                               cwd=directory, env=env)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("El servidor no arrancó")
+
+
+def _report(stats: LoadStats, elapsed: float) -> None:
+    latencies = sorted(stats.latencies)
+    print(f"  conversaciones completas: {stats.completed}  (simultáneas: {stats.peak_sessions}, errores: {stats.errors})")
+    print(f"  turnos: {len(latencies)} en {elapsed:.1f} s -> {len(latencies) / elapsed:.1f} turnos/s")
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        print(f"  latencia por turno: p50 {quantiles[49] * 1000:.0f} ms | p95 {quantiles[94] * 1000:.0f} ms"
+              f" | p99 {quantiles[98] * 1000:.0f} ms | máx {latencies[-1] * 1000:.0f} ms")
+
+
+def main(url: Optional[str], sessions: int, mode: str, think_ms: float, ramp_s: float,
+         llm_latency_ms: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        if url is None:
+            process, url = _start_server(directory, llm_latency_ms)
+        try:
+            print(f"{sessions} conversaciones ({mode}, pausa {think_ms:.0f} ms) contra {url}")
+            start = time.perf_counter()
+            stats = asyncio.run(run_load(url, sessions, mode, think_ms, ramp_s))
+            _report(stats, time.perf_counter() - start)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Servidor ya levantado (por defecto se inicia uno temporal)")
+    parser.add_argument("--sessions", type=int, default=200, help="Conversaciones simultáneas")
+    parser.add_argument("--mode", choices=("http", "ws"), default="http")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Pausa del usuario antes de cada respuesta")
+    parser.add_argument("--ramp-s", type=float, default=0.0, help="Segundos en los que se reparten los inicios")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Latencia del LLM falso (servidor temporal)")
+    args = parser.parse_args()
+    main(args.url, args.sessions, args.mode, args.think_ms, args.ramp_s, args.llm_latency_ms)
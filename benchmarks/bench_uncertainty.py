@@ -0,0 +1,51 @@
+"""
+Benchmark del modo de incertidumbre (Monte Carlo).
+Mide el tiempo de simulate_carbon_footprint por empresa para distintas cantidades
+de muestras sobre empresas de ejemplo, y muestra el intervalo de la huella total.
+
+Uso: python -m benchmarks.bench_uncertainty --samples 10000 100000 1000000
+"""
+
+import argparse
+import logging
+import time
+from typing import List
+
+from app.carbon_calculator import calculate_carbon_footprint
+from app.state import GraphState
+from app.uncertainty import simulate_carbon_footprint
+
+COMPANIES = {
+    "oficina chica": GraphState(employee_count=8, electricity_kwh=900.0, employee_commute_distance=6.0,
+                                waste_kg=30.0, office_sqm=90.0, climate_control="natural"),
+    "pyme completa": GraphState(employee_count=25, electricity_kwh=3200.0, fuel_type="gasolina",
+                                fuel_consumption=410.0, employee_commute_distance=18.0, transport_pct_car=55,
+                                waste_kg=120.0, recycle_pct=20, water_consumption=30.0, paper_consumption=20.0,
+                                office_sqm=300.0, climate_control="aire_acondicionado",
+                                air_travel_km=5000.0, ground_travel_km=800.0),
+    "viajes": GraphState(employee_count=12, air_travel_km=60000.0, ground_travel_km=4000.0),
+}
+
+
+def run(sample_counts: List[int], repetitions: int = 5) -> None:
+    for name, state in COMPANIES.items():
+        point = calculate_carbon_footprint(state)["total_footprint"]
+        print(f"{name} (puntual {point:.2f} t CO₂e)")
+        for samples in sample_counts:
+            simulate_carbon_footprint(state, samples, seed=0)  # Calentamiento
+            start = time.perf_counter()
+            for repetition in range(repetitions):
+                result = simulate_carbon_footprint(state, samples, seed=repetition)
+            elapsed_ms = (time.perf_counter() - start) / repetitions * 1000
+            total = result["total_footprint"]
+            print(f"  {samples:>9,} muestras: {elapsed_ms:8.1f} ms | IC 95% "
+                  f"[{total['low']:.2f} - {total['high']:.2f}], mediana {total['median']:.2f}")
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)  # Algunos módulos configuran INFO al importarse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--samples", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+    run(args.samples, args.repetitions)
@@ -0,0 +1,89 @@
+# tests/test_analytics.py
+import io
+import json
+
+import pytest
+
+from app.analytics import (
+    _aggregate_range,
+    _iter_json_array,
+    aggregate_log,
+    aggregate_repository,
+    classify_record,
+    iter_log_records,
+    normalize_record,
+)
+from app.interaction_repository import SQLiteInteractionRepository
+
+LOAN = {"interaction_id": "p", "requested_amount": 5000.0, "presented_option": None}
+LEGACY = {"interaction_id": "l", "company_name": "viejo", "employee_count": 3, "expense_light": 100}
+
+
+def carbon(i, fuel):
+    return {"interaction_id": str(i), "timestamp": f"2025-0{1 + i % 2}-10T10:00:00", "employee_count": 10 + i,
+            "fuel_type": fuel, "carbon_footprint": float(i), "carbon_per_employee": i / 10,
+            "sustainability_score": 50 + i, "footprint_breakdown": {"electricidad": 1.0, "gas": float(i)}}
+
+
+RECORDS = [LOAN, LEGACY] + [carbon(i, "diesel" if i % 3 else "gasolina") for i in range(1, 40)]
+
+
+def test_json_array_is_read_in_small_chunks():
+    text = json.dumps(RECORDS, indent=2)
+    assert list(_iter_json_array(io.StringIO(text), chunk_size=7)) == RECORDS
+    assert list(_iter_json_array(io.StringIO("[]"), chunk_size=1)) == []
+    # Un array truncado devuelve los elementos completos
+    assert list(_iter_json_array(io.StringIO(text[:len(text) // 2]), chunk_size=64))
+
+
+def test_schemas_are_classified_and_normalized():
+    assert [classify_record(r) for r in (LOAN, LEGACY, RECORDS[2])] == ["prestamo", "carbono_legado", "carbono"]
+    assert normalize_record(LOAN) is None
+    legacy = normalize_record(LEGACY)
+    assert legacy["company_name"] == "viejo" and legacy["carbon_footprint"] is None
+    assert "expense_light" not in legacy
+
+
+def test_grouped_aggregates_from_jsonl_and_legacy_array(tmp_path):
+    jsonl = tmp_path / "log.jsonl"
+    jsonl.write_text("".join(json.dumps(r) + "\n" for r in RECORDS) + "{truncada\n", encoding="utf-8")
+    legacy = tmp_path / "log.json"
+    legacy.write_text(json.dumps(RECORDS), encoding="utf-8")
+    assert list(iter_log_records(str(legacy))) == RECORDS
+
+    summary = aggregate_log(str(jsonl), group_by="fuel_type")
+    assert summary == aggregate_log(str(legacy), group_by="fuel_type")
+    assert summary["esquemas"] == {"carbono": 39, "carbono_legado": 1, "prestamo": 1}
+    diesel = summary["grupos"]["diesel"]
+    values = [i for i in range(1, 40) if i % 3]
+    assert diesel["interacciones"] == len(values)
+    assert diesel["metricas"]["carbon_footprint"]["promedio"] == pytest.approx(sum(values) / len(values))
+    assert diesel["metricas"]["carbon_footprint"]["max"] == max(values)
+    assert diesel["categorias"]["gas"]["participacion"] == pytest.approx(sum(values) / (sum(values) + len(values)))
+    assert summary["grupos"]["sin_dato"]["interacciones"] == 1  # Registro legado sin combustible
+    assert set(aggregate_log(str(jsonl), group_by="month")["grupos"]) == {"2025-01", "2025-02", "sin_dato"}
+
+
+def test_byte_ranges_cover_each_line_once(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text("".join(json.dumps(r) + "\n" for r in RECORDS), encoding="utf-8")
+    size = path.stat().st_size
+    bounds = [0, 1, size // 3, size // 3 + 1, size - 1, size]
+    partials = [_aggregate_range(str(path), start, end, "employee_band") for start, end in zip(bounds, bounds[1:])]
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged.merge(partial)
+    assert merged.summary() == aggregate_log(str(path), group_by="employee_band")
+    assert aggregate_log(str(path), workers=2) == aggregate_log(str(path))
+
+
+def test_repository_aggregates_match_the_jsonl_log(tmp_path):
+    repository = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    repository.bulk_insert(RECORDS)
+    jsonl = tmp_path / "log.jsonl"
+    jsonl.write_text("".join(json.dumps(r) + "\n" for r in RECORDS), encoding="utf-8")
+
+    # Lotes chicos: el recorrido por id no pierde ni repite filas entre consultas
+    summary = aggregate_repository(repository, group_by="fuel_type", batch_size=7)
+    assert summary == aggregate_log(str(jsonl), group_by="fuel_type")
+    assert summary["esquemas"] == {"carbono": 39, "carbono_legado": 1, "prestamo": 1}
@@ -0,0 +1,47 @@
+# tests/test_benchmarking.py
+import random
+
+import pytest
+
+from app import persistence
+from app.state import GraphState
+from app.benchmarking import FootprintPercentileIndex, employee_band
+from app.interaction_repository import SQLiteInteractionRepository
+
+
+def test_rank_counts_higher_footprints_and_half_ties():
+    index = FootprintPercentileIndex.from_records(
+        [{"carbon_per_employee": value, "employee_count": 5} for value in (0.1, 0.2, 0.2, 0.4)]
+        + [{"carbon_per_employee": None}, {"carbon_per_employee": "n/a"}])
+    assert len(index) == 4
+    assert index.rank(0.05).percentile == 100 and index.rank(0.05).position == 1
+    assert index.rank(0.2) == (50.0, 2, 4, None)
+    assert index.rank(1.0).percentile == 0
+    assert index.rank(0.2, employee_count=5).band == "1-9"
+    assert index.rank(0.2, employee_count=100) is None  # Sin empresas en ese rango
+    assert FootprintPercentileIndex().rank(0.2) is None
+
+
+def test_incremental_inserts_match_bulk_build():
+    rng = random.Random(3)
+    records = [{"carbon_per_employee": rng.uniform(0.01, 1), "employee_count": rng.randint(1, 400)}
+               for _ in range(500)]
+    incremental = FootprintPercentileIndex()
+    for record in records:
+        incremental.add_record(record)
+    bulk = FootprintPercentileIndex.from_records(records)
+    for value, count in [(0.3, None), (0.5, 20), (0.9, 300), (0.01, 3)]:
+        assert incremental.rank(value, count) == bulk.rank(value, count)
+    assert [employee_band(n) for n in (0, 9, 10, 249, 250)] == [None, "1-9", "10-49", "50-249", "250+"]
+
+
+def test_saving_updates_existing_index(tmp_path, mocker):
+    repository = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    repository.bulk_insert([{"interaction_id": "a", "carbon_per_employee": 0.4, "employee_count": 12}])
+    mocker.patch.object(persistence, "get_repository", return_value=repository)
+    mocker.patch.object(persistence, "_percentile_index", None)
+
+    assert persistence.rank_footprint(0.2).total == 1
+    persistence.save_interaction_data(GraphState(carbon_per_employee=0.1, employee_count=15))
+    rank = persistence.rank_footprint(0.2, employee_count=20)
+    assert rank.total == 2 and rank.percentile == pytest.approx(50.0)
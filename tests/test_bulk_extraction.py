@@ -0,0 +1,76 @@
+# tests/test_bulk_extraction.py
+import pytest
+
+from app.state import GraphState
+from app.nodes.bulk_extraction import (
+    bulk_extraction_node,
+    extract_all_fields,
+    extract_fields_locally,
+    first_missing_task,
+    is_bulk_answer,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("50 empleados, 1500 kWh, 200 litros de diesel",
+     {"employee_count": 50, "electricity_kwh": 1500.0, "fuel_type": "diesel", "fuel_consumption": 200.0}),
+    ("60% va en auto, 30% en bus y 10% en bici",
+     {"transport_pct_car": 60, "transport_pct_public": 30, "transport_pct_green": 10}),
+    ("el 50% viene en auto y el 30% en transporte público",
+     {"transport_pct_car": 50, "transport_pct_public": 30}),
+    # Mismo tope que la pregunta individual: la suma no supera 100
+    ("20 empleados; 80% auto; 60% colectivo; 30% bici",
+     {"employee_count": 20, "transport_pct_car": 80, "transport_pct_public": 20, "transport_pct_green": 0}),
+    ("oficina de 400 m², aire acondicionado, 5000 km en avión",
+     {"office_sqm": 400.0, "climate_control": "aire_acondicionado", "air_travel_km": 5000.0}),
+    ("20 kg de residuos, reciclamos el 30%, 2,5 m3 de agua",
+     {"waste_kg": 20.0, "recycle_pct": 30, "water_consumption": 2.5}),
+])
+def test_extract_fields_locally(text, expected):
+    fields, unassigned = extract_fields_locally(text)
+    assert fields == expected
+    assert unassigned == []
+
+
+def test_single_answer_is_not_bulk():
+    assert not is_bulk_answer("1500 kWh")
+    assert not is_bulk_answer("50 empleados y 20 autos")
+    assert is_bulk_answer("50 empleados y 1500 kWh")
+
+
+def test_llm_called_once_only_for_unrecognized_parts(mocker):
+    call = mocker.patch("app.nodes.bulk_extraction.call_gemini",
+                        return_value='```json\n{"gas_consumption": 40, "recycle_pct": 150, "fuel_type": "uranio"}\n```')
+    assert extract_all_fields("50 empleados, 1500 kWh") == {"employee_count": 50, "electricity_kwh": 1500.0}
+    call.assert_not_called()
+
+    fields = extract_all_fields("50 empleados, 1500 kWh, unos 40 de lo otro")
+    assert call.call_count == 1
+    # Los valores fuera de rango o no permitidos se validan igual que en el flujo normal
+    assert fields == {"employee_count": 50, "electricity_kwh": 1500.0, "gas_consumption": 40.0, "recycle_pct": 100}
+
+
+def test_first_missing_task_skips_fuel_consumption_without_fossil_fuel():
+    values = {"company_name": "x", "responsible_name": "y", "employee_count": 5,
+              "electricity_kwh": 10.0, "fuel_type": "electricidad"}
+    assert first_missing_task(values) == "esperando_consumo_gas"
+
+
+def test_bulk_node_fills_state_and_jumps_to_first_missing(mocker):
+    mocker.patch("app.nodes.bulk_extraction.call_gemini")
+    state = GraphState(current_task="esperando_nombre_empresa",
+                       user_input="Ruedas SA, 50 empleados, 1500 kWh, 200 litros de diesel")
+    update = bulk_extraction_node(state)
+    assert update["company_name"] == "Ruedas SA"
+    assert update["employee_count"] == 50
+    assert update["fuel_consumption"] == 200.0
+    assert update["current_task"] == "esperando_nombre_responsable"
+    assert "Ruedas SA" in update["messages"][-1]
+
+
+def test_bulk_percentages_are_capped_with_the_answers_in_state(mocker):
+    mocker.patch("app.nodes.bulk_extraction.call_gemini")
+    state = GraphState(current_task="esperando_distribucion_transporte", employee_count=10, transport_pct_car=70,
+                       user_input="60% en colectivo y 30% en bici")
+    update = bulk_extraction_node(state)
+    assert (update["transport_pct_public"], update["transport_pct_green"]) == (30, 0)
@@ -0,0 +1,71 @@
+# tests/test_bulk_import.py
+import pytest
+
+from app.state import GraphState
+from app.carbon_calculator import calculate_carbon_footprint
+from app.bulk_import import import_companies
+from app.interaction_repository import SQLiteInteractionRepository
+
+CSV = """company_name,employee_count,electricity_kwh,fuel_type,fuel_consumption,transport_pct_car,transport_pct_public,climate_control,columna_extra
+Ruedas SA,20,1500,Diesel,200,60,30,bomba_calor,x
+Sin empleados,,800,,,,,,
+Mal número,10,mucho,gasolina,,,,,
+Negativo,5,-3,,,,,,
+Transporte,8,100,,,80,40,,
+Opción,12,100,carbon,,,,,
+Decimal,3.5,100,,,,,,
+Mínima,4,,,,,,,
+"""
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+
+
+def test_import_reports_row_errors_and_saves_valid_rows(tmp_path, repository):
+    path = tmp_path / "empresas.csv"
+    path.write_text(CSV, encoding="utf-8")
+    result = import_companies(str(path), repository=repository)
+
+    assert (result.imported, result.rejected) == (2, 6)
+    assert [(e.row, e.field) for e in result.errors] == [
+        (3, "employee_count"), (4, "electricity_kwh"), (5, "electricity_kwh"),
+        (6, "transport_pct_*"), (7, "fuel_type"), (8, "employee_count")]
+    assert result.errors[0].message == "Dato obligatorio"
+
+    saved = {record["company_name"]: record for record in repository.latest(10)}
+    assert set(saved) == {"Ruedas SA", "Mínima"}
+    ruedas = saved["Ruedas SA"]
+    assert ruedas["fuel_type"] == "diesel" and ruedas["employee_count"] == 20 and ruedas["office_sqm"] is None
+    expected = calculate_carbon_footprint(GraphState(
+        company_name="Ruedas SA", employee_count=20, electricity_kwh=1500.0, fuel_type="diesel",
+        fuel_consumption=200.0, transport_pct_car=60, transport_pct_public=30, climate_control="bomba_calor"))
+    assert ruedas["carbon_footprint"] == expected["total_footprint"]
+    assert ruedas["footprint_breakdown"] == expected["breakdown"]
+    assert ruedas["factor_version"] == expected["factor_version"]
+
+
+def test_dry_run_and_decimal_comma(tmp_path, repository):
+    path = tmp_path / "empresas.csv"
+    path.write_text("employee_count;electricity_kwh\n10;1500,5\n", encoding="utf-8")
+    result = import_companies(str(path), repository=repository, dry_run=True, sep=";", decimal=",")
+    assert result.imported == 1 and not result.errors
+    assert result.results.loc[0, "electricity_kwh"] == 1500.5
+    assert repository.count() == 0
+
+
+def test_jsonl_backend_appends_to_the_log_without_creating_a_database(tmp_path, monkeypatch):
+    from app import persistence
+
+    store = persistence.JsonlInteractionStore(str(tmp_path / "log.jsonl"), legacy_path=None)
+    monkeypatch.setattr(persistence, "INTERACTIONS_BACKEND", "jsonl")
+    monkeypatch.setattr(persistence, "_default_store", store)
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "empresas.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    assert import_companies(str(path)).imported == 2
+    assert [r["company_name"] for r in store.iter_records()] == ["Ruedas SA", "Mínima"]
+    assert not (tmp_path / "interactions.db").exists()
+    store.close()
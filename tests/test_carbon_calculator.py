@@ -0,0 +1,111 @@
+# tests/test_carbon_calculator.py
+import pandas as pd
+import pytest
+
+from app.state import GraphState
+from app.carbon_calculator import (
+    BREAKDOWN_CATEGORIES,
+    CATEGORY_FUNCTIONS,
+    affected_categories,
+    calculate_carbon_footprint,
+    calculate_carbon_footprint_batch,
+    summarize_partial_footprint,
+    update_partial_footprint,
+)
+
+# Casos borde del cálculo escalar: porcentajes en 0 (toman el default), sin empleados,
+# combustible sin consumo, climatización ausente, huella muy baja o muy alta
+EDGE_ROWS = [
+    {},
+    {"employee_count": 10, "employee_commute_distance": 12.5, "transport_pct_car": 0, "transport_pct_public": 0},
+    {"employee_count": 0, "electricity_kwh": 900.0, "office_sqm": 80.0},
+    {"employee_count": 3, "fuel_type": "diesel", "fuel_consumption": None, "gas_consumption": 15.0},
+    {"employee_count": 200, "electricity_kwh": 1.0},
+    {"employee_count": 1, "air_travel_km": 90000.0, "ground_travel_km": 300.0, "office_sqm": 500.0,
+     "climate_control": "bomba_calor", "waste_kg": 40.0, "recycle_pct": 100},
+    {"employee_count": 25, "electricity_kwh": 3200.0, "fuel_type": "gasolina", "fuel_consumption": 410.0,
+     "employee_commute_distance": 18.0, "transport_pct_car": 55, "transport_pct_public": 35,
+     "waste_kg": 120.0, "water_consumption": 30.0, "paper_consumption": 20.0, "office_sqm": 300.0,
+     "climate_control": "aire_acondicionado"},
+]
+
+
+def _assert_same_as_scalar(batch: pd.DataFrame, rows, country="default"):
+    for position, row in enumerate(rows):
+        expected = calculate_carbon_footprint(GraphState(**row), country)
+        result = batch.iloc[position]
+        assert result["total_footprint"] == expected["total_footprint"]
+        assert result["per_employee"] == expected["per_employee"]
+        assert result["sustainability_score"] == expected["sustainability_score"]
+        assert {name: result[name] for name in BREAKDOWN_CATEGORIES} == expected["breakdown"]
+
+
+@pytest.mark.parametrize("country", ["default", "Argentina"])
+def test_batch_matches_scalar_on_edge_rows(country):
+    batch = calculate_carbon_footprint_batch(pd.DataFrame(EDGE_ROWS), country)
+    assert len(batch) == len(EDGE_ROWS)
+    _assert_same_as_scalar(batch, EDGE_ROWS, country)
+
+
+def test_batch_matches_scalar_on_random_rows():
+    from benchmarks.bench_carbon_batch import random_companies
+    table = random_companies(300, seed=7)
+    rows = table.astype(object).where(table.notna(), None).to_dict("records")
+    _assert_same_as_scalar(calculate_carbon_footprint_batch(table), rows)
+
+
+def test_batch_accepts_dict_of_arrays_with_missing_columns():
+    batch = calculate_carbon_footprint_batch({"employee_count": [4, 8], "electricity_kwh": [1000.0, 0.0]})
+    assert list(batch["sustainability_score"]) == [
+        calculate_carbon_footprint(GraphState(employee_count=4, electricity_kwh=1000.0))["sustainability_score"],
+        50,
+    ]
+    assert batch["combustible"].sum() == 0
+
+
+def test_affected_categories_follow_dependencies():
+    assert affected_categories(["electricity_kwh"]) == ("electricidad",)
+    assert affected_categories(["employee_count", "recycle_pct"]) == ("transporte_empleados", "residuos")
+    assert affected_categories(["company_name", "transport_pct_green"]) == ()
+
+
+def test_correction_recomputes_only_affected_categories(mocker):
+    state = GraphState(**EDGE_ROWS[-1])
+    state.partial_footprint = update_partial_footprint(state, EDGE_ROWS[-1])
+    spies = {name: mocker.Mock(wraps=function) for name, function in CATEGORY_FUNCTIONS.items()}
+    mocker.patch.dict(CATEGORY_FUNCTIONS, spies)
+
+    # Corrección de un dato: sólo se recalculan residuos y los totales
+    state.partial_footprint = update_partial_footprint(state, {"recycle_pct": 80})
+    state.recycle_pct = 80
+    assert [name for name, spy in spies.items() if spy.called] == ["residuos"]
+    expected = calculate_carbon_footprint(state)
+    preview = summarize_partial_footprint(state.partial_footprint, state.employee_count)
+    assert preview["breakdown"]["residuos"] == expected["breakdown"]["residuos"]
+    assert preview["total_footprint"] == expected["total_footprint"]
+    assert preview["sustainability_score"] == expected["sustainability_score"]
+
+    # La cantidad de empleados cambia transporte y el valor por empleado
+    for spy in spies.values():
+        spy.reset_mock()
+    state.partial_footprint = update_partial_footprint(state, {"employee_count": 50})
+    state.employee_count = 50
+    assert [name for name, spy in spies.items() if spy.called] == ["transporte_empleados"]
+    preview = summarize_partial_footprint(state.partial_footprint, state.employee_count)
+    expected = calculate_carbon_footprint(state)
+    assert preview["per_employee"] == expected["per_employee"]
+    assert preview["sustainability_score"] == expected["sustainability_score"]
+
+
+def test_partial_footprint_answer_by_answer_matches_full_calculation():
+    answers = EDGE_ROWS[-1]
+    state = GraphState()
+    for field, value in answers.items():
+        partial = update_partial_footprint(state, {field: value})
+        setattr(state, field, value)
+        if partial is not None:
+            state.partial_footprint = partial
+    expected = calculate_carbon_footprint(state)
+    preview = summarize_partial_footprint(state.partial_footprint, state.employee_count)
+    assert preview["total_footprint"] == expected["total_footprint"]
+    assert preview["breakdown"] == {name: value for name, value in expected["breakdown"].items() if value}
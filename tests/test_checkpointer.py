@@ -0,0 +1,80 @@
+# tests/test_checkpointer.py
+from typing import Any, Dict
+
+from langgraph.graph import END, StateGraph
+
+from app.state import GraphState
+from app.checkpointer import SQLiteCheckpointSaver
+
+
+def echo_node(state: GraphState) -> Dict[str, Any]:
+    return {"messages": [f"eco: {state.user_input}"], "user_input": None,
+            "employee_count": len(state.messages) + 1}
+
+
+def build_app(saver):
+    workflow = StateGraph(GraphState)
+    workflow.add_node("echo", echo_node)
+    workflow.set_entry_point("echo")
+    workflow.add_edge("echo", END)
+    return workflow.compile(checkpointer=saver)
+
+
+def test_conversation_resumes_after_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    config = {"configurable": {"thread_id": "hilo-1"}}
+    app = build_app(SQLiteCheckpointSaver(path))
+    app.invoke({"user_input": "hola"}, config)
+    app.invoke({"user_input": "50 empleados"}, config)
+
+    # Otro proceso (nueva instancia) retoma el mismo hilo
+    saver = SQLiteCheckpointSaver(path)
+    app = build_app(saver)
+    state = GraphState.model_validate(app.get_state(config).values)
+    assert state.messages == ["eco: hola", "eco: 50 empleados"] and state.employee_count == 2
+    app.invoke({"user_input": "fin"}, config)
+    assert app.get_state(config).values["messages"][-1] == "eco: fin"
+    assert app.get_state({"configurable": {"thread_id": "otro"}}).values == {}
+
+    history = list(app.get_state_history(config))
+    assert len(history) == len(list(saver.list(config)))
+    assert len(list(saver.list(config, limit=2))) == 2
+    assert all(item.metadata["source"] == "loop" for item in saver.list(config, filter={"source": "loop"}))
+
+
+def test_large_values_are_compressed_and_restored(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+    app = build_app(saver)
+    config = {"configurable": {"thread_id": "largo"}}
+    app.invoke({"user_input": "x" * 5000, "messages": ["y" * 5000]}, config)
+    assert app.get_state(config).values["messages"] == ["y" * 5000, "eco: " + "x" * 5000]
+    types = {row[0] for row in saver._connection().execute("SELECT type FROM blobs")}
+    assert any(type_.endswith("+zlib") for type_ in types)
+
+
+def test_abandoned_threads_are_evicted(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"), ttl_seconds=60, eviction_interval=3600)
+    app = build_app(saver)
+    for thread_id in ("a", "b"):
+        app.invoke({"user_input": "hola"}, {"configurable": {"thread_id": thread_id}})
+    saver._connection().execute("UPDATE threads SET updated_at = updated_at - 120 WHERE thread_id = 'a'")
+    saver._connection().commit()
+
+    assert saver.evict_expired() == 1
+    assert saver.thread_count() == 1
+    assert app.get_state({"configurable": {"thread_id": "a"}}).values == {}
+    assert app.get_state({"configurable": {"thread_id": "b"}}).values["messages"] == ["eco: hola"]
+
+
+def test_long_history_is_rebuilt_from_deltas(tmp_path):
+    from app.state import MESSAGES_SNAPSHOT_FREQUENCY
+
+    path = str(tmp_path / "checkpoints.db")
+    config = {"configurable": {"thread_id": "largo"}}
+    app = build_app(SQLiteCheckpointSaver(path))
+    turns = MESSAGES_SNAPSHOT_FREQUENCY * 2 + 3
+    for turn in range(turns):
+        app.invoke({"user_input": str(turn)}, config)
+
+    app = build_app(SQLiteCheckpointSaver(path))
+    assert app.get_state(config).values["messages"] == [f"eco: {turn}" for turn in range(turns)]
@@ -0,0 +1,115 @@
+# tests/test_emission_factors.py
+import copy
+import json
+
+import pytest
+
+from app import persistence
+from app.state import GraphState
+from app.carbon_calculator import calculate_carbon_footprint, calculate_carbon_footprint_batch
+from app.emission_factors import FACTORS_FILE, FACTOR_KEYS, FactorRegistry, set_factor_registry
+from app.interaction_repository import SQLiteInteractionRepository
+from app.persistence import build_interaction_record, recalculate_stale_footprints
+
+
+@pytest.fixture
+def registry_data():
+    with open(FACTORS_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Una versión nueva con electricidad más limpia
+    new_version = copy.deepcopy(data["versions"][data["current"]])
+    new_version["factors"]["electricidad"] = 0.2
+    data["versions"]["2099.1"] = new_version
+    return data
+
+
+def test_registry_compiles_every_country_and_version(registry_data):
+    registry = FactorRegistry(registry_data)
+    factors = registry.get("Argentina")
+    assert len(factors.values) == len(FACTOR_KEYS)
+    assert factors.get("electricidad") == 0.310
+    assert factors.get("infraestructura") == 7.5 / 12
+    # País sin factores propios: los de default; la tupla compilada se comparte
+    assert registry.get("uruguay") is registry.get("default")
+    assert registry.get(version="2099.1").get("electricidad") == 0.2
+    with pytest.raises(KeyError):
+        registry.get(version="1900.1")
+
+
+def test_registry_rejects_incomplete_or_unknown_factors(registry_data):
+    broken = copy.deepcopy(registry_data)
+    del broken["versions"]["2099.1"]["factors"]["agua"]
+    with pytest.raises(ValueError, match="agua"):
+        FactorRegistry(broken)
+    broken["versions"]["2099.1"]["factors"]["agua"] = 0.3
+    broken["versions"]["2099.1"]["countries"]["chile"] = {"electricida": 0.4}
+    with pytest.raises(ValueError, match="electricida"):
+        FactorRegistry(broken)
+
+
+def test_results_record_factor_version(registry_data):
+    factors = FactorRegistry(registry_data).get(version="2099.1")
+    state = GraphState(employee_count=5, electricity_kwh=1000.0)
+    result = calculate_carbon_footprint(state, factors=factors)
+    assert result["factor_version"] == "2099.1"
+    assert result["breakdown"]["electricidad"] == 0.2
+    batch = calculate_carbon_footprint_batch({"employee_count": [5], "electricity_kwh": [1000.0]}, factors=factors)
+    assert batch["factor_version"].tolist() == ["2099.1"]
+    assert result["factor_country"] == batch["factor_country"][0] == "default"
+
+
+@pytest.fixture
+def registry(registry_data):
+    registry = FactorRegistry(registry_data)
+    set_factor_registry(registry)
+    yield registry
+    set_factor_registry(None)
+
+
+def test_recalculation_only_touches_stale_rows(tmp_path, mocker, registry):
+    old, new = registry.get(), registry.get(version="2099.1")
+    repository = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    mocker.patch.object(persistence, "get_repository", return_value=repository)
+
+    def record(company, factors):
+        state = GraphState(company_name=company, employee_count=4, electricity_kwh=2000.0)
+        if factors is not None:
+            result = calculate_carbon_footprint(state, factors=factors)
+            state.carbon_footprint = result["total_footprint"]
+            state.footprint_breakdown = result["breakdown"]
+            state.factor_version = result["factor_version"]
+            state.factor_country = result["factor_country"]
+        return build_interaction_record(state)
+
+    repository.bulk_insert([record("vieja", old), record("vigente", new), record("sin_calculo", None)])
+    assert recalculate_stale_footprints(version="2099.1") == 1
+    assert recalculate_stale_footprints(version="2099.1") == 0
+
+    updated = repository.by_company("vieja")[0]
+    assert (updated["factor_version"], updated["factor_country"]) == ("2099.1", "default")
+    assert updated["carbon_footprint"] == repository.by_company("vigente")[0]["carbon_footprint"]
+    assert updated["footprint_breakdown"]["electricidad"] == 0.4
+    assert repository.by_company("sin_calculo")[0]["carbon_footprint"] is None
+
+
+def test_recalculation_keeps_the_country_of_each_row(tmp_path, mocker, registry):
+    repository = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    mocker.patch.object(persistence, "get_repository", return_value=repository)
+    state = GraphState(employee_count=4, electricity_kwh=2000.0)
+
+    def record(company, country):
+        result = calculate_carbon_footprint(state, factors=registry.get(country))
+        return {**build_interaction_record(state), "company_name": company,
+                "carbon_footprint": result["total_footprint"], "factor_version": result["factor_version"],
+                "factor_country": result["factor_country"]}
+
+    legacy = {**record("legado", "argentina"), "factor_country": None}  # Guardado antes de registrar el país
+    repository.bulk_insert([record("ar", "argentina"), record("base", "default"), legacy])
+    assert recalculate_stale_footprints(country="argentina", version="2099.1") == 3
+
+    for company, country in (("ar", "argentina"), ("base", "default"), ("legado", "argentina")):
+        expected = calculate_carbon_footprint(state, factors=registry.get(country, "2099.1"))
+        row = repository.by_company(company)[0]
+        assert (row["factor_version"], row["factor_country"]) == ("2099.1", country)
+        assert row["carbon_footprint"] == expected["total_footprint"]
+    assert repository.by_company("ar")[0]["carbon_footprint"] != repository.by_company("base")[0]["carbon_footprint"]
@@ -0,0 +1,245 @@
+# tests/test_llm_integration.py
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import app.llm_integration as llm
+from app.llm_cache import LLMCache, make_cache_key
+from app.llm_providers import FakeLLMProvider, HttpLLMProvider, LLMProviderError, create_fake_llm_server
+from app.llm_resilience import CircuitBreaker, CircuitOpenError, call_with_retry
+from app.nodes.conversation import extract_numeric_value
+
+
+@pytest.fixture
+def fake_model(mocker):
+    """Modelo Gemini simulado que cuenta las llamadas a la API."""
+    model = MagicMock()
+    model.generate_content.return_value = MagicMock(text=" 5 ")
+    mocker.patch.object(llm, "_gemini_model", model)
+    mocker.patch.object(llm, "_response_cache", LLMCache(max_size=8))
+    return model
+
+
+def test_cache_key_ignores_whitespace_but_not_params():
+    assert make_cache_key("hola  mundo\n", 0.1, 50) == make_cache_key(" hola mundo", 0.1, 50)
+    assert make_cache_key("hola", 0.1, 50) != make_cache_key("hola", 0.1, 20)
+    assert make_cache_key("hola", 0.1, 50) != make_cache_key("hola", 0.2, 50)
+
+
+def test_lru_cache_evicts_and_expires(mocker):
+    cache = LLMCache(max_size=2, ttl_seconds=10)
+    cache.set("a", "1"); cache.set("b", "2")
+    cache.get("a")            # 'a' pasa a ser la más reciente
+    cache.set("c", "3")       # expulsa 'b'
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    mocker.patch("app.llm_cache.time.time", return_value=cache._entries["a"][0] + 1)
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_shared_between_instances(tmp_path):
+    db = str(tmp_path / "cache.db")
+    LLMCache(db_path=db).set("k", "valor")
+    other = LLMCache(db_path=db)
+    assert other.get("k") == "valor"
+    assert other.stats()["disk_hits"] == 1
+
+
+def test_call_gemini_low_temperature_hits_network_once(fake_model):
+    assert llm.call_gemini("cinco", temperature=0.1, max_output_tokens=50) == "5"
+    assert llm.call_gemini("cinco", temperature=0.1, max_output_tokens=50) == "5"
+    assert fake_model.generate_content.call_count == 1
+    assert llm.get_cache_stats()["hits"] == 1
+
+
+def test_call_gemini_high_temperature_not_cached(fake_model):
+    llm.call_gemini("recomendaciones", temperature=0.7)
+    llm.call_gemini("recomendaciones", temperature=0.7)
+    assert fake_model.generate_content.call_count == 2
+
+
+# --- Versión asíncrona ---
+
+def _async_model(delay: float):
+    """Modelo simulado cuya llamada asíncrona tarda 'delay' y registra la concurrencia máxima."""
+    state = {"active": 0, "max_active": 0}
+
+    async def generate_content_async(prompt, **kwargs):
+        state["active"] += 1
+        state["max_active"] = max(state["max_active"], state["active"])
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            state["active"] -= 1
+        return MagicMock(text=prompt.upper())
+
+    model = MagicMock()
+    model.generate_content_async = generate_content_async
+    return model, state
+
+
+def test_call_gemini_async_limits_concurrency(mocker):
+    model, state = _async_model(delay=0.01)
+    mocker.patch.object(llm, "_gemini_model", model)
+    mocker.patch.object(llm, "LLM_MAX_CONCURRENCY", 2)
+    prompts = [f"p{i}" for i in range(6)]
+    results = asyncio.run(llm.call_gemini_many(prompts, temperature=0.7))
+    assert results == [p.upper() for p in prompts]
+    assert state["max_active"] == 2
+
+
+def test_call_gemini_async_timeout_returns_none(mocker):
+    model, _ = _async_model(delay=1.0)
+    mocker.patch.object(llm, "_gemini_model", model)
+    assert asyncio.run(llm.call_gemini_async("lento", temperature=0.7, timeout=0.01)) is None
+
+
+# --- Inicialización diferida ---
+
+def test_configure_does_not_call_network(mocker):
+    # Restaurar el estado global del módulo al terminar
+    mocker.patch.object(llm, "_gemini_model", None)
+    mocker.patch.object(llm, "_api_key", None)
+    mocker.patch.object(llm, "_response_cache", LLMCache(max_size=8))
+    generative_model = mocker.patch.object(llm.genai, "GenerativeModel")
+    mocker.patch.object(llm.genai, "configure")
+    llm.configure_gemini_client(api_key="clave", health_check=False)
+
+    generative_model.assert_not_called()
+    assert llm.get_client_status()["initialized"] is False
+
+    generative_model.return_value.generate_content.return_value = MagicMock(text="ok")
+    assert llm.call_gemini("hola", temperature=0.7) == "ok"
+    generative_model.assert_called_once()
+    assert "model_init_ms" in llm.get_client_status()
+
+
+def test_background_health_check(mocker):
+    model = MagicMock()
+    mocker.patch.object(llm, "_gemini_model", model)
+    llm.start_health_check().join(timeout=2)
+    model.generate_content.assert_called_once()
+    assert llm.get_client_status()["health"] == "ok"
+
+
+# --- Resiliencia ---
+
+def test_call_with_retry_retries_transient_errors(mocker):
+    sleep = mocker.patch("app.llm_resilience.time.sleep")
+    fn = MagicMock(side_effect=[google_exceptions.ResourceExhausted("429"), "ok"])
+    assert call_with_retry(fn, attempts=3) == "ok"
+    assert fn.call_count == 2
+    sleep.assert_called_once()
+
+
+def test_call_with_retry_does_not_retry_permanent_errors(mocker):
+    mocker.patch("app.llm_resilience.time.sleep")
+    fn = MagicMock(side_effect=ValueError("prompt inválido"))
+    with pytest.raises(ValueError):
+        call_with_retry(fn, attempts=3)
+    assert fn.call_count == 1
+
+
+def test_circuit_breaker_opens_and_half_opens(mocker):
+    clock = mocker.patch("app.llm_resilience.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure(); breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(lambda: "no se llama", breaker=breaker)
+
+    clock.return_value = 111.0
+    assert breaker.allow_request() is True      # llamada de prueba
+    assert breaker.allow_request() is False     # sólo una a la vez
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_circuit_routes_to_local_parsers(mocker):
+    mocker.patch.object(llm, "_circuit_breaker", CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    model = MagicMock()
+    model.generate_content.side_effect = google_exceptions.ServiceUnavailable("503")
+    mocker.patch.object(llm, "_gemini_model", model)
+    mocker.patch("app.llm_resilience.time.sleep")
+
+    assert llm.call_gemini("x", temperature=0.7) is None
+    assert llm.is_llm_available() is False
+    calls = model.generate_content.call_count
+    assert llm.call_gemini("y", temperature=0.7) is None
+    assert model.generate_content.call_count == calls  # no toca la red
+
+    assert extract_numeric_value("50 empleados y 20 autos", "empleados") == 50.0
+    assert llm.classify_intent("hola!", "esperando_nombre_empresa") == "saludo_despedida"
+    assert model.generate_content.call_count == calls
+
+
+# --- Proveedores intercambiables ---
+
+def test_fake_provider_scripted_responses_and_errors():
+    provider = FakeLLMProvider(rules=[(r"respondido '(\d+)'", r"\1.0"), (r"intención", lambda p: "saludo_despedida")],
+                               default_response="None", error_rate=0.5, seed=1)
+    results = []
+    for _ in range(40):
+        try:
+            results.append(provider.generate("El usuario ha respondido '12'", 0.1, 50))
+        except LLMProviderError:
+            results.append("error")
+    assert set(results) == {"12.0", "error"}
+    assert provider.stats()["errors"] == results.count("error")
+    assert provider.respond("Clasifica la intención") == "saludo_despedida"
+    assert provider.respond("otra cosa") == "None"
+    # En streaming, sin regla no hay texto: el stream queda vacío
+    provider.error_rate = 0
+    assert list(provider.generate_stream("otra cosa", 0.1, 50)) == []
+    assert "".join(provider.generate_stream("El usuario ha respondido '7'", 0.1, 50)) == "7.0"
+
+
+def test_fake_provider_latency_distributions():
+    for distribution in ("constant", "uniform", "normal", "lognormal", "exponential"):
+        provider = FakeLLMProvider(latency_ms=100, latency_jitter_ms=20, latency_distribution=distribution, seed=3)
+        samples = [provider.sample_latency() for _ in range(2000)]
+        assert min(samples) >= 0
+        assert sum(samples) / len(samples) == pytest.approx(0.1, rel=0.1)
+
+
+def test_call_gemini_uses_active_provider(mocker):
+    mocker.patch.object(llm, "_response_cache", LLMCache(max_size=8))
+    mocker.patch("app.llm_resilience.time.sleep")
+    provider = FakeLLMProvider(rules=[(r"intención", "pregunta_general")], error_rate=0.0)
+    mocker.patch.object(llm, "_provider", provider)
+
+    assert llm.classify_intent("¿qué es esto", "esperando_consumo_luz") == "pregunta_general"
+    assert asyncio.run(llm.call_gemini_async("x", temperature=0.7)) == "None"
+    assert provider.stats()["calls"] == 2
+
+
+def test_stream_gemini_yields_chunks_and_keeps_partial_text(fake_model, mocker):
+    mocker.patch.object(llm, "_provider", llm.GeminiProvider())
+    fake_model.generate_content.return_value = iter([MagicMock(text="Hola "), MagicMock(text="mundo")])
+    assert list(llm.stream_gemini("saludo", temperature=0.1)) == ["Hola ", "mundo"]
+    assert fake_model.generate_content.call_args.kwargs["stream"] is True
+    assert list(llm.stream_gemini("saludo", temperature=0.1)) == ["Hola mundo"]  # Respuesta completa cacheada
+
+    def broken_stream():
+        yield MagicMock(text="Primero")
+        raise google_exceptions.ServiceUnavailable("corte")
+
+    fake_model.generate_content.return_value = broken_stream()
+    assert list(llm.stream_gemini("otro", temperature=0.1)) == ["Primero"]
+    assert list(llm.stream_gemini("otro", temperature=0.1)) == []  # Lo parcial no se cachea: nueva llamada
+
+
+def test_fake_llm_server_round_trip():
+    server = create_fake_llm_server(FakeLLMProvider(rules=[(r"hola", "chau")]), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = HttpLLMProvider(f"http://127.0.0.1:{server.server_address[1]}", timeout=5)
+        assert client.generate("hola", 0.1, 10) == "chau"
+    finally:
+        server.shutdown()
+        server.server_close()
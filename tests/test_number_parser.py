@@ -0,0 +1,74 @@
+# tests/test_number_parser.py
+import pytest
+
+from app.number_parser import parse_number, LOCAL_PARSE_MIN_CONFIDENCE
+from app.nodes.conversation import extract_numeric_value
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1500", 1500.0),
+    ("10.5", 10.5),
+    ("1.500 kWh", 1500.0),
+    ("1.500.000", 1500000.0),
+    ("1.500,75", 1500.75),
+    ("12,5 %", 12.5),
+    ("1,5k", 1500.0),
+    ("cinco", 5.0),
+    ("cinco mil", 5000.0),
+    ("3 mil quinientos", 3500.0),
+    ("treinta y cinco", 35.0),
+    ("un millón", 1000000.0),
+    ("20%", 20.0),
+    ("veinte por ciento", 20.0),
+    ("aprox 200", 200.0),
+    ("entre 10 y 20", 15.0),
+    ("de 100 a 200 km", 150.0),
+    ("unos 40 m²", 40.0),
+    ("mil millones", 1_000_000_000.0),
+    ("tres mil quinientos millones", 3_500_000_000.0),
+    ("1e3", 1000.0),
+    ("2,5e3 kWh", 2500.0),
+    ("10-20", 15.0),
+    ("-5", -5.0),
+])
+def test_parse_number_confident(text, expected):
+    parsed = parse_number(text)
+    assert parsed is not None
+    assert parsed.value == pytest.approx(expected)
+    assert parsed.confidence >= LOCAL_PARSE_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("text", ["1,500", "50 empleados y 20 autos"])
+def test_parse_number_ambiguous_has_low_confidence(text):
+    assert parse_number(text).confidence < LOCAL_PARSE_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("text", ["", "no sé", "ninguno"])
+def test_parse_number_without_number(text):
+    assert parse_number(text) is None
+
+
+def test_negative_answer_is_rejected_not_taken_as_positive(mocker):
+    from app.state import GraphState
+    from app.nodes.conversation import process_employee_count_node, process_recycle_percentage_node
+
+    mocker.patch('app.nodes.conversation.call_gemini', return_value="-5")
+    assert "employee_count" not in process_employee_count_node(GraphState(user_input="-5"))
+    assert "recycle_pct" not in process_recycle_percentage_node(GraphState(user_input="-5%"))
+
+
+def test_extract_numeric_value_skips_llm_when_confident(mocker):
+    llm = mocker.patch('app.nodes.conversation.call_gemini')
+    assert extract_numeric_value("cinco mil", "cantidad de empleados") == 5000.0
+    llm.assert_not_called()
+
+
+def test_extract_numeric_value_uses_llm_when_ambiguous(mocker):
+    llm = mocker.patch('app.nodes.conversation.call_gemini', return_value="1500")
+    assert extract_numeric_value("1,500", "consumo eléctrico en kWh") == 1500.0
+    llm.assert_called_once()
+
+
+def test_extract_numeric_value_falls_back_to_local_guess(mocker):
+    mocker.patch('app.nodes.conversation.call_gemini', return_value=None)
+    assert extract_numeric_value("50 empleados y 20 autos", "cantidad de empleados") == 50.0
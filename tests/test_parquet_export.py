@@ -0,0 +1,79 @@
+# tests/test_parquet_export.py
+import json
+
+import pandas as pd
+import pytest
+
+from app.interaction_repository import SQLiteInteractionRepository
+from app.parquet_export import export_from_jsonl, export_from_repository
+
+
+def record(i, month):
+    return {"interaction_id": str(i), "timestamp": f"2025-{month:02d}-0{1 + i % 9}T12:00:00",
+            "employee_count": 10, "fuel_type": "diesel", "carbon_footprint": float(i),
+            "footprint_breakdown": {"electricidad": i / 2, "viajes": 0.5}}
+
+
+def test_repository_export_is_incremental_and_partitioned(tmp_path):
+    repository = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    repository.bulk_insert([record(i, 4 + i % 2) for i in range(10)])
+    output = str(tmp_path / "export")
+
+    assert export_from_repository(repository, output, batch_size=4) == 10
+    assert export_from_repository(repository, output) == 0  # Nada nuevo
+    repository.bulk_insert([record(10, 6), {"interaction_id": "sin_fecha", "employee_count": "x"}])
+    assert export_from_repository(repository, output) == 2
+
+    months = sorted(p.name for p in (tmp_path / "export").iterdir() if p.is_dir())
+    assert months == ["month=2025-04", "month=2025-05", "month=2025-06", "month=sin_fecha"]
+    data = pd.read_parquet(output, columns=["interaction_id", "month", "carbon_footprint", "breakdown_electricidad"])
+    assert len(data) == 12 and data["interaction_id"].is_unique
+    row = data[data["interaction_id"] == "7"].iloc[0]
+    assert row["month"] == "2025-05" and row["breakdown_electricidad"] == 3.5
+    assert pd.read_parquet(output).loc[lambda d: d["interaction_id"] == "sin_fecha", "employee_count"].isna().all()
+
+
+def test_jsonl_export_skips_loans_and_partial_last_line(tmp_path):
+    log = tmp_path / "log.jsonl"
+    lines = [json.dumps(record(i, 3)) for i in range(3)] + [json.dumps({"requested_amount": 5000.0})]
+    log.write_text("\n".join(lines) + "\n" + '{"interaction_id": "a medio', encoding="utf-8")
+    output = str(tmp_path / "export")
+
+    assert export_from_jsonl(str(log), output) == 3
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(' escribir", "timestamp": "2025-04-01T00:00:00"}\n')
+    assert export_from_jsonl(str(log), output) == 1
+    assert export_from_jsonl(str(log), output) == 0
+    assert sorted(pd.read_parquet(output, columns=["interaction_id"])["interaction_id"]) == ["0", "1", "2", "a medio escribir"]
+
+
+def test_recalculated_rows_are_rewritten_in_place(tmp_path):
+    repository = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    repository.bulk_insert([record(i, 4 + i % 2) for i in range(10)])
+    output = str(tmp_path / "export")
+    assert export_from_repository(repository, output, batch_size=4) == 10
+
+    # Recálculo de una fila de la parte 5-8: se reescriben sus archivos (ambos meses), sin duplicar
+    repository.update_footprints([(6, {"carbon_footprint": 99.0, "footprint_breakdown": {"electricidad": 1.0},
+                                       "factor_version": "2099.1"})])
+    assert export_from_repository(repository, output) == 4
+    assert export_from_repository(repository, output) == 0
+    data = pd.read_parquet(output, columns=["interaction_id", "carbon_footprint", "factor_version"])
+    assert len(data) == 10 and data["interaction_id"].is_unique
+    row = data[data["interaction_id"] == "5"].iloc[0]
+    assert row["carbon_footprint"] == 99.0 and row["factor_version"] == "2099.1"
+
+
+def test_export_refuses_a_different_source_in_the_same_directory(tmp_path):
+    output = str(tmp_path / "export")
+    for name in ("a.jsonl", "b.jsonl"):
+        (tmp_path / name).write_text(json.dumps(record(1, 3)) + "\n", encoding="utf-8")
+    assert export_from_jsonl(str(tmp_path / "a.jsonl"), output) == 1
+    with pytest.raises(ValueError, match="otro directorio"):
+        export_from_jsonl(str(tmp_path / "b.jsonl"), output)
+
+    repository = SQLiteInteractionRepository(str(tmp_path / "a.db"))
+    repository.insert(record(2, 3))
+    assert export_from_repository(repository, output) == 1
+    with pytest.raises(ValueError, match="otro directorio"):
+        export_from_repository(SQLiteInteractionRepository(str(tmp_path / "b.db")), output)
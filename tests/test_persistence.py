@@ -0,0 +1,143 @@
+# tests/test_persistence.py
+import json
+import threading
+import time
+
+from app.state import GraphState
+from app.persistence import JsonlInteractionStore, build_interaction_record
+from app.interaction_repository import SQLiteInteractionRepository, SCHEMA_COLUMNS
+
+
+def test_build_record_excludes_control_fields():
+    """El registro guarda datos de empresa, no el historial ni las tareas."""
+    state = GraphState(company_name="ruedas", employee_count=5, messages=["hola"], current_task="finalizando")
+    record = build_interaction_record(state)
+    assert record["interaction_id"] == state.interaction_id
+    assert record["company_name"] == "ruedas"
+    assert record["employee_count"] == 5
+    assert "timestamp" in record
+    assert "messages" not in record
+    assert "current_task" not in record
+
+
+def test_jsonl_store_append_and_tail(tmp_path):
+    store = JsonlInteractionStore(str(tmp_path / "log.jsonl"), legacy_path=None)
+    for i in range(10):
+        store.append({"interaction_id": str(i)})
+    store.close()
+
+    lines = (tmp_path / "log.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 10
+    assert [r["interaction_id"] for r in store.tail(3)] == ["7", "8", "9"]
+
+
+def test_jsonl_store_migrates_legacy_array_once(tmp_path):
+    legacy = tmp_path / "log.json"
+    legacy.write_text(json.dumps([{"interaction_id": "a"}, {"interaction_id": "b"}]), encoding="utf-8")
+    store = JsonlInteractionStore(str(tmp_path / "log.jsonl"), legacy_path=str(legacy))
+    store.append({"interaction_id": "c"})
+    store.close()
+
+    # Una segunda instancia no vuelve a migrar
+    store = JsonlInteractionStore(str(tmp_path / "log.jsonl"), legacy_path=str(legacy))
+    assert [r["interaction_id"] for r in store.iter_records()] == ["a", "b", "c"]
+
+
+def test_jsonl_store_ignores_truncated_line(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text('{"interaction_id": "a"}\n{"interaction_', encoding="utf-8")
+    store = JsonlInteractionStore(str(path), legacy_path=None)
+    assert [r["interaction_id"] for r in store.iter_records()] == ["a"]
+
+
+def test_append_after_a_torn_line_keeps_the_new_record(tmp_path):
+    path = tmp_path / "log.jsonl"
+    path.write_text('{"interaction_id": "a"}\n{"interaction_', encoding="utf-8")
+    store = JsonlInteractionStore(str(path), legacy_path=None)
+    store.append({"interaction_id": "b"})
+    store.append_many([{"interaction_id": "c"}])
+    store.close()
+    assert [r["interaction_id"] for r in store.iter_records()] == ["a", "b", "c"]
+
+
+def test_pending_records_are_synced_without_further_appends(tmp_path, mocker):
+    fsync = mocker.patch("app.persistence.os.fsync")
+    store = JsonlInteractionStore(str(tmp_path / "log.jsonl"), legacy_path=None,
+                                  fsync_batch_size=100, fsync_interval=0.2)
+    store.append({"interaction_id": "a"})
+    assert fsync.call_count == 0  # Dentro del intervalo: queda pendiente
+    deadline = time.monotonic() + 2
+    while store._pending_fsync and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store._pending_fsync == 0 and fsync.call_count == 1
+    store.close()
+
+
+def test_jsonl_store_concurrent_writers_keep_all_records(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    stores = [JsonlInteractionStore(path, legacy_path=None) for _ in range(4)]
+
+    def writer(store, prefix):
+        for i in range(50):
+            store.append({"interaction_id": f"{prefix}-{i}"})
+
+    threads = [threading.Thread(target=writer, args=(s, n)) for n, s in enumerate(stores)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    for s in stores: s.close()
+
+    records = list(JsonlInteractionStore(path, legacy_path=None).iter_records())
+    assert len(records) == 200
+
+
+# --- Repositorio SQLite ---
+
+def test_sqlite_schema_follows_graph_state():
+    assert SCHEMA_COLUMNS["employee_count"] == "INTEGER"
+    assert SCHEMA_COLUMNS["electricity_kwh"] == "REAL"
+    assert SCHEMA_COLUMNS["fuel_type"] == "TEXT"
+    assert SCHEMA_COLUMNS["footprint_breakdown"] == "JSON"
+    assert "messages" not in SCHEMA_COLUMNS
+
+
+def test_sqlite_repository_indexed_queries(tmp_path):
+    repo = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    inserted = repo.bulk_insert([
+        {"interaction_id": "1", "timestamp": "2025-04-10T10:00:00", "company_name": "ruedas", "employee_count": 5},
+        {"interaction_id": "2", "timestamp": "2025-04-11T10:00:00", "company_name": "otra",
+         "footprint_breakdown": {"agua": 0.1}},
+        {"interaction_id": "3", "timestamp": "2025-04-12T10:00:00", "company_name": "ruedas", "requested_amount": 5000.0},
+    ])
+    assert inserted == 3
+    assert repo.count() == 3
+    assert [r["interaction_id"] for r in repo.latest(2)] == ["2", "3"]
+    assert [r["interaction_id"] for r in repo.by_company("ruedas")] == ["1", "3"]
+    assert [r["interaction_id"] for r in repo.by_date_range("2025-04-11", "2025-04-12")] == ["2"]
+    assert repo.by_interaction_id("2")[0]["footprint_breakdown"] == {"agua": 0.1}
+    # Los campos antiguos se conservan en la columna 'extra'
+    assert repo.by_interaction_id("3")[0]["requested_amount"] == 5000.0
+
+    plan = repo._connection().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM interactions ORDER BY timestamp DESC LIMIT 5").fetchall()
+    assert any("idx_interactions_timestamp" in row[-1] for row in plan)
+    repo.close()
+
+
+def test_fallback_log_is_imported_once_into_sqlite(tmp_path):
+    from app.persistence import import_fallback_log
+
+    store = JsonlInteractionStore(str(tmp_path / "log.jsonl"), legacy_path=None)
+    repo = SQLiteInteractionRepository(str(tmp_path / "interactions.db"))
+    # Una base creada antes de registrar el offset ya tiene el primer registro del log
+    repo.insert({"interaction_id": "1", "timestamp": "2025-04-10T10:00:00", "company_name": "ruedas"})
+    store.append({"interaction_id": "1", "timestamp": "2025-04-10T10:00:00", "company_name": "ruedas"})
+    store.append({"interaction_id": "2", "timestamp": "2025-04-11T10:00:00", "company_name": "otra"})
+    assert import_fallback_log(repo, store, batch_size=1) == 1
+    assert import_fallback_log(repo, store) == 0
+
+    # Un registro guardado como respaldo mientras SQLite fallaba
+    store.append({"interaction_id": "3", "timestamp": "2025-04-12T10:00:00", "company_name": "ruedas"})
+    assert import_fallback_log(repo, store) == 1
+    assert [r["interaction_id"] for r in repo.latest(5)] == ["1", "2", "3"]
+    store.close()
+    repo.close()
@@ -0,0 +1,77 @@
+# tests/test_question_engine.py
+import pytest
+
+from app.state import GraphState
+from app.nodes import conversation as conv
+from app.nodes.conversation import (
+    QUESTION_SPECS,
+    SPECS_BY_TASK,
+    process_question_node,
+    select_question,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_llm(mocker):
+    """Las respuestas de estas pruebas se resuelven con el parser local."""
+    mocker.patch("app.nodes.conversation.call_gemini", return_value=None)
+
+
+def test_specs_compiled_once_and_cover_every_question():
+    assert len(QUESTION_SPECS) == 19
+    assert len(SPECS_BY_TASK["esperando_distribucion_transporte"]) == 3
+    gas = next(s for s in QUESTION_SPECS if s.field == "gas_consumption")
+    assert gas.zero_pattern is not None and gas.placeholder == "gas_consumption"
+    # Los nodos por pregunta conservan sus nombres públicos
+    assert conv.process_fuel_type_node.__name__ == "process_fuel_type_node"
+
+
+@pytest.mark.parametrize("node, user_input, field, expected", [
+    (conv.process_employee_count_node, "50", "employee_count", 50),
+    (conv.process_gas_consumption_node, "no usamos", "gas_consumption", 0),
+    # "0" como palabra clave no debe coincidir con "300"
+    (conv.process_gas_consumption_node, "300", "gas_consumption", 300.0),
+    (conv.process_recycle_percentage_node, "30%", "recycle_pct", 30),
+    (conv.process_air_travel_node, "no viajamos", "air_travel_km", 0),
+    (conv.process_climate_control_node, "bomba de calor", "climate_control", "bomba_calor"),
+])
+def test_generic_node_parses_answers(node, user_input, field, expected):
+    update = node(GraphState(user_input=user_input))
+    assert update[field] == expected
+
+
+def test_invalid_answer_keeps_task_and_field():
+    update = conv.process_office_area_node(GraphState(user_input="0", office_sqm=None))
+    assert "office_sqm" not in update
+    assert update["current_task"] == "esperando_metros_oficina"
+    assert update["messages"][-1] == conv.OFFICE_SQM_ERROR_MESSAGE
+
+
+def test_estimate_from_employee_count():
+    update = conv.process_water_consumption_node(GraphState(user_input="no sabemos", employee_count=20))
+    assert update["water_consumption"] == 20.0
+    assert update["current_task"] == "esperando_consumo_papel"
+
+
+def test_fuel_type_without_fossil_fuel_skips_consumption():
+    update = conv.process_fuel_type_node(GraphState(user_input="4"))
+    assert update["fuel_type"] == "electricidad"
+    assert update["current_task"] == "esperando_consumo_gas"
+    assert "Electricidad" in update["messages"][-1]
+
+
+def test_transport_percentages_in_three_steps_with_cap():
+    state = GraphState(current_task="esperando_distribucion_transporte", transport_pct_car=70)
+    assert select_question(state).field == "transport_pct_public"
+    state.user_input = "50"
+    update = process_question_node(state)
+    assert update["transport_pct_public"] == 30  # 70 + 50 supera 100
+    assert update["current_task"] == "esperando_distribucion_transporte"
+
+
+def test_answer_updates_only_its_partial_footprint_category():
+    state = GraphState(user_input="50", partial_footprint={"electricidad": 100.0})
+    update = conv.process_gas_consumption_node(state)
+    # La categoría ya calculada se conserva; sólo se agrega la del campo respondido
+    assert update["partial_footprint"] == {"electricidad": 100.0, "gas": 50.0 * 2.07}
+    assert "partial_footprint" not in conv.process_company_name_node(GraphState(user_input="Ruedas SA"))
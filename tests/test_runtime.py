@@ -0,0 +1,71 @@
+# tests/test_runtime.py
+import pytest
+
+import app.llm_integration as llm
+from app.checkpointer import SQLiteCheckpointSaver
+from app.llm_providers import FakeLLMProvider
+from app.nodes.conversation import QUESTION_SPECS, WELCOME_MESSAGE
+from app.nodes.narrative import NARRATIVE_HEADER
+from app.runtime import QUESTION_ROUTES, SessionRuntime
+
+ANSWERS = ["Ruedas SA", "Ana", "50", "1500", "1", "200", "0", "10", "60", "30", "10",
+           "200", "30", "40", "20", "500", "1", "0", "0"]
+
+
+@pytest.fixture
+def runtime(tmp_path, mocker):
+    mocker.patch("app.nodes.conversation.call_gemini", return_value=None)
+    mocker.patch("app.nodes.bulk_extraction.call_gemini", return_value=None)
+    mocker.patch("app.nodes.conversation.rank_footprint", return_value=None)
+    mocker.patch("app.persistence.save_interaction_data", return_value=True)
+    return SessionRuntime(SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db")))
+
+
+def test_every_question_has_a_route():
+    assert set(QUESTION_ROUTES) == {spec.field for spec in QUESTION_SPECS}
+
+
+def test_full_conversation_calculates_and_saves_in_last_turn(runtime):
+    import app.persistence as persistence
+
+    turn = runtime.start("empresa-1")
+    assert turn.messages == [WELCOME_MESSAGE] and turn.current_task == "esperando_nombre_empresa"
+    for answer in ANSWERS:
+        assert not turn.finished
+        turn = runtime.answer("empresa-1", answer)
+    # La última respuesta dispara el cálculo y el guardado en el mismo turno
+    assert turn.finished and turn.current_task == "mostrando_resultados"
+    assert "HUELLA" in turn.messages[-1].upper()
+    state = runtime.get_state("empresa-1")
+    assert state.company_name == "Ruedas SA" and state.carbon_footprint > 0
+    persistence.save_interaction_data.assert_called_once()
+
+
+def test_sessions_are_independent_and_resumable(runtime):
+    runtime.start("a")
+    runtime.start("b")
+    runtime.answer("a", "Empresa A")
+    runtime.answer("b", "Empresa B")
+    runtime.answer("a", "Luis")
+    assert runtime.get_state("a").current_task == "esperando_cantidad_empleados"
+    assert runtime.get_state("b").current_task == "esperando_nombre_responsable"
+    resumed = runtime.start("a")
+    assert len(resumed.messages) == 3 and runtime.get_state("b").company_name == "Empresa B"
+    with pytest.raises(KeyError):
+        runtime.answer("inexistente", "hola")
+
+
+def test_results_narrative_is_streamed_token_by_token(runtime, mocker):
+    mocker.patch.object(llm, "_provider", FakeLLMProvider(rules=[(r"plan de acción", "Empiece por la electricidad.")]))
+    runtime.start("empresa-2")
+    for answer in ANSWERS[:-1]:
+        runtime.answer("empresa-2", answer)
+    events = list(runtime.stream_answer("empresa-2", ANSWERS[-1]))
+
+    tokens = [event.content for event in events if event.kind == "token"]
+    messages = [event.content for event in events if event.kind == "message"]
+    # Los fragmentos llegan antes que el mensaje completo, que es el que queda en el historial
+    assert len(tokens) > 2 and "".join(tokens) == messages[-1] == NARRATIVE_HEADER + "Empiece por la electricidad."
+    assert [event.kind for event in events][-2:] == ["message", "end"]
+    assert events[-1].turn.messages == messages and events[-1].turn.finished
+    assert runtime.get_state("empresa-2").messages[-1] == messages[-1]
@@ -0,0 +1,44 @@
+# tests/test_scenarios.py
+import pytest
+
+from app.state import GraphState
+from app.carbon_calculator import calculate_carbon_footprint
+from app.scenarios import DEFAULT_INTERVENTIONS, Intervention, evaluate_scenarios, rank_recommendations
+
+COMPANY = GraphState(employee_count=20, electricity_kwh=2000.0, employee_commute_distance=10.0,
+                     waste_kg=100.0, recycle_pct=10, climate_control="aire_acondicionado", office_sqm=200.0)
+
+
+def test_all_combinations_evaluated_in_one_table():
+    scenarios = evaluate_scenarios(COMPANY)
+    # Aplican: eficiencia, renovable, transporte, reciclaje y climatización (sin papel, vuelos ni combustible)
+    assert len(scenarios) == 2 ** 5
+    assert scenarios["interventions"].iloc[0] == ()
+    assert scenarios["total_footprint"].iloc[0] == calculate_carbon_footprint(COMPANY)["total_footprint"]
+    assert scenarios["saved"].iloc[-1] == scenarios["saved"].max()
+
+
+def test_single_scenarios_match_scalar_calculation_of_modified_state():
+    scenarios = evaluate_scenarios(COMPANY).set_index("interventions")
+    base = calculate_carbon_footprint(COMPANY)["total_footprint"]
+    cases = {
+        ("eficiencia_electrica",): {"electricity_kwh": 1400.0},
+        # Sin respuesta el auto vale 60% y el público 30%: los 20 puntos pasan a transporte público
+        ("transporte_compartido",): {"transport_pct_car": 40, "transport_pct_public": 50},
+        ("reciclaje",): {"recycle_pct": 60},
+        ("climatizacion_eficiente",): {"climate_control": "bomba_calor"},
+    }
+    for key, changes in cases.items():
+        expected = calculate_carbon_footprint(COMPANY.model_copy(update=changes))["total_footprint"]
+        assert scenarios.loc[[key], "saved"].iloc[0] == pytest.approx(base - expected)
+
+
+def test_ranking_orders_by_savings_and_skips_useless_measures():
+    ranked = rank_recommendations(COMPANY)
+    assert [item["saved"] for item in ranked] == sorted((item["saved"] for item in ranked), reverse=True)
+    assert {item["key"] for item in ranked} == {"eficiencia_electrica", "energia_renovable",
+                                                "transporte_compartido", "reciclaje", "climatizacion_eficiente"}
+    assert ranked[0]["key"] == "energia_renovable"
+    custom = (Intervention("viajes", "Sin viajes", "air_travel_km", "reducir", 1.0),)
+    assert rank_recommendations(COMPANY, custom) == []
+    assert all(isinstance(intervention.recommendation, str) for intervention in DEFAULT_INTERVENTIONS)
@@ -0,0 +1,48 @@
+# tests/test_server.py
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from app.checkpointer import SQLiteCheckpointSaver
+from app.runtime import SessionRuntime
+from app.server import SESSION_HEADER, create_app
+
+
+@pytest.fixture
+def client(tmp_path, mocker):
+    mocker.patch("app.nodes.conversation.call_gemini", return_value=None)
+    mocker.patch("app.nodes.bulk_extraction.call_gemini", return_value=None)
+    runtime = SessionRuntime(SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db")))
+    with TestClient(create_app(runtime)) as client:
+        yield client
+
+
+def test_http_session_flow(client):
+    response = client.post("/sessions", json={})
+    assert response.status_code == 201
+    thread_id = response.json()["thread_id"]
+    assert response.headers[SESSION_HEADER] == thread_id
+    assert response.json()["current_task"] == "esperando_nombre_empresa"
+
+    turn = client.post(f"/sessions/{thread_id}/answer", json={"text": "Ruedas SA"}).json()
+    assert turn["current_task"] == "esperando_nombre_responsable" and len(turn["messages"]) == 1
+    lines = client.post(f"/sessions/{thread_id}/answer?stream=1", json={"text": "Ana"}).text.splitlines()
+    events = [json.loads(line) for line in lines]
+    assert [event["type"] for event in events] == ["message", "end"]
+    assert client.get(f"/sessions/{thread_id}").json()["responsible_name"] == "Ana"
+
+    resumed = client.post("/sessions", json={"thread_id": thread_id}).json()
+    assert resumed["thread_id"] == thread_id and len(resumed["messages"]) == 3
+    assert client.post("/sessions", json={}).json()["thread_id"] != thread_id
+    assert client.post("/sessions/otra/answer", json={"text": "hola"}).status_code == 404
+    assert client.post(f"/sessions/{thread_id}/answer", json={}).status_code == 400
+
+
+def test_websocket_streams_messages(client):
+    thread_id = client.post("/sessions", json={"thread_id": "ws-1"}).json()["thread_id"]
+    with client.websocket_connect(f"/sessions/{thread_id}/ws") as websocket:
+        websocket.send_json({"text": "Ruedas SA"})
+        assert websocket.receive_json()["type"] == "message"
+        end = websocket.receive_json()
+        assert end["type"] == "end" and end["current_task"] == "esperando_nombre_responsable"
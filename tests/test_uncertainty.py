@@ -0,0 +1,45 @@
+# tests/test_uncertainty.py
+import pytest
+
+from app import uncertainty
+from app.state import GraphState
+from app.carbon_calculator import calculate_carbon_footprint
+from app.uncertainty import simulate_carbon_footprint
+
+COMPANY = GraphState(employee_count=25, electricity_kwh=3200.0, employee_commute_distance=18.0,
+                     waste_kg=120.0, office_sqm=300.0, climate_control="aire_acondicionado",
+                     air_travel_km=5000.0)
+
+
+def test_intervals_bracket_point_estimate_and_are_reproducible():
+    result = simulate_carbon_footprint(COMPANY, samples=20000, seed=3)
+    point = calculate_carbon_footprint(COMPANY)
+    for name, interval in result["breakdown"].items():
+        assert interval["low"] <= interval["median"] <= interval["high"]
+        assert interval["low"] <= point["breakdown"][name] <= interval["high"]
+    # Categorías sin datos no tienen incertidumbre
+    assert result["breakdown"]["gas"] == {"mean": 0.0, "low": 0.0, "median": 0.0, "high": 0.0}
+    assert 0 <= result["sustainability_score"]["low"] <= result["sustainability_score"]["high"] <= 100
+    assert simulate_carbon_footprint(COMPANY, samples=20000, seed=3) == result
+
+
+def test_without_uncertainty_matches_point_estimate(mocker):
+    mocker.patch.object(uncertainty, "FACTOR_UNCERTAINTY", {})
+    mocker.patch.object(uncertainty, "AIR_SHORT_SHARE_RANGE", (0.5, 0.5))
+    mocker.patch.object(uncertainty, "WORK_DAYS_TRIANGULAR", (22, 22, 22))
+    state = COMPANY.model_copy(update={"transport_pct_car": 60, "transport_pct_public": 30})
+    result = simulate_carbon_footprint(state, samples=1000, seed=0)
+    point = calculate_carbon_footprint(state)
+    for name, value in point["breakdown"].items():
+        assert result["breakdown"][name]["low"] == pytest.approx(value)
+        assert result["breakdown"][name]["high"] == pytest.approx(value)
+    assert result["total_footprint"]["median"] == pytest.approx(point["total_footprint"])
+
+
+def test_simulation_uses_the_shared_category_functions(mocker):
+    from app.carbon_calculator import CATEGORY_FUNCTIONS
+
+    # Un cambio en la fórmula de una categoría se refleja en la simulación sin tocar este módulo
+    mocker.patch.dict(CATEGORY_FUNCTIONS, {"agua": lambda state, factors, assumptions: 2000.0})
+    result = simulate_carbon_footprint(COMPANY, samples=1000, seed=0)
+    assert result["breakdown"]["agua"]["median"] == 2.0